@@ -0,0 +1,95 @@
+"""Unit tests for production module alde.chat_stream.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/chat_stream.py.
+"""
+
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace as NS
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import chat_stream
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import chat_stream  # type: ignore
+
+
+def _chunk(content=None, tool_calls=None, finish_reason=None):
+    delta = NS(content=content, tool_calls=tool_calls)
+    return NS(model="m", choices=[NS(delta=delta, finish_reason=finish_reason)])
+
+
+def _tc(index, id=None, name=None, arguments=None):
+    return NS(index=index, id=id, function=NS(name=name, arguments=arguments))
+
+
+class _FakeClient:
+    def __init__(self, chunks):
+        self.kwargs = None
+        self.chunks = chunks
+        self.chat = NS(completions=NS(create=self._create))
+
+    def _create(self, **kwargs):
+        self.kwargs = kwargs
+        return iter(self.chunks)
+
+
+class TestAccumulateStream(unittest.TestCase):
+    def test_text_deltas_are_forwarded_in_order(self):
+        seen = []
+        resp = chat_stream.accumulate_stream(
+            [_chunk("Hal"), _chunk("lo"), _chunk(None, finish_reason="stop")], seen.append
+        )
+        self.assertEqual(seen, ["Hal", "lo"])
+        msg = resp.choices[0].message
+        self.assertEqual(msg.content, "Hallo")
+        self.assertIsNone(msg.tool_calls)
+        self.assertEqual(resp.choices[0].finish_reason, "stop")
+
+    def test_tool_call_fragments_are_assembled(self):
+        chunks = [
+            _chunk(tool_calls=[_tc(0, "call_a", "vectordb", ""), _tc(1, "call_b", "fetch_url", '{"url":')]),
+            _chunk(tool_calls=[_tc(0, arguments='{"query": "x"')]),
+            _chunk(tool_calls=[_tc(0, arguments="}"), _tc(1, arguments=' "u"}')]),
+            _chunk(finish_reason="tool_calls"),
+        ]
+        msg = chat_stream.accumulate_stream(chunks).choices[0].message
+        self.assertIsNone(msg.content)
+        self.assertEqual([t.id for t in msg.tool_calls], ["call_a", "call_b"])
+        self.assertEqual(msg.tool_calls[0].function.name, "vectordb")
+        self.assertEqual(msg.tool_calls[0].function.arguments, '{"query": "x"}')
+        self.assertEqual(msg.tool_calls[1].function.arguments, '{"url": "u"}')
+
+    def test_dict_chunks_and_failing_callback(self):
+        chunks = [{"choices": [{"delta": {"content": "a"}}]}, {"choices": [{"delta": {"content": "b"}}]}]
+
+        def broken(_text):
+            raise RuntimeError("window closed")
+
+        resp = chat_stream.accumulate_stream(chunks, broken)
+        self.assertEqual(resp.choices[0].message.content, "ab")
+
+    def test_stream_cancelled_propagates(self):
+        seen = []
+
+        def stop(text):
+            seen.append(text)
+            raise chat_stream.StreamCancelled()
+
+        with self.assertRaises(chat_stream.StreamCancelled):
+            chat_stream.accumulate_stream([_chunk("a"), _chunk("b")], stop)
+        self.assertEqual(seen, ["a"])
+
+    def test_create_streamed_sets_stream_flag(self):
+        client = _FakeClient([_chunk("ok")])
+        resp = chat_stream.create_streamed(client, None, model="m", messages=[])
+        self.assertTrue(client.kwargs["stream"])
+        self.assertEqual(resp.choices[0].message.content, "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
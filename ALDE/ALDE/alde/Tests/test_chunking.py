@@ -0,0 +1,125 @@
+"""Unit tests for production module alde.chunking.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/chunking.py.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import textwrap
+import unittest
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import chunking
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import chunking  # type: ignore
+
+
+_HAS_LANGCHAIN = all(importlib.util.find_spec(m) for m in ("langchain_core", "langchain_text_splitters"))
+
+SOURCE = textwrap.dedent(
+    '''\
+    """Module docstring."""
+    import os
+
+    CONST = 1
+
+
+    @decorator
+    def alpha(x):
+        return x + 1
+
+
+    class Beta:
+        """Beta."""
+
+        attr = 2
+
+        def one(self):
+            return 1
+
+        async def two(self):
+            return 2
+
+
+    if __name__ == "__main__":
+        alpha(1)
+    '''
+)
+
+
+def _text(text: str, unit: dict) -> str:
+    return text[unit["start"]:unit["end"]]
+
+
+class TestPythonUnits(unittest.TestCase):
+    def test_top_level_boundaries_and_decorators(self):
+        units = chunking.python_units(SOURCE, max_chars=10_000)
+        self.assertEqual([u["symbol"] for u in units], ["", "alpha", "Beta", ""])
+        self.assertTrue(_text(SOURCE, units[1]).startswith("@decorator\ndef alpha"))
+        self.assertEqual((units[1]["line_start"], units[1]["line_end"]), (7, 9))
+        # Spans cover the file; only whitespace-only gaps are dropped.
+        joined = "".join(_text(SOURCE, u) for u in units)
+        self.assertEqual(joined.split(), SOURCE.split())
+
+    def test_large_class_is_split_per_method(self):
+        units = chunking.python_units(SOURCE, max_chars=40)
+        symbols = [u["symbol"] for u in units]
+        self.assertIn("Beta.one", symbols)
+        self.assertIn("Beta.two", symbols)
+        self.assertIn("Beta", symbols)  # header with docstring + attr
+        two = next(u for u in units if u["symbol"] == "Beta.two")
+        self.assertTrue(_text(SOURCE, two).strip().startswith("async def two"))
+
+    def test_syntax_error_propagates(self):
+        with self.assertRaises(SyntaxError):
+            chunking.python_units("def broken(:\n", max_chars=100)
+
+
+class TestSections(unittest.TestCase):
+    def test_heading_sections(self):
+        page = "Intro text.\n1. Einleitung\nSatz eins.\n2.1 Methoden\nSatz zwei.\nERGEBNISSE\nSatz drei."
+        sections = chunking.heading_sections(page)
+        self.assertEqual([s["section"] for s in sections], ["", "1. Einleitung", "2.1 Methoden", "ERGEBNISSE"])
+        self.assertEqual(_text(page, sections[2]), "2.1 Methoden\nSatz zwei.\n")
+
+    def test_merge_units_respects_budget(self):
+        units = [{"start": 0, "end": 10}, {"start": 10, "end": 30}, {"start": 30, "end": 90}]
+        groups = chunking.merge_units(units, max_chars=40)
+        self.assertEqual([[u["end"] for u in g] for g in groups], [[10, 30], [90]])
+
+
+class TestEmbeddingText(unittest.TestCase):
+    META = {"source": "/x/a.pdf", "titel": "a.pdf", "page": 3, "section": "2.1 Methoden", "id": "0xabc"}
+
+    def test_header_is_compact_prefix(self):
+        self.assertEqual(chunking.metadata_header(self.META), "a.pdf | 2.1 Methoden | S. 3")
+        self.assertEqual(chunking.embedding_text("Text", self.META), "a.pdf | 2.1 Methoden | S. 3\nText")
+        self.assertEqual(chunking.embedding_text("Text", {}), "Text")
+
+    def test_modes(self):
+        self.assertEqual(chunking.embedding_text("Text", self.META, "none"), "Text")
+        full = chunking.embedding_text("Text", self.META, "full")
+        self.assertTrue(full.startswith("Text\n\nMetadata: source: /x/a.pdf | "))
+
+
+@unittest.skipUnless(_HAS_LANGCHAIN, "langchain not installed")
+class TestStructuredSplitter(unittest.TestCase):
+    def test_dispatch_by_type(self):
+        from langchain_core.documents import Document
+
+        splitter = chunking.StructuredSplitter(chunk_size=200, chunk_overlap=0, code_chunk_size=120)
+        py = Document(page_content=SOURCE, metadata={"source": "mod.py"})
+        msg = Document(page_content="hallo " * 10, metadata={"source": "history.json", "role": "user", "message-id": 3})
+        chunks = splitter.split_documents([py, msg])
+        symbols = [c.metadata.get("symbol") for c in chunks if c.metadata["source"] == "mod.py"]
+        self.assertTrue(any("alpha" in (s or "") for s in symbols))
+        self.assertEqual([c for c in chunks if c.metadata["source"] == "history.json"], [msg])
+
+
+if __name__ == "__main__":
+    unittest.main()
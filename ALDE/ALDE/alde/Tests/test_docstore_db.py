@@ -0,0 +1,236 @@
+"""Unit tests for production module alde.docstore_db.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/docstore_db.py.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde.docstore_db import KEEP_GENERATIONS, SQLiteDocstore, _FILTER_FROM, file_identity, metadata_matches
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde.docstore_db import KEEP_GENERATIONS, SQLiteDocstore, _FILTER_FROM, file_identity, metadata_matches  # type: ignore
+
+
+_HAS_LANGCHAIN = importlib.util.find_spec("langchain_core") is not None
+_HAS_VSTORES = all(
+    importlib.util.find_spec(m) is not None
+    for m in ("langchain_community", "langchain_huggingface", "langchain_text_splitters", "sqlalchemy")
+)
+
+
+def _fake_store(docs: dict[str, str]):
+    """Minimal stand-in for langchain's FAISS: docstore._dict + index_to_docstore_id."""
+    return SimpleNamespace(
+        docstore=SimpleNamespace(
+            _dict={i: SimpleNamespace(page_content=t, metadata={"source": f"{i}.txt"}) for i, t in docs.items()}
+        ),
+        index_to_docstore_id=dict(enumerate(docs)),
+    )
+
+
+class TestSQLiteDocstore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "docstore.sqlite"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_sync_is_incremental_and_tracks_positions(self):
+        writer = SQLiteDocstore(self.path)
+        self.assertEqual(writer.sync_from(_fake_store({"a": "A", "b": "B", "c": "C"})), (3, 0))
+        # "a" deleted => FAISS positions shift down by one. The row stays
+        # for readers of the previous generation.
+        self.assertEqual(writer.sync_from(_fake_store({"b": "B", "c": "C", "d": "D"})), (1, 0))
+        for _ in range(KEEP_GENERATIONS - 2):
+            writer.sync_from(_fake_store({"b": "B", "c": "C", "d": "D"}))
+        self.assertEqual(writer.sync_from(_fake_store({"b": "B", "c": "C", "d": "D"})), (0, 1))
+        writer.close()
+
+        reader = SQLiteDocstore(self.path, read_only=True)
+        id_map = reader.id_map()
+        self.assertEqual(len(id_map), 3)
+        self.assertEqual([id_map[p] for p in range(3)], ["b", "c", "d"])
+        with self.assertRaises(KeyError):
+            id_map[3]
+        self.assertEqual(reader.search("a"), "ID a not found.")
+        with self.assertRaises(PermissionError):
+            reader.sync_from(_fake_store({}))
+        reader.close()
+
+    def test_add_is_unpositioned_until_sync(self):
+        store = SQLiteDocstore(self.path)
+        store.add({"x": SimpleNamespace(page_content="X", metadata={})})
+        self.assertEqual(len(store.id_map()), 0)
+        with self.assertRaises(ValueError):
+            store.add({"x": SimpleNamespace(page_content="X", metadata={})})
+        # FAISS.delete() drops "y" from the mapping; the row goes on sync.
+        store.add({"y": SimpleNamespace(page_content="Y", metadata={})})
+        store.delete(["y"])
+        self.assertEqual(store.sync_positions({0: "x"}), (1, 1))
+        self.assertEqual(store.positions(), {0: "x"})
+        store.close()
+
+    def test_reader_keeps_its_generation(self):
+        index_file = Path(self._tmp.name) / "index.faiss"
+        index_file.write_bytes(b"old")
+        writer = SQLiteDocstore(self.path)
+        writer.add({i: SimpleNamespace(page_content=i, metadata={"source": i}) for i in "abc"})
+        writer.sync_positions({0: "a", 1: "b", 2: "c"}, identity=file_identity(index_file))
+
+        # Warm reader of the old index.faiss.
+        reader = SQLiteDocstore(self.path, read_only=True)
+        reader.use_generation(reader.generation_for(file_identity(index_file)))
+
+        # Writer deletes "a" and saves: new file, new numbering.
+        tmp = Path(self._tmp.name) / ".index.faiss.tmp"
+        tmp.write_bytes(b"new index")
+        writer.sync_positions({0: "b", 1: "c"}, identity=file_identity(tmp))
+
+        id_map = reader.id_map()
+        self.assertEqual([id_map[p] for p in range(3)], ["a", "b", "c"])
+        self.assertEqual(reader.filter_positions({"source": "c"}), [2])
+        self.assertIsNotNone(reader._query_one("SELECT 1 FROM docs WHERE id = ?", ("a",)))
+
+        tmp.replace(index_file)
+        fresh = SQLiteDocstore(self.path, read_only=True)
+        self.assertEqual(fresh.generation_for(file_identity(index_file)), writer.generation)
+        fresh.use_generation(fresh.generation_for(file_identity(index_file)))
+        self.assertEqual(fresh.positions(), {0: "b", 1: "c"})
+        self.assertEqual(fresh.filter_positions({"source": "c"}), [1])
+        for conn_owner in (reader, fresh, writer):
+            conn_owner.close()
+
+    def test_appending_saves_stay_in_one_generation(self):
+        index_file = Path(self._tmp.name) / "index.faiss"
+        index_file.write_bytes(b"ab")
+        writer = SQLiteDocstore(self.path)
+        writer.add({i: SimpleNamespace(page_content=i, metadata={"source": i}) for i in "ab"})
+        self.assertEqual(writer.sync_positions({0: "a", 1: "b"}, identity=file_identity(index_file)), (2, 0))
+        first = writer.generation
+
+        reader = SQLiteDocstore(self.path, read_only=True)
+        reader.use_generation(reader.generation_for(file_identity(index_file)), limit=2)
+
+        # Nur angehängt: gleiche Generation, nur die neuen Zeilen.
+        tmp = Path(self._tmp.name) / ".index.faiss.tmp"
+        tmp.write_bytes(b"abcd")
+        writer.add({i: SimpleNamespace(page_content=i, metadata={"source": i}) for i in "cd"})
+        with mock.patch.object(writer, "positions", side_effect=AssertionError("full rewrite")):
+            self.assertEqual(
+                writer.sync_positions({0: "a", 1: "b", 2: "c", 3: "d"}, identity=file_identity(tmp)), (2, 0)
+            )
+        self.assertEqual(writer.generation, first)
+        self.assertEqual(writer.generation_for(file_identity(tmp)), first)
+        rows = writer._query_one("SELECT COUNT(*) FROM positions")[0]
+        self.assertEqual(rows, 4)
+
+        # Der Reader der alten Datei sieht nur die Positionen, die sie enthält.
+        self.assertEqual(len(reader.id_map()), 2)
+        with self.assertRaises(KeyError):
+            reader.id_map()[2]
+        self.assertEqual(reader.filter_positions({"source": ["b", "c"]}), [1])
+
+        # delete() => FAISS nummeriert neu => neue Generation.
+        writer.delete(["a"])
+        self.assertEqual(writer.sync_positions({0: "b", 1: "c", 2: "d"}), (3, 0))
+        self.assertEqual(writer.generation, first + 1)
+        self.assertEqual(reader.id_map()[0], "a")
+        for conn_owner in (reader, writer):
+            conn_owner.close()
+
+    def test_metadata_filter_runs_in_sql(self):
+        store = SQLiteDocstore(self.path)
+        meta = {
+            "a": {"source": "jobs/a.pdf", "applied": False, "thread-id": "t1"},
+            "b": {"source": "jobs/b.pdf", "applied": True, "thread-id": "t1"},
+            "c": {"source": "jobs/c.pdf", "applied": False, "thread-id": "t2"},
+        }
+        store.add({i: SimpleNamespace(page_content=i, metadata=m) for i, m in meta.items()})
+        store.sync_positions({0: "a", 1: "b", 2: "c"})
+
+        self.assertEqual(store.filter_ids({"applied": False}), ["a", "c"])
+        self.assertEqual(store.filter_positions({"applied": False, "thread-id": "t2"}), [2])
+        self.assertEqual(sorted(store.filter_ids({"source": ["jobs/a.pdf", "jobs/b.pdf"]})), ["a", "b"])
+        self.assertEqual(store.filter_ids({"source": []}), [])
+        with self.assertRaises(ValueError):
+            store.filter_ids({"bad'key": 1})
+        sql, params = store._where({"source": "jobs/a.pdf"})
+        plan = store._conn().execute(
+            f"EXPLAIN QUERY PLAN SELECT d.id FROM {_FILTER_FROM} WHERE {sql}",
+            tuple(params),
+        ).fetchall()
+        self.assertIn("docs_meta_source", " ".join(str(r) for r in plan))
+        store.close()
+
+    def test_sql_and_python_filters_agree(self):
+        store = SQLiteDocstore(self.path)
+        meta = {
+            "a": {"thread-id": 1, "applied": True, "role": "user"},
+            "b": {"thread-id": "1", "applied": False, "role": None},
+            "c": {"thread-id": 2.5, "applied": 1},
+            "d": {"thread-id": "t2", "role": "assistant"},
+        }
+        store.add({i: SimpleNamespace(page_content=i, metadata=m) for i, m in meta.items()})
+        store.sync_positions(dict(enumerate(meta)))
+        filters = [
+            {"thread-id": "1"},
+            {"thread-id": 1},
+            {"thread-id": ["1", 2.5]},
+            {"thread-id": "2.5"},
+            {"applied": True},
+            {"applied": "0"},
+            {"role": None},
+            {"role": ["user", "assistant"], "thread-id": "t2"},
+        ]
+        for where in filters:
+            python_ids = [i for i, m in meta.items() if metadata_matches(m, where)]
+            self.assertEqual(store.filter_ids(where), python_ids, where)
+        self.assertEqual(store.filter_ids({"thread-id": "1"}), ["a", "b"])
+        store.close()
+
+    @unittest.skipUnless(_HAS_VSTORES, "vstores dependencies not installed")
+    def test_applied_filter_matches_pdf_metadata(self):
+        try:
+            from ALDE.ALDE.alde import vstores
+        except Exception:
+            from alde import vstores  # type: ignore
+        from langchain_core.documents import Document
+
+        loader = SimpleNamespace(load=lambda: [Document(page_content="Stelle", metadata={})])
+        with mock.patch.object(vstores, "PyPDFLoader", return_value=loader):
+            docs = vstores._load_pdf(Path(self._tmp.name) / "job.pdf")
+        store = SQLiteDocstore(self.path)
+        store.add({"p": docs[0]})
+        store.sync_positions({0: "p"})
+        # The example filter of the vectordb tool (tools.py).
+        self.assertEqual(store.filter_ids({"applied": "no"}), ["p"])
+        self.assertTrue(metadata_matches(docs[0].metadata, {"applied": "no"}))
+        self.assertEqual(store.filter_ids({"applied": False}), [])
+        store.close()
+
+    @unittest.skipUnless(_HAS_LANGCHAIN, "langchain_core not installed")
+    def test_search_returns_document(self):
+        writer = SQLiteDocstore(self.path)
+        writer.sync_from(_fake_store({"x": "hello"}))
+        doc = writer.search("x")
+        self.assertEqual(doc.page_content, "hello")
+        self.assertEqual(doc.metadata, {"source": "x.txt"})
+        self.assertEqual(doc.id, "x")
+        self.assertEqual([d.id for d in writer.iter_documents()], ["x"])
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
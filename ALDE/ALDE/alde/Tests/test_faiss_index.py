@@ -0,0 +1,149 @@
+"""Unit tests for production module alde.faiss_index.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/faiss_index.py.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import unittest
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import faiss_index
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import faiss_index  # type: ignore
+
+
+_HAS_FAISS = all(importlib.util.find_spec(m) for m in ("faiss", "numpy"))
+_HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+class TestFactoryString(unittest.TestCase):
+    def test_known_kinds(self):
+        self.assertEqual(faiss_index.factory_string("flat", 384, 10), "Flat")
+        self.assertEqual(faiss_index.factory_string("HNSW", 384, 10), "HNSW32")
+        self.assertEqual(faiss_index.factory_string("ivf", 384, 1_000_000), "IVF4000,Flat")
+        self.assertEqual(faiss_index.factory_string("ivfpq", 384, 1_000_000), "IVF4000,PQ64")
+        self.assertEqual(faiss_index.factory_string("ivfpq", 96, 1_000_000), "IVF4000,PQ48")
+
+    def test_small_stores_keep_enough_training_points(self):
+        spec = faiss_index.factory_string("ivf", 384, 100)
+        self.assertEqual(spec, "IVF2,Flat")
+        self.assertEqual(faiss_index.factory_string("ivf", 384, 0), "IVF1,Flat")
+
+    def test_raw_factory_string_passes_through(self):
+        self.assertEqual(faiss_index.factory_string("OPQ16,IVF256,PQ16", 384, 10), "OPQ16,IVF256,PQ16")
+
+    def test_index_kind_by_class_name(self):
+        kinds = {
+            "IndexFlatL2": "flat",
+            "IndexIVFFlat": "ivf",
+            "IndexIVFPQ": "ivfpq",
+            "IndexHNSWFlat": "hnsw",
+        }
+        for name, kind in kinds.items():
+            fake = type(name, (), {})()
+            self.assertEqual(faiss_index.index_kind(fake), kind)
+
+    def test_compressed_indexes_are_lossy(self):
+        lossy = {
+            "IndexFlatL2": False,
+            "IndexIVFFlat": False,
+            "IndexHNSWFlat": False,
+            "IndexIVFPQ": True,
+            "IndexIVFScalarQuantizer": True,
+            "IndexHNSWPQ": True,
+            "IndexPreTransform": True,
+        }
+        for name, expected in lossy.items():
+            fake = type(name, (), {})()
+            self.assertEqual(faiss_index.is_lossy(fake), expected, name)
+
+
+@unittest.skipUnless(_HAS_FAISS, "faiss/numpy not installed")
+class TestBuildIndex(unittest.TestCase):
+    def test_rebuild_keeps_order_and_reports_recall(self):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((2000, 32)).astype("float32")
+        flat = faiss_index.build_index("flat", vectors)
+        ivf = faiss_index.build_index("ivf", faiss_index.reconstruct_vectors(flat), train_sample=500)
+        faiss_index.apply_search_params(ivf, nprobe=1000)
+
+        _, ids = ivf.search(vectors[:5], 1)
+        self.assertEqual(ids[:, 0].tolist(), [0, 1, 2, 3, 4])
+
+        report = faiss_index.benchmark(ivf, vectors, k=5, n_queries=20)
+        self.assertEqual(report["kind"], "ivf")
+        self.assertAlmostEqual(report["recall_at_k"], 1.0)
+
+    def test_search_subset_only_returns_candidates(self):
+        import numpy as np
+
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((500, 16)).astype("float32")
+        index = faiss_index.build_index("flat", vectors)
+        candidates = list(range(0, 500, 7))
+        for exact_max in (4096, 0):  # exact scoring vs. IDSelector path
+            dist, pos = faiss_index.search_subset(index, vectors[3], candidates, k=5, exact_max=exact_max)
+            self.assertEqual(len(pos), 5)
+            self.assertTrue(set(pos.tolist()) <= set(candidates))
+            self.assertEqual(list(dist), sorted(dist))
+
+    def test_search_subset_without_direct_map_uses_selector(self):
+        import numpy as np
+        from unittest import mock
+
+        rng = np.random.default_rng(2)
+        vectors = rng.standard_normal((2000, 16)).astype("float32")
+        ivf = faiss_index.build_index("ivf", vectors, train_sample=500)
+        faiss_index.apply_search_params(ivf, nprobe=1000)
+        candidates = list(range(0, 2000, 3))
+        # Wie ein read-only mmap'd Index, der keine Direct-Map bauen darf.
+        with mock.patch.object(faiss_index, "_ensure_direct_map", side_effect=RuntimeError("read-only")):
+            dist, pos = faiss_index.search_subset(ivf, vectors[3], candidates, k=5)
+        self.assertEqual(pos[0], 3)
+        self.assertTrue(set(pos.tolist()) <= set(candidates))
+        self.assertTrue(faiss_index.prepare_for_mmap(ivf))
+
+
+@unittest.skipUnless(_HAS_NUMPY, "numpy not installed")
+class TestSelection(unittest.TestCase):
+    def test_mmr_prefers_diverse_candidates(self):
+        q = [1.0, 0.0]
+        vectors = [[1.0, 0.1], [1.0, 0.12], [1.0, -0.3]]
+        self.assertEqual(faiss_index.mmr_select(q, vectors, k=2), [0, 2])
+        self.assertEqual(faiss_index.mmr_select(q, vectors, k=2, lambda_mult=1.0), [0, 1])
+
+    def test_mmr_groups_dedup_in_same_pass(self):
+        q = [1.0, 0.0]
+        vectors = [[1.0, 0.1], [1.0, 0.12], [1.0, -0.3], [0.0, 1.0]]
+        picked = faiss_index.mmr_select(q, vectors, k=4, groups=[0, 0, 1, 1])
+        self.assertEqual(picked, [0, 2])
+
+    def test_mmr_matches_langchain(self):
+        if importlib.util.find_spec("langchain_community") is None:
+            self.skipTest("langchain_community not installed")
+        import numpy as np
+        from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+        rng = np.random.default_rng(2)
+        vectors = rng.standard_normal((40, 8)).astype("float32")
+        q = rng.standard_normal(8).astype("float32")
+        self.assertEqual(
+            faiss_index.mmr_select(q, vectors, k=10),
+            maximal_marginal_relevance(q, vectors, k=10),
+        )
+
+    def test_best_per_group_keeps_distance_order(self):
+        picked = faiss_index.best_per_group([0.5, 0.1, 0.3, 0.2], [7, 3, 7, 9])
+        self.assertEqual(picked.tolist(), [1, 3, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
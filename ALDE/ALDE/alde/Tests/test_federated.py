@@ -0,0 +1,97 @@
+"""Unit tests for production module alde.federated.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/federated.py.
+"""
+
+from __future__ import annotations
+
+import threading
+import unittest
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import federated
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import federated  # type: ignore
+
+
+def _hit(source: str, score: float, content: str | None = None) -> dict:
+    return {"rank": 0, "score": score, "source": source, "title": source, "page": None,
+            "content": content or f"text of {source}"}
+
+
+class _FakeStore:
+    def __init__(self, hits=None, error=None, barrier=None):
+        self.hits = hits or []
+        self.error = error
+        self.barrier = barrier
+        self.calls = []
+
+    def query(self, query, k, filter_dict):
+        self.calls.append((query, k, filter_dict))
+        if self.barrier is not None:
+            # Beide Stores müssen gleichzeitig laufen, sonst Timeout.
+            self.barrier.wait(timeout=2)
+        if self.error:
+            raise self.error
+        return list(self.hits)
+
+
+class TestNormalize(unittest.TestCase):
+    def test_minmax_per_store(self):
+        rel = federated.normalize_scores([_hit("a", 0.2), _hit("b", 0.6), _hit("c", 1.0)])
+        self.assertEqual([round(r, 3) for r in rel], [1.0, 0.5, 0.0])
+        self.assertEqual(federated.normalize_scores([_hit("a", 7.0)]), [1.0])
+
+    def test_rrf_ignores_scale(self):
+        rel = federated.normalize_scores([_hit("a", 100.0), _hit("b", 200.0)], method="rrf")
+        self.assertEqual(rel[0], 1.0)
+        self.assertLess(rel[1], 1.0)
+
+
+class TestMerge(unittest.TestCase):
+    def test_quota_then_fill(self):
+        results = {
+            "project": [_hit("p1", 0.1), _hit("p2", 0.2), _hit("p3", 0.3), _hit("p4", 0.9)],
+            "history": [_hit("h1", 5.0), _hit("h2", 9.0)],
+        }
+        merged = federated.merge_results(results, k=4)
+        self.assertEqual([m["rank"] for m in merged], [1, 2, 3, 4])
+        self.assertEqual(sum(m["store"] == "history" for m in merged), 2)
+        self.assertEqual(merged[0]["source"], "p1")
+        # Ein leerer Store lässt die Quote nicht verfallen.
+        merged = federated.merge_results({"project": results["project"], "history": []}, k=3)
+        self.assertEqual([m["source"] for m in merged], ["p1", "p2", "p3"])
+
+    def test_explicit_quota_and_dedup(self):
+        shared = _hit("same.py", 0.1, content="dup")
+        results = {"a": [shared, _hit("a2", 0.5)], "b": [dict(shared), _hit("b2", 0.4)]}
+        merged = federated.merge_results(results, k=5, quotas={"a": 1})
+        sources = [m["source"] for m in merged]
+        self.assertEqual(sources.count("same.py"), 1)
+        self.assertEqual(len(merged), 3)  # a2 only via fill, as nothing else is left
+        self.assertEqual(merged[0]["store"], "a")
+
+
+class TestFederatedQuery(unittest.TestCase):
+    def test_concurrent_and_errors_isolated(self):
+        barrier = threading.Barrier(2)
+        stores = {
+            "project": _FakeStore([_hit("p1", 0.1)], barrier=barrier),
+            "memory": _FakeStore([_hit("m1", 0.3)], barrier=barrier),
+            "broken": _FakeStore(error=RuntimeError("index missing")),
+        }
+        out = federated.federated_query(stores, "frage", k=2, filter_dict={"role": "user"})
+        self.assertEqual({m["store"] for m in out["results"]}, {"project", "memory"})
+        self.assertIn("index missing", out["errors"]["broken"])
+        self.assertEqual(stores["project"].calls, [("frage", 2, {"role": "user"})])
+
+    def test_no_stores(self):
+        self.assertEqual(federated.federated_query({}, "q"), {"results": [], "errors": {}})
+
+
+if __name__ == "__main__":
+    unittest.main()
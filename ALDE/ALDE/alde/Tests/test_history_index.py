@@ -0,0 +1,118 @@
+"""Unit tests for production module alde.history_index.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/history_index.py.
+"""
+
+from __future__ import annotations
+
+import random
+import unittest
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import history_index
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import history_index  # type: ignore
+
+
+def _msg(role, content, thread=1, **extra):
+    return {"role": role, "content": content, "thread-id": thread, "name": extra.pop("name", ""), **extra}
+
+
+def _turn(thread, n, answered=True):
+    call_id = f"call_{thread}_{n}"
+    out = [
+        _msg("user", f"frage {n}", thread),
+        _msg("assistant", "[tool calls executed]", thread,
+             tool_calls=[{"id": call_id, "type": "function", "function": {"name": "vectordb", "arguments": "{}"}}]),
+    ]
+    if answered:
+        out.append(_msg("tool", {"hits": n}, thread, tool_call_id=call_id, name=["vectordb"]))
+    out.append(_msg("assistant", f"antwort {n}", thread, name="Primary Assistant"))
+    return out
+
+
+class TestHistoryIndex(unittest.TestCase):
+    def test_tool_pairing_and_normalisation(self):
+        history = _turn(1, 0) + _turn(1, 1, answered=False)
+        index = history_index.HistoryIndex()
+        index.sync(history)
+        out = index.window(1, 15, tool=True)
+        self.assertEqual([m["role"] for m in out],
+                         ["user", "assistant", "tool", "assistant", "user", "assistant", "assistant"])
+        self.assertEqual(out[2], {"role": "tool", "content": '{"hits": 0}', "tool_call_id": "call_1_0", "name": "vectordb"})
+        self.assertNotIn("tool_calls", out[5])  # unanswered call stripped
+        self.assertEqual(out[3]["name"], "Primary Assistant")
+        # without tool=True no tool messages at all
+        self.assertEqual([m["role"] for m in index.window(1, 15)].count("tool"), 0)
+
+    def test_threads_are_separated_and_shared_entries_visible(self):
+        history = [_msg("system", "sys", None)] + _turn(1, 0) + _turn(2, 0) + _turn(1, 1)
+        index = history_index.HistoryIndex()
+        index.sync(history)
+        out = index.window(1, 50, tool=True)
+        self.assertEqual(out[0]["content"], "sys")
+        self.assertTrue(all(m.get("tool_call_id", "call_1").startswith("call_1") for m in out))
+        self.assertEqual(len(out), 1 + 8)
+
+    def test_matches_full_scan(self):
+        rng = random.Random(7)
+        history = [_msg("system", "sys", None)]
+        index = history_index.HistoryIndex(window=40)
+        for n in range(300):
+            history.extend(_turn(rng.choice([1, 2, None]), n, answered=rng.random() < 0.7))
+            index.sync(history)
+            if n % 17 == 0:
+                for depth in (1, 4, 15, 60):
+                    for tool in (False, True):
+                        for f_role in (None, "user"):
+                            got = index.window(1, depth, tool=tool, f_role=f_role)
+                            if got is None:
+                                continue
+                            want = history_index.HistoryIndex.scan(history, 1, depth, tool=tool, f_role=f_role)
+                            self.assertEqual(got, want, (n, depth, tool, f_role))
+
+    def test_short_ring_buffer_falls_back(self):
+        history = [m for n in range(10) for m in _turn(1, n)]
+        index = history_index.HistoryIndex(window=4)
+        index.sync(history)
+        self.assertIsNone(index.window(1, 30, tool=True))
+        self.assertEqual(len(index.window(1, 3, tool=True)), 3)
+
+    def test_evicted_tool_response_falls_back(self):
+        # Thread 1's response is pushed out of the tool LRU by thread 2.
+        history = _turn(1, 0) + _turn(2, 0) + _turn(2, 1)
+        index = history_index.HistoryIndex(tool_index=2)
+        index.sync(history)
+        self.assertIsNone(index.window(1, 15, tool=True))
+        self.assertEqual(len(index.window(1, 15)), 3)
+        self.assertEqual(index.window(2, 15, tool=True),
+                         history_index.HistoryIndex.scan(history, 2, 15, tool=True))
+        # An unanswered call logged after the eviction needs no fallback.
+        history += _turn(1, 1, answered=False)
+        index.sync(history)
+        self.assertIsNone(index.window(1, 15, tool=True))
+        self.assertEqual(len(index.window(1, 3, tool=True)), 3)
+
+    def test_replaced_list_is_reindexed_and_results_are_copies(self):
+        index = history_index.HistoryIndex()
+        index.sync(_turn(1, 0))
+        fresh = _turn(1, 5)
+        index.sync(fresh)
+        out = index.window(1, 15, tool=True)
+        self.assertEqual(out[0]["content"], "frage 5")
+        out[0]["content"] = "changed"
+        self.assertEqual(index.window(1, 15, tool=True)[0]["content"], "frage 5")
+
+    def test_truncation(self):
+        big = "x" * (history_index.CONTENT_MAX_CHARS + 10)
+        index = history_index.HistoryIndex()
+        index.sync([_msg("user", big)])
+        self.assertTrue(index.window(1, 1)[0]["content"].endswith("[TRUNCATED]"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Unit tests for production module alde.history_journal.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/history_journal.py.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import history_journal
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import history_journal  # type: ignore
+
+
+def _m(i: int) -> dict:
+    return {"message-id": i, "role": "user", "content": f"nachricht {i}"}
+
+
+class TestHistoryJournal(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.snapshot = Path(tmp.name) / "history.json"
+        self.journal = history_journal.HistoryJournal(str(self.snapshot))
+        self.addCleanup(self.journal.close)
+
+    def test_existing_snapshot_is_used_as_is(self):
+        self.snapshot.write_text(json.dumps([_m(1), _m(2)]), encoding="utf-8")
+        self.journal.append(_m(3))
+        self.assertEqual(self.journal.load(), [_m(1), _m(2), _m(3)])
+        self.assertTrue(self.journal.path.endswith("history.jsonl"))
+        # snapshot untouched until compaction
+        self.assertEqual(len(json.loads(self.snapshot.read_text(encoding="utf-8"))), 2)
+
+    def test_append_only_writes_one_line(self):
+        self.journal.append(_m(1))
+        self.journal.append({"role": "tool", "content": object()})
+        lines = Path(self.journal.path).read_text(encoding="utf-8").splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0]), _m(1))
+        self.assertTrue(json.loads(lines[1])["content"].startswith("[builtins.object]"))
+        self.assertEqual(self.journal.records, 2)
+
+    def test_background_compaction(self):
+        self.snapshot.write_text(json.dumps([_m(1)]), encoding="utf-8")
+        for i in (2, 3):
+            self.journal.append(_m(i))
+        self.assertTrue(self.journal.compact_async())
+        self.journal.wait(5)
+        self.journal.append(_m(4))
+        self.assertEqual(json.loads(self.snapshot.read_text(encoding="utf-8")), [_m(1), _m(2), _m(3)])
+        self.assertFalse(os.path.exists(self.journal.segment_path))
+        self.assertEqual(self.journal.records, 1)
+        self.assertEqual(self.journal.load(), [_m(1), _m(2), _m(3), _m(4)])
+
+    def test_interrupted_compaction_is_not_applied_twice(self):
+        # crash after the snapshot was written but before the segment was removed
+        self.snapshot.write_text(json.dumps([_m(1), _m(2)]), encoding="utf-8")
+        Path(self.journal.segment_path).write_text(json.dumps(_m(2)) + "\n", encoding="utf-8")
+        self.journal.append(_m(3))
+        self.assertEqual(self.journal.load(), [_m(1), _m(2), _m(3)])
+        self.journal.compact()
+        self.assertEqual(json.loads(self.snapshot.read_text(encoding="utf-8")), [_m(1), _m(2)])
+        self.journal.compact()
+        self.assertEqual(json.loads(self.snapshot.read_text(encoding="utf-8")), [_m(1), _m(2), _m(3)])
+
+    def test_torn_last_line_is_ignored(self):
+        self.journal.append(_m(1))
+        self.journal.close()
+        with open(self.journal.path, "a", encoding="utf-8") as fp:
+            fp.write('{"message-id": 2, "ro')
+        self.assertEqual(self.journal.load(), [_m(1)])
+
+    def test_reset_writes_snapshot_and_drops_journal(self):
+        self.journal.append(_m(1))
+        self.journal.reset(lambda: [_m(1), _m(2)])
+        self.assertFalse(os.path.exists(self.journal.path))
+        self.assertEqual(self.journal.load(), [_m(1), _m(2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Unit tests for production module alde.onnx_embed.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/onnx_embed.py.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import onnx_embed
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import onnx_embed  # type: ignore
+
+
+_HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+class _ListEmbedder:
+    """LangChain-style embedder returning fixed vectors per text."""
+
+    def __init__(self, table: dict[str, list[float]]):
+        self.table = table
+
+    def embed_documents(self, texts):
+        return [self.table[t] for t in texts]
+
+
+class TestExportLayout(unittest.TestCase):
+    def test_is_exported_needs_tokenizer_and_model(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            d = Path(tmp)
+            self.assertFalse(onnx_embed.is_exported(d))
+            (d / onnx_embed.TOKENIZER_FILE).write_text("{}", encoding="utf-8")
+            (d / onnx_embed.MODEL_FILE).write_bytes(b"")
+            self.assertFalse(onnx_embed.is_exported(d))
+            self.assertTrue(onnx_embed.is_exported(d, quantized=False))
+            (d / onnx_embed.QUANTIZED_MODEL_FILE).write_bytes(b"")
+            self.assertTrue(onnx_embed.is_exported(d))
+
+    def test_rag_core_import_does_not_load_torch(self):
+        code = (
+            "import sys\n"
+            "try:\n"
+            "    from ALDE.ALDE.alde import rag_core, onnx_embed\n"
+            "except Exception:\n"
+            "    from alde import rag_core, onnx_embed\n"
+            "print(sorted(m for m in ('torch', 'sentence_transformers') if m in sys.modules))\n"
+        )
+        repo_root = Path(__file__).resolve().parents[4]
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=repo_root, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertEqual(out.stdout.strip().splitlines()[-1], "[]")
+
+
+@unittest.skipUnless(_HAS_NUMPY, "numpy not installed")
+class TestParityAndBenchmark(unittest.TestCase):
+    def test_parity_threshold(self):
+        ref = _ListEmbedder({"a": [1.0, 0.0], "b": [0.0, 1.0]})
+        close = _ListEmbedder({"a": [0.99, 0.01], "b": [0.0, 2.0]})
+        far = _ListEmbedder({"a": [1.0, 0.0], "b": [1.0, 0.2]})
+
+        ok = onnx_embed.parity_check(close, ref, texts=["a", "b"], threshold=0.99)
+        self.assertTrue(ok["passed"])
+        self.assertGreater(ok["min_cosine"], 0.99)
+
+        bad = onnx_embed.parity_check(far, ref, texts=["a", "b"], threshold=0.99)
+        self.assertFalse(bad["passed"])
+        self.assertAlmostEqual(bad["mean_cosine"], (1.0 + 0.2 / (1.04 ** 0.5)) / 2, places=5)
+
+    def test_benchmark_reports_throughput(self):
+        emb = _ListEmbedder({t: [1.0, 2.0] for t in ("x", "y", "z")})
+        report = onnx_embed.benchmark({"fake": emb}, ["x", "y", "z"], repeat=2)
+        self.assertEqual(report["fake"]["texts"], 3)
+        self.assertGreater(report["fake"]["texts_per_s"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Unit tests for production module alde.query_cache.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/query_cache.py.
+"""
+
+from __future__ import annotations
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde.query_cache import LRUCache, QueryCache, flush_all
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde.query_cache import LRUCache, QueryCache, flush_all  # type: ignore
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)  # "b" is now the oldest
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_zero_size_disables(self):
+        cache = LRUCache(0)
+        cache.put("a", 1)
+        self.assertEqual(len(cache), 0)
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_payload_key_is_order_independent(self):
+        k1 = QueryCache.payload_key((1, 2), "q", 3, filter={"a": 1, "b": 2}, dedup=True)
+        k2 = QueryCache.payload_key((1, 2), "q", 3, dedup=True, filter={"b": 2, "a": 1})
+        self.assertEqual(k1, k2)
+
+    def test_payload_is_copied(self):
+        cache = QueryCache()
+        key = cache.payload_key((1, 2), "q", 3)
+        cache.put_payload(key, [{"rank": 1, "content": "x"}])
+        hit = cache.get_payload(key)
+        hit[0]["content"] = "mutated"
+        self.assertEqual(cache.get_payload(key)[0]["content"], "x")
+
+    def test_version_change_drops_payloads_but_keeps_embeddings(self):
+        cache = QueryCache()
+        cache.ensure_version((1, 100))
+        key = cache.payload_key((1, 100), "q", 3)
+        cache.put_payload(key, [{"rank": 1}])
+        cache.put_embedding("model", "q", [0.5, 0.25])
+
+        cache.ensure_version((1, 100))
+        self.assertIsNotNone(cache.get_payload(key))
+
+        cache.ensure_version((2, 120))
+        self.assertIsNone(cache.get_payload(key))
+        self.assertEqual(cache.get_embedding("model", "q"), [0.5, 0.25])
+
+    def test_persisted_cache_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "query_cache.json"
+            cache = QueryCache(persist_path=path)
+            key = cache.payload_key((7, 8), "frage", 2, filter={"source": "a.pdf"})
+            cache.put_embedding("model", "frage", [1.0, 2.0])
+            cache.put_payload(key, [{"rank": 1, "source": "a.pdf"}])
+            cache.flush()
+
+            reloaded = QueryCache(persist_path=path)
+            self.assertEqual(reloaded.get_payload(key), [{"rank": 1, "source": "a.pdf"}])
+            self.assertEqual(reloaded.get_embedding("model", "frage"), [1.0, 2.0])
+
+    def test_persistence_is_debounced(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "query_cache.json"
+            cache = QueryCache(persist_path=path, save_delay=60)
+            for i in range(5):
+                cache.put_payload(cache.payload_key(1, f"q{i}", 2), [{"rank": 1}])
+            self.assertFalse(path.exists())
+            flush_all()
+            self.assertEqual(len(QueryCache(persist_path=path).payloads), 5)
+            mtime = path.stat().st_mtime_ns
+            cache.flush()  # nothing changed since
+            self.assertEqual(path.stat().st_mtime_ns, mtime)
+
+    def test_timer_writes_after_delay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "query_cache.json"
+            cache = QueryCache(persist_path=path, save_delay=0.05)
+            cache.put_payload(cache.payload_key(1, "q", 2), [{"rank": 1}])
+            deadline = time.monotonic() + 5
+            while not path.exists() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(path.exists())
+            self.assertIsNone(cache._timer)
+
+
+if __name__ == "__main__":
+    unittest.main()
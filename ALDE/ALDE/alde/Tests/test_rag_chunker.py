@@ -0,0 +1,74 @@
+"""Unit tests for the document chunker in production module alde.rag_core.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/rag_core.py (offset-based, streaming DocumentChunker).
+"""
+
+from __future__ import annotations
+
+import time
+import types
+import unittest
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import rag_core
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import rag_core  # type: ignore
+
+
+def _chunker(**config) -> rag_core.DocumentChunker:
+    return rag_core.DocumentChunker(rag_core.ChunkingConfig(**config))
+
+
+def _paragraphs(n: int) -> str:
+    return "\n\n".join(f"Absatz {i}: " + "wort " * 30 for i in range(n))
+
+
+class TestDocumentChunker(unittest.TestCase):
+    def test_chunks_are_slices_within_budget(self):
+        text = _paragraphs(40)
+        chunks = _chunker(chunk_size=400, chunk_overlap=80).chunk(text, "a.txt", "A")
+        self.assertGreater(len(chunks), 5)
+        for i, c in enumerate(chunks):
+            self.assertEqual(c["chunk_index"], i)
+            self.assertEqual(c["content"], text[c["start"]:c["end"]])
+            self.assertLessEqual(c["size"], 400)
+            self.assertEqual((c["source"], c["title"]), ("a.txt", "A"))
+        # Neighbouring chunks overlap and together cover the whole text.
+        for prev, cur in zip(chunks, chunks[1:]):
+            self.assertLess(cur["start"], prev["end"])
+        self.assertEqual(chunks[0]["start"], 0)
+        self.assertEqual(chunks[-1]["end"], len(text.rstrip()))
+
+    def test_prefers_paragraph_breaks(self):
+        text = _paragraphs(10)
+        for c in _chunker(chunk_size=500, chunk_overlap=0).chunk(text):
+            self.assertTrue(c["content"].startswith("Absatz"), c["content"][:20])
+
+    def test_long_paragraph_is_split(self):
+        text = "x" * 5000
+        chunks = _chunker(chunk_size=1000, chunk_overlap=0).chunk(text)
+        self.assertEqual([c["size"] for c in chunks], [1000] * 5)
+
+    def test_is_a_generator(self):
+        gen = _chunker().iter_chunks(_paragraphs(3))
+        self.assertIsInstance(gen, types.GeneratorType)
+        self.assertEqual(list(_chunker().iter_chunks("")), [])
+
+    def test_token_budget_estimate(self):
+        chunks = _chunker(chunk_size=4000, chunk_overlap=0, max_tokens=50).chunk(_paragraphs(20))
+        self.assertTrue(all(c["size"] <= 50 * rag_core.CHARS_PER_TOKEN for c in chunks))
+
+    def test_large_document_is_linear(self):
+        text = _paragraphs(20_000)  # ~3.5 MB
+        t0 = time.perf_counter()
+        count = sum(1 for _ in _chunker(chunk_size=1000, chunk_overlap=150).iter_chunks(text))
+        self.assertGreater(count, 3000)
+        self.assertLess(time.perf_counter() - t0, 10.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""Unit tests for the embedding engine in production module alde.rag_core.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/rag_core.py (batching + persistent embedding cache).
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import rag_core
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import rag_core  # type: ignore
+
+
+_HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+class _FakeModel:
+    """Stands in for a SentenceTransformer; records every encode() call."""
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts, **_kwargs):
+        self.calls.append(list(texts))
+        return _Rows([[float(len(t)), 1.0] for t in texts])
+
+
+class _Rows(list):
+    def tolist(self):
+        return list(self)
+
+
+def _engine(cache_path: Path | None, **config) -> rag_core.EmbeddingEngine:
+    engine = rag_core.EmbeddingEngine(
+        rag_core.EmbeddingConfig(backend="none", cache_path=str(cache_path) if cache_path else None, **config)
+    )
+    engine._backend_ready = True
+    engine.model = _FakeModel()
+    engine.backend_type = "sentence-transformers"
+    return engine
+
+
+class _FakeOpenAI:
+    """OpenAI client stand-in; `fail` makes every embeddings.create raise."""
+
+    instances: list["_FakeOpenAI"] = []
+
+    def __init__(self, api_key=None, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.embeddings = SimpleNamespace(create=self._create)
+        _FakeOpenAI.instances.append(self)
+
+    def _create(self, input, model):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("401 invalid api key")
+        items = [input] if isinstance(input, str) else input
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(t)), 0.0]) for t in items])
+
+
+class TestTokenBatches(unittest.TestCase):
+    def test_sorted_by_length_and_budgeted(self):
+        texts = ["a" * 40, "b" * 4, "c" * 400, "d" * 8]
+        batches = rag_core._token_batches(texts, max_tokens=20, max_items=2)
+        self.assertEqual(batches, [[1, 3], [0], [2]])
+        self.assertEqual(sorted(i for b in batches for i in b), [0, 1, 2, 3])
+
+
+class TestEmbeddingEngine(unittest.TestCase):
+    def test_duplicates_are_embedded_once_in_order(self):
+        engine = _engine(None)
+        out = engine.embed_texts(["xx", "y", "xx"])
+        self.assertEqual(out, [[2.0, 1.0], [1.0, 1.0], [2.0, 1.0]])
+        self.assertEqual(sum(len(c) for c in engine.model.calls), 2)
+
+    def test_persistent_cache_skips_model(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "embedding_cache.sqlite"
+            first = _engine(path)
+            self.assertEqual(first.embed_texts(["hello", "world!"]), [[5.0, 1.0], [6.0, 1.0]])
+            first.cache.close()
+
+            second = _engine(path)
+            self.assertEqual(second.embed_texts(["world!", "new"]), [[6.0, 1.0], [3.0, 1.0]])
+            self.assertEqual(second.model.calls, [["new"]])
+            second.cache.close()
+
+    def test_dummy_vectors_are_not_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = _engine(Path(tmp) / "c.sqlite")
+            engine.model = None
+            engine.embed_texts(["abc"])
+            self.assertEqual(engine.cache.get_many(engine.cache_key, [rag_core._text_hash("abc")]), {})
+            engine.cache.close()
+
+    @unittest.skipUnless(_HAS_NUMPY, "numpy not installed")
+    def test_array_path_matches_lists_and_reads_cache(self):
+        import numpy as np
+
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = _engine(Path(tmp) / "c.sqlite")
+            engine.model.encode = lambda texts, **_kw: np.array(
+                [[float(len(t)), 1.0] for t in texts], dtype=np.float32
+            )
+            first = engine.embed_texts_array(["abc", "de", "abc"])
+            self.assertEqual(first.dtype, np.float32)
+            self.assertTrue(first.flags["C_CONTIGUOUS"])
+            self.assertEqual(first.tolist(), [[3.0, 1.0], [2.0, 1.0], [3.0, 1.0]])
+
+            engine.model = None  # everything must now come from the cache
+            again = engine.embed_texts_array(["de", "abc"], normalize=True)
+            np.testing.assert_allclose(np.linalg.norm(again, axis=1), [1.0, 1.0], rtol=1e-6)
+            self.assertEqual(engine.embed_texts(["de"]), [[2.0, 1.0]])
+            engine.cache.close()
+
+
+class TestLazyBackend(unittest.TestCase):
+    def setUp(self):
+        _FakeOpenAI.instances = []
+        rag_core._PROBE_RESULTS.clear()
+
+    def _openai_engine(self, fail: bool, probe_path: Path | None = None):
+        factory = lambda api_key=None: _FakeOpenAI(api_key, fail=fail)
+        patches = (
+            mock.patch.object(rag_core, "_HAS_OPENAI_EMBEDDINGS", True),
+            mock.patch.object(rag_core, "OpenAI", factory, create=True),
+        )
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        return rag_core.EmbeddingEngine(
+            rag_core.EmbeddingConfig(
+                backend="openai",
+                openai_api_key="sk-test",
+                probe_cache_path=str(probe_path) if probe_path else None,
+            )
+        )
+
+    def test_construction_makes_no_request(self):
+        engine = self._openai_engine(fail=False)
+        self.assertEqual(_FakeOpenAI.instances, [])
+        self.assertEqual(engine.embed_query("abc"), [3.0, 0.0])
+        self.assertEqual(engine.backend_type, "openai")
+        self.assertEqual(_FakeOpenAI.instances[0].calls, 1)
+
+    def test_failed_probe_falls_back_and_is_remembered(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            probe = Path(tmp) / "probe.json"
+            engine = self._openai_engine(fail=True, probe_path=probe)
+            self.assertEqual(len(engine.embed_texts(["a", "bb"])), 2)
+            self.assertEqual(engine.backend_type, "dummy")
+            self.assertIsNone(engine.openai_client)
+            self.assertTrue(probe.exists())
+
+            # New process: only the on-disk result is left.
+            rag_core._PROBE_RESULTS.clear()
+            again = self._openai_engine(fail=True, probe_path=probe)
+            again.embed_query("x")
+            self.assertEqual(len(_FakeOpenAI.instances), 1)
+            self.assertEqual(again.backend_type, "dummy")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Unit tests for write-behind persistence in production module alde.rag_core.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/rag_core.py (VectorStoreManager.flush / autoflush).
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde import rag_core
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde import rag_core  # type: ignore
+
+
+class _FakeModel:
+    def encode(self, texts, **_kwargs):
+        return _Rows([[float(len(t)), 1.0] for t in texts])
+
+
+class _Rows(list):
+    def tolist(self):
+        return list(self)
+
+
+def _manager(store: Path, **persistence) -> rag_core.VectorStoreManager:
+    engine = rag_core.EmbeddingEngine(rag_core.EmbeddingConfig(backend="none", cache_path=None))
+    engine._backend_ready = True
+    engine.model = _FakeModel()
+    engine.backend_type = "sentence-transformers"
+    return rag_core.VectorStoreManager(
+        str(store),
+        engine,
+        persistence_config=rag_core.PersistenceConfig(write_behind=True, **persistence),
+    )
+
+
+def _indexed_sources(store: Path) -> list[str]:
+    path = store / "manifest.json"
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8"))["indexed_sources"]
+
+
+class TestWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = Path(self._tmp.name) / "store"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_deadline_flushes_without_further_add(self):
+        manager = _manager(self.store, autoflush_documents=0, autoflush_seconds=0.1)
+        manager.add_document("hello world", source="a.txt")
+        self.assertTrue(manager.dirty)
+        self.assertEqual(_indexed_sources(self.store), [])
+
+        deadline = time.monotonic() + 5
+        while manager.dirty and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertFalse(manager.dirty)
+        self.assertEqual(_indexed_sources(self.store), ["a.txt"])
+
+    def test_exit_hook_flushes_pending_documents(self):
+        manager = _manager(self.store, autoflush_documents=0, autoflush_seconds=0)
+        manager.add_document("hello world", source="b.txt")
+        self.assertTrue(manager.dirty)
+        self.assertIsNone(manager._flush_timer)
+
+        rag_core._flush_write_behind()
+        self.assertFalse(manager.dirty)
+        self.assertEqual(_indexed_sources(self.store), ["b.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
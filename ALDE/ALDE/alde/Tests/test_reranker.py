@@ -0,0 +1,103 @@
+"""Unit tests for production module alde.reranker.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/reranker.py.
+"""
+
+from __future__ import annotations
+
+import time
+import unittest
+from types import SimpleNamespace
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde.reranker import CrossEncoderReranker
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde.reranker import CrossEncoderReranker  # type: ignore
+
+
+class _FakeCrossEncoder:
+    """Scores a pair by the number of 'x' in the chunk; records batches."""
+
+    def __init__(self, delay: float = 0.0):
+        self.batches: list[list[tuple[str, str]]] = []
+        self.delay = delay
+
+    def predict(self, inputs, **_kwargs):
+        self.batches.append(list(inputs))
+        if self.delay:
+            time.sleep(self.delay)
+        return [float(text.count("x")) for _, text in inputs]
+
+
+def _doc(doc_id: str, text: str):
+    return SimpleNamespace(id=doc_id, page_content=text, metadata={})
+
+
+def _pairs():
+    # (doc, FAISS distance): distance order a, b, c, d
+    return [(_doc("c", "xxx"), 0.3), (_doc("a", "x"), 0.1), (_doc("d", "xxxx"), 0.4), (_doc("b", "xx"), 0.2)]
+
+
+class TestCrossEncoderReranker(unittest.TestCase):
+    def _reranker(self, model, **kw):
+        kw.setdefault("budget_ms", 0)
+        return CrossEncoderReranker("fake", loader=lambda: model, **kw)
+
+    def test_top_n_batches_and_tail_order(self):
+        model = _FakeCrossEncoder()
+        rr = self._reranker(model, max_candidates=3, batch_size=2, max_length=8)
+        out, stats = rr.rerank("q", _pairs())
+        self.assertEqual([d.id for d, _ in out], ["c", "b", "a", "d"])
+        self.assertEqual([len(b) for b in model.batches], [2, 1])
+        self.assertEqual(stats["scored"], 3)
+
+    def test_scores_are_cached_per_query_and_chunk(self):
+        model = _FakeCrossEncoder()
+        rr = self._reranker(model)
+        rr.rerank("q", _pairs())
+        _, stats = rr.rerank("q", _pairs())
+        self.assertEqual(len(model.batches), 1)
+        self.assertEqual(stats["cached"], 4)
+        rr.rerank("other", _pairs())
+        self.assertEqual(len(model.batches), 2)
+
+    def test_truncates_long_chunks(self):
+        model = _FakeCrossEncoder()
+        rr = self._reranker(model, max_length=8)
+        rr.rerank("q", [(_doc("long", "y" * 10_000), 0.1)])
+        self.assertEqual(len(model.batches[0][0][1]), 8 * 8)
+
+    def test_budget_exceeded_degrades_to_distance_order(self):
+        model = _FakeCrossEncoder(delay=0.02)
+        rr = self._reranker(model, batch_size=1, budget_ms=5)
+        out, stats = rr.rerank("q", _pairs())
+        self.assertEqual([d.id for d, _ in out], ["a", "b", "c", "d"])
+        self.assertTrue(stats["degraded"])
+        self.assertLess(len(model.batches), 4)
+
+    def test_missing_model_degrades(self):
+        def broken():
+            raise ImportError("sentence_transformers")
+
+        rr = CrossEncoderReranker("fake", loader=broken)
+        out, stats = rr.rerank("q", _pairs())
+        self.assertEqual([d.id for d, _ in out], ["a", "b", "c", "d"])
+        self.assertTrue(stats["degraded"])
+        self.assertFalse(rr.warmup())
+
+    def test_stats_are_per_call(self):
+        model = _FakeCrossEncoder()
+        rr = self._reranker(model)
+        _, first = rr.rerank("q", _pairs())
+        _, second = rr.rerank("q", _pairs())
+        self.assertEqual((first["scored"], first["cached"]), (4, 0))
+        self.assertEqual((second["scored"], second["cached"]), (0, 4))
+        self.assertFalse(hasattr(rr, "last_stats"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Unit tests for production module alde.task_scheduler.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/task_scheduler.py.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import threading
+import time
+import unittest
+
+
+_HAS_QT = importlib.util.find_spec("PySide6") is not None
+
+if _HAS_QT:
+    from PySide6.QtCore import QCoreApplication
+
+    try:
+        # When run as a module from repo root (common in this repo)
+        from ALDE.ALDE.alde import task_scheduler
+    except Exception:
+        # Fallback for alternative PYTHONPATH layouts
+        from alde import task_scheduler  # type: ignore
+
+
+def _wait_for(predicate, timeout: float = 3.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        QCoreApplication.processEvents()
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@unittest.skipUnless(_HAS_QT, "PySide6 not installed")
+class TestTaskScheduler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        self.scheduler = task_scheduler.TaskScheduler(lanes={"chat": 1, "image": 2})
+        self.addCleanup(self.scheduler.shutdown)
+
+    def test_result_and_progress_delivered_in_gui_thread(self):
+        main = threading.get_ident()
+        seen, done = [], []
+
+        def run(task):
+            task.progress("a")
+            task.progress("b")
+            return threading.get_ident()
+
+        self.scheduler.submit("t", run, on_progress=lambda t: seen.append((t, threading.get_ident())),
+                              on_done=done.append)
+        self.assertTrue(_wait_for(lambda: done))
+        self.assertNotEqual(done[0], main)
+        self.assertEqual(seen, [("a", main), ("b", main)])
+        self.assertEqual(self.scheduler.tasks(), [])
+
+    def test_chat_lane_is_serial_and_queue_visible(self):
+        gate = threading.Event()
+        done = []
+        self.scheduler.submit("first", lambda t: gate.wait(2) and "1", on_done=done.append)
+        self.scheduler.submit("second", lambda t: "2", on_done=done.append)
+        self.assertTrue(_wait_for(lambda: [t.state for t in self.scheduler.tasks()] == ["running", "queued"]))
+        gate.set()
+        self.assertTrue(_wait_for(lambda: len(done) == 2))
+        self.assertEqual(done, ["1", "2"])
+
+    def test_cancel_queued_and_running(self):
+        gate = threading.Event()
+        cancelled, done = [], []
+
+        def slow(task):
+            while not gate.is_set():
+                task.progress(".")
+                time.sleep(0.01)
+            return "late"
+
+        first = self.scheduler.submit("slow", slow, on_done=done.append,
+                                      on_cancel=lambda: cancelled.append("slow"))
+        second = self.scheduler.submit("queued", lambda t: "x", on_done=done.append,
+                                       on_cancel=lambda: cancelled.append("queued"))
+        self.assertTrue(_wait_for(lambda: self.scheduler.tasks()[0].state == "running"))
+        self.scheduler.cancel(second)
+        self.scheduler.cancel(first)
+        self.assertTrue(_wait_for(lambda: len(cancelled) == 2))
+        gate.set()
+        self.assertEqual(sorted(cancelled), ["queued", "slow"])
+        self.assertEqual(done, [])
+
+    def test_error_reported(self):
+        errors = []
+
+        def boom(task):
+            raise ValueError("kaputt")
+
+        self.scheduler.submit("boom", boom, lane="image", on_error=errors.append)
+        self.assertTrue(_wait_for(lambda: errors))
+        self.assertIn("kaputt", errors[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Unit tests for concurrent tool-call execution in production module alde.agents_factory.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/agents_factory.py (execute_tool_calls, _handle_tool_calls).
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+
+_HAS_OPENAI = importlib.util.find_spec("openai") is not None
+
+if _HAS_OPENAI:
+    try:
+        # When run as a module from repo root (common in this repo)
+        from ALDE.ALDE.alde import agents_factory
+    except Exception:
+        # Fallback for alternative PYTHONPATH layouts
+        from alde import agents_factory  # type: ignore
+
+
+@unittest.skipUnless(_HAS_OPENAI, "openai not installed")
+class TestExecuteToolCalls(unittest.TestCase):
+    def setUp(self):
+        self.events: list[tuple[str, str]] = []
+        self.lock = threading.Lock()
+
+        def fake_execute(name, args, tool_call_id=None):
+            with self.lock:
+                self.events.append(("start", tool_call_id))
+            time.sleep(args.get("sleep", 0.05))
+            with self.lock:
+                self.events.append(("end", tool_call_id))
+            if args.get("fail"):
+                raise RuntimeError("boom")
+            return f"{name}:{tool_call_id}", None
+
+        concurrency = {"vectordb": "pure", "fetch_url": "pure", "write_document": "serial"}
+        patches = [
+            mock.patch.object(agents_factory, "execute_tool", side_effect=fake_execute),
+            mock.patch.object(agents_factory, "tool_concurrency", side_effect=lambda n: concurrency[n]),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_pure_calls_overlap_and_keep_order(self):
+        calls = [("vectordb", {"sleep": 0.2}, "a"), ("fetch_url", {}, "b"), ("vectordb", {}, "c")]
+        t0 = time.perf_counter()
+        out = agents_factory.execute_tool_calls(calls, max_workers=4)
+        self.assertLess(time.perf_counter() - t0, 0.29)
+        self.assertEqual([r for r, _ in out], ["vectordb:a", "fetch_url:b", "vectordb:c"])
+
+    def test_serial_call_is_a_barrier(self):
+        calls = [("vectordb", {}, "a"), ("write_document", {}, "w"), ("fetch_url", {}, "b")]
+        agents_factory.execute_tool_calls(calls, max_workers=4)
+        order = [e for e in self.events]
+        self.assertLess(order.index(("end", "a")), order.index(("start", "w")))
+        self.assertLess(order.index(("end", "w")), order.index(("start", "b")))
+
+    def test_errors_stay_in_their_slot(self):
+        calls = [("vectordb", {"fail": True}, "a"), ("fetch_url", {}, "b")]
+        out = agents_factory.execute_tool_calls(calls, max_workers=2)
+        self.assertIn("boom", out[0][0])
+        self.assertEqual(out[1][0], "fetch_url:b")
+
+
+@unittest.skipUnless(_HAS_OPENAI, "openai not installed")
+class TestCancelledToolRound(unittest.TestCase):
+    def test_cancelled_followup_is_not_logged_as_failure(self):
+        # _handle_tool_calls imports ChatComE from this module path.
+        chat_completion = importlib.import_module("ALDE.ALDE.alde.chat_completion")
+        history = mock.Mock()
+        history._insert.return_value = [{"role": "user", "content": "q"}]
+        followup = mock.Mock()
+        followup._response.side_effect = agents_factory.StreamCancelled()
+        call = SimpleNamespace(id="c1", function=SimpleNamespace(name="vectordb", arguments="{}"))
+        msg = SimpleNamespace(content="", tool_calls=[call])
+
+        with mock.patch.object(agents_factory, "get_history", return_value=history), \
+                mock.patch.object(agents_factory, "execute_tool_calls", return_value=[("hits", None)]), \
+                mock.patch.object(chat_completion, "ChatComE", return_value=followup):
+            with self.assertRaises(agents_factory.StreamCancelled):
+                agents_factory._handle_tool_calls(msg, agent_label="")
+
+        logged = [str(c.kwargs.get("_content")) for c in history._log.call_args_list]
+        self.assertFalse(any("Follow-up model call failed" in text for text in logged))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+"""Unit tests for production module alde.vdb_pool.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/vdb_pool.py.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import unittest
+from unittest import mock
+
+
+try:
+    # When run as a module from repo root (common in this repo)
+    from ALDE.ALDE.alde.vdb_pool import WarmWorker, WorkerPool
+except Exception:
+    # Fallback for alternative PYTHONPATH layouts
+    from alde.vdb_pool import WarmWorker, WorkerPool  # type: ignore
+
+try:
+    from ALDE.ALDE.alde import tools
+except Exception:
+    try:
+        from alde import tools  # type: ignore
+    except Exception:
+        tools = None
+
+
+def _handler(request: dict, state: dict) -> object:
+    op = request.get("op")
+    if op == "count":
+        state["n"] = state.get("n", 0) + 1
+        return {"n": state["n"], "pid": os.getpid()}
+    if op == "segv":
+        os.kill(os.getpid(), signal.SIGSEGV)
+    if op == "sleep":
+        time.sleep(float(request.get("s", 1)))
+        return "late"
+    raise ValueError(f"bad op {op!r}")
+
+
+def _ctx():
+    return multiprocessing.get_context("fork")
+
+
+@unittest.skipUnless(os.name == "posix", "fork start method required")
+class TestWarmWorker(unittest.TestCase):
+    def setUp(self):
+        self.worker = WarmWorker(_ctx(), _handler, name="test-worker")
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def test_state_is_kept_between_calls(self):
+        first = self.worker.call({"op": "count"}, timeout=10)
+        second = self.worker.call({"op": "count"}, timeout=10)
+        self.assertTrue(first["ok"])
+        self.assertEqual(first["result"]["n"], 1)
+        self.assertEqual(second["result"]["n"], 2)
+        self.assertEqual(first["result"]["pid"], second["result"]["pid"])
+
+    def test_handler_error_is_reported_and_worker_survives(self):
+        payload = self.worker.call({"op": "nope"}, timeout=10)
+        self.assertFalse(payload["ok"])
+        self.assertEqual(payload["reason"], "error")
+        self.assertIn("ValueError", payload["error"])
+        self.assertTrue(self.worker.call({"op": "count"}, timeout=10)["ok"])
+
+    def test_crash_is_isolated_and_worker_restarts(self):
+        pid = self.worker.call({"op": "count"}, timeout=10)["result"]["pid"]
+        payload = self.worker.call({"op": "segv"}, timeout=10)
+        self.assertFalse(payload["ok"])
+        self.assertEqual(payload["reason"], "crashed")
+
+        again = self.worker.call({"op": "count"}, timeout=10)
+        self.assertTrue(again["ok"])
+        self.assertNotEqual(again["result"]["pid"], pid)
+        # Fresh process => fresh state.
+        self.assertEqual(again["result"]["n"], 1)
+        self.assertEqual(self.worker.restarts, 1)
+
+    def test_timeout_kills_worker(self):
+        payload = self.worker.call({"op": "sleep", "s": 5}, timeout=0.2)
+        self.assertFalse(payload["ok"])
+        self.assertEqual(payload["reason"], "timeout")
+        self.assertFalse(self.worker.is_alive())
+
+
+@unittest.skipUnless(os.name == "posix", "fork start method required")
+class TestWorkerPool(unittest.TestCase):
+    def test_one_worker_per_key(self):
+        pool = WorkerPool(_ctx, _handler)
+        try:
+            a = pool.call("a", {"op": "count"}, timeout=10)["result"]
+            b = pool.call("b", {"op": "count"}, timeout=10)["result"]
+            a2 = pool.call("a", {"op": "count"}, timeout=10)["result"]
+            self.assertNotEqual(a["pid"], b["pid"])
+            self.assertEqual(a2["n"], 2)
+            self.assertEqual(b["n"], 1)
+        finally:
+            pool.shutdown()
+
+
+class _RecordingPool:
+    """Stands in for tools' WorkerPool; answers per store path."""
+
+    def __init__(self, hits: dict[str, list]):
+        self.hits = hits
+        self.keys: list[str] = []
+
+    def call(self, key, request, timeout):
+        self.keys.append(key)
+        if key not in self.hits:
+            return {"ok": False, "reason": "crashed", "exitcode": -11}
+        self.last_raw = request.get("raw")
+        return {"ok": True, "result": self.hits[key]}
+
+
+@unittest.skipUnless(tools is not None, "tools not importable")
+class TestFederatedFanout(unittest.TestCase):
+    def test_federated_uses_per_store_workers(self):
+        paths = {"vectordb": ("/s/VSM_1_Data", "m1"), "memorydb": ("/s/VSM_4_Data", "m4"), "broken": ("/s/x", "mx")}
+        pool = _RecordingPool({
+            "/s/VSM_1_Data": [{"source": "a.py", "content": "A", "score": 0.1}],
+            "/s/VSM_4_Data": [{"source": "h.json", "content": "H", "score": 0.3}],
+        })
+        request = {"op": "federated", "stores": ["vectordb", "memorydb", "broken", "nope"], "query": "q", "k": 2}
+        with mock.patch.object(tools, "_get_vectordb_pool", return_value=pool), \
+                mock.patch.object(tools, "_federated_store_paths", side_effect=paths.get):
+            out = tools._run_vectordb_pooled("vectordb_multi", "q", 2, None, request)
+
+        self.assertNotIn("federated", pool.keys)
+        self.assertEqual(sorted(pool.keys), ["/s/VSM_1_Data", "/s/VSM_4_Data", "/s/x"])
+        self.assertTrue(pool.last_raw)
+        self.assertEqual({r["store"] for r in out["results"]}, {"vectordb", "memorydb"})
+        self.assertEqual(sorted(out["errors"]), ["broken", "nope"])
+
+    def test_concurrent_tool_threads_share_one_pool(self):
+        created: list[object] = []
+
+        def _slow_pool(*_args):
+            time.sleep(0.05)
+            created.append(object())
+            return created[-1]
+
+        pools: list[object] = []
+        with mock.patch.object(tools, "_VECTORDB_POOL", None), \
+                mock.patch.object(tools, "WorkerPool", side_effect=_slow_pool):
+            threads = [threading.Thread(target=lambda: pools.append(tools._get_vectordb_pool())) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(p is created[0] for p in pools))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Unit tests for deletions in production module alde.vstores.
+
+These tests target the real implementation in
+ALDE/ALDE/alde/vstores.py.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+
+
+_HAS_VSTORES = all(
+    importlib.util.find_spec(m) is not None
+    for m in ("faiss", "numpy", "langchain_community", "langchain_huggingface",
+              "langchain_text_splitters", "sqlalchemy")
+)
+
+_WORDS = ("apfel", "birne", "kirsche", "dattel", "feige", "traube")
+
+
+class _WordEmbeddings:
+    """Bag-of-words hashing: a query word finds the file that repeats it."""
+
+    dim = 128
+
+    def _vec(self, text: str):
+        import numpy as np
+
+        v = np.zeros(self.dim, dtype="float32")
+        for word in text.lower().split():
+            v[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        n = float(np.linalg.norm(v))
+        return v / n if n else v
+
+    def embed_array(self, texts, normalize: bool = False):
+        import numpy as np
+
+        return np.stack([self._vec(t) for t in texts]).astype("float32")
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self._vec(text).tolist()
+
+    def __call__(self, text):
+        return self.embed_query(text)
+
+
+@unittest.skipUnless(_HAS_VSTORES, "vstores dependencies not installed")
+class TestDeleteFromIvfStore(unittest.TestCase):
+    def setUp(self):
+        try:
+            from ALDE.ALDE.alde import vstores
+        except Exception:
+            from alde import vstores  # type: ignore
+        self.vstores = vstores
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.src = root / "src"
+        self.src.mkdir()
+        for word in _WORDS:
+            (self.src / f"{word}.txt").write_text(" ".join([word] * 30), encoding="utf-8")
+        self.store_dir = root / "store"
+        self.vs = self._open()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _open(self):
+        vs = self.vstores.VectorStore(
+            store_path=str(self.store_dir),
+            manifest_file=str(self.store_dir / "manifest.json"),
+            index_kind="ivf",
+        )
+        vs._initialized = True
+        vs.embeddings = _WordEmbeddings()
+        return vs
+
+    def _top_source(self, word: str) -> str:
+        hits = self.vs.query(word, k=1)
+        self.assertTrue(hits, word)
+        return Path(hits[0]["source"]).stem
+
+    def test_modify_and_delete_keep_ids_aligned(self):
+        self.vs.build(self.src)
+        self.assertTrue(self.vs.rebuild_index("ivf"))
+        self.vs.save_index()
+        self.assertEqual(self.vstores.faiss_index.index_kind(self.vs.store.index), "ivf")
+
+        # apfel.txt bekommt neuen Inhalt, birne.txt verschwindet.
+        (self.src / "apfel.txt").write_text(" ".join(["mango"] * 30), encoding="utf-8")
+        (self.src / "birne.txt").unlink()
+        self.vs = self._open()
+        self.vs.build(self.src)
+
+        store = self.vs.store
+        self.assertEqual(self.vstores.faiss_index.index_kind(store.index), "ivf")
+        self.assertEqual(store.index.ntotal, len(store.index_to_docstore_id))
+        self.assertEqual(self._top_source("mango"), "apfel")
+        for word in ("kirsche", "dattel", "feige", "traube"):
+            self.assertEqual(self._top_source(word), word)
+        sources = {Path(self.vs.store.docstore.search(i).metadata["source"]).stem
+                   for i in store.index_to_docstore_id.values()}
+        self.assertNotIn("birne", sources)
+
+
+if __name__ == "__main__":
+    unittest.main()
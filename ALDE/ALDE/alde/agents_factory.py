@@ -9,6 +9,7 @@ import json
 import os
 import atexit
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from datetime import datetime
 from pyexpat import model
@@ -22,11 +23,19 @@ except ImportError as e:
     else:
         raise
 try:
-    from .tools import UNIFIED_TOOLS, TOOL_GROUPS, vectordb, memorydb  # type: ignore
+    from .chat_stream import StreamCancelled  # type: ignore
 except ImportError as e:
     msg = str(e)
     if "no known parent package" in msg or "attempted relative import" in msg:
-        from tools import UNIFIED_TOOLS, TOOL_GROUPS, vectordb, memorydb  # type: ignore
+        from chat_stream import StreamCancelled  # type: ignore
+    else:
+        raise
+try:
+    from .tools import UNIFIED_TOOLS, TOOL_GROUPS, TOOL_PURE, TOOL_SERIAL, vectordb, memorydb  # type: ignore
+except ImportError as e:
+    msg = str(e)
+    if "no known parent package" in msg or "attempted relative import" in msg:
+        from tools import UNIFIED_TOOLS, TOOL_GROUPS, TOOL_PURE, TOOL_SERIAL, vectordb, memorydb  # type: ignore
     else:
         raise
 if __name__ == '__main__':  
@@ -54,7 +63,11 @@ except ImportError as e:
 
 
 _MAX_TOOL_DEPTH = 50
-_TOOL_CACHE: dict[str, str] = {}
+# Max. threads for independent tool calls of one assistant message (1 => sequential)
+try:
+    _TOOL_WORKERS = max(1, int(os.getenv("AI_IDE_TOOL_WORKERS", "4").strip() or 4))
+except ValueError:
+    _TOOL_WORKERS = 4
 _MODEL = "gpt-4.1-mini-2025-04-14"
 model = _MODEL
 # Minimal, robust triage/dispatcher script.
@@ -360,6 +373,8 @@ sys3mi = [
 
 # Tools that require special handling in dispatcher
 _SPECIAL_HANDLED_TOOLS = ['vectordb_tool', 'route_to_agent']
+# Scheduling of special tools that have no ToolSpec
+_SPECIAL_TOOL_CONCURRENCY = {'vectordb_tool': TOOL_PURE}
 
 # ============================================================================
 # Define ALL tools using the unified factory
@@ -439,19 +454,20 @@ for spec in UNIFIED_TOOLS:
 # Special Tool Handlers (vectordb, route_to_agent)
 # ============================================================================
 def execute_vectordb(args: dict, tool_call_id: str = None) -> tuple[str, dict | None]:
-    """Execute vectordb_tool with caching."""
+    """Execute vectordb_tool.
+
+    Results are cached inside the vector store (see query_cache.py), keyed by
+    index version, so rebuilt stores are never answered from stale entries.
+    """
     query = (args.get('Query') or args.get('query') or '').strip()
     tool_name = args.get('vector_tools', 'VectorDB')
-    cache_key = f"{tool_name}:{query.lower()}"
-    
-    if cache_key in _TOOL_CACHE:
-        result = _TOOL_CACHE[cache_key]
+
+    filter_dict = args.get('filter_dict') or None
+
+    if tool_name == 'VectorDB':
+        result = vectordb(query, k=3, filter_dict=filter_dict)
     else:
-        if tool_name == 'VectorDB':
-            result = vectordb(query, k=3)
-        else:
-            result = memorydb(query, k=3)
-        _TOOL_CACHE[cache_key] = result
+        result = memorydb(query, k=3, filter_dict=filter_dict)
     
     # Log result
     _default_on_result(tool_name, result, tool_call_id)
@@ -515,6 +531,55 @@ def execute_tool(name: str, args: dict, tool_call_id: str = None) -> tuple[str,
     
     return f"Unknown tool: {name}", None
 
+
+def tool_concurrency(name: str) -> str:
+    """Scheduling class of tool *name* (pure | parallel | serial)."""
+    if name in _SPECIAL_TOOL_CONCURRENCY:
+        return _SPECIAL_TOOL_CONCURRENCY[name]
+    spec = get_tool_spec(name)
+    return getattr(spec, 'concurrency', TOOL_SERIAL) if spec else TOOL_SERIAL
+
+
+def _execute_tool_safe(name: str, args: dict, tool_call_id: str = None) -> tuple[Any, dict | None]:
+    try:
+        return execute_tool(name, args, tool_call_id)
+    except Exception as e:
+        return f"Tool execution error: {e}", None
+
+
+def execute_tool_calls(calls: list[tuple[str, dict, str | None]],
+                       max_workers: int | None = None) -> list[tuple[Any, dict | None]]:
+    """Execute (name, args, tool_call_id) calls; results keep the call order.
+
+    Consecutive pure/parallel calls run concurrently in a thread pool.
+    A serial call is a barrier: everything before it has finished when it
+    starts, and later calls wait until it is done.
+    """
+    workers = max(1, int(max_workers or _TOOL_WORKERS))
+    results: list[tuple[Any, dict | None]] = [("", None)] * len(calls)
+    segment: list[int] = []
+
+    def _flush() -> None:
+        if len(segment) > 1 and workers > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(segment)),
+                                    thread_name_prefix='tool-call') as pool:
+                futures = {i: pool.submit(_execute_tool_safe, *calls[i]) for i in segment}
+                for i, future in futures.items():
+                    results[i] = future.result()
+        else:
+            for i in segment:
+                results[i] = _execute_tool_safe(*calls[i])
+        segment.clear()
+
+    for i, (name, _args, _tool_call_id) in enumerate(calls):
+        if tool_concurrency(name) == TOOL_SERIAL:
+            _flush()
+            results[i] = _execute_tool_safe(*calls[i])
+        else:
+            segment.append(i)
+    _flush()
+    return results
+
 # ============================================================================
 # Serialize Tool Calls for Logging
 # ============================================================================
@@ -554,8 +619,12 @@ def serialize_tool_calls(tool_calls):
 
 def _handle_tool_calls(agent_msg, depth: int = 0,
                         ChatCom = None,
-                       agent_label: str ="") -> Any:
-    """Execute tool calls and continue the conversation."""
+                       agent_label: str ="",
+                       on_delta: Callable[[str], None] | None = None) -> Any:
+    """Execute tool calls and continue the conversation.
+
+    With *on_delta*, the follow-up model calls are streamed (chat_stream.py).
+    """
     # Ensure we have a ChatHistory instance available (lazy import)
     history = get_history()
 
@@ -595,15 +664,19 @@ def _handle_tool_calls(agent_msg, depth: int = 0,
                  _name=agent_label, _thread_name='chat', _obj='tool_call',
                  _tool_calls=agent_msg.tool_calls)
 
+    calls: list[tuple[str, dict, str | None]] = []
     for tc in agent_msg.tool_calls:
-        name = tc.function.name
-        executed_tool_names.append(str(name))
         try:
             args = json.loads(tc.function.arguments or "{}")
         except Exception:
             args = {}
-        # Execute tool.
-        result, _request = execute_tool(name, args, tc.id)
+        calls.append((tc.function.name, args, tc.id))
+    # Independent calls run concurrently (see execute_tool_calls); results
+    # are logged below in the original tool_call_id order.
+    outcomes = execute_tool_calls(calls)
+
+    for tc, (name, _args, _id), (result, _request) in zip(agent_msg.tool_calls, calls, outcomes):
+        executed_tool_names.append(str(name))
         # IMPORTANT: Add the tool response as a proper OpenAI-style tool message
         # paired with the assistant message above (same tool_call_id). This keeps
         # the history sequence valid for subsequent model calls.
@@ -675,11 +748,15 @@ def _handle_tool_calls(agent_msg, depth: int = 0,
            _model=followup_model,
            _messages=followup_messages,
            tools=followup_tools,
-           tool_choice='auto'
+           tool_choice='auto',
+           on_delta=on_delta
     )
 
     try:
         resp = c._response()
+    except StreamCancelled:
+        # abgebrochen (GUI/Scheduler): keine Fehlermeldung in die History
+        raise
     except Exception as exc:
         err = f"Follow-up model call failed: {exc}"
         history._log(_role='assistant', _content=err,
@@ -690,7 +767,8 @@ def _handle_tool_calls(agent_msg, depth: int = 0,
     if getattr(resp, 'choices', None):
         msg = resp.choices[0].message
         if getattr(msg, 'tool_calls', None):
-            rec = _handle_tool_calls(msg, depth + 1, ChatCom=ChatCom, agent_label=agent_label)
+            rec = _handle_tool_calls(msg, depth + 1, ChatCom=ChatCom, agent_label=agent_label,
+                                     on_delta=on_delta)
             if rec is not None and str(rec).strip():
                 return rec
         text = (getattr(msg, 'content', '') or '').strip()
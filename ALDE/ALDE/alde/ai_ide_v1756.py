@@ -230,6 +230,16 @@ try:
 except Exception:
     from chat_completion import ChatCom, ImageDescription, ImageCreate, ChatHistory  # type: ignore  # noqa: E402
 
+try:
+    from .chat_stream import CHAT_STREAM  # type: ignore
+except Exception:
+    from chat_stream import CHAT_STREAM  # type: ignore  # noqa: E402
+
+try:
+    from .task_scheduler import TaskScheduler  # type: ignore
+except Exception:
+    from task_scheduler import TaskScheduler  # type: ignore  # noqa: E402
+
 try:
     from .litehigh import QSHighlighter, MDHighlighter, JSONHighlighter, TOMLHighlighter, YAMLHighlighter  # type: ignore
 except Exception:
@@ -1521,6 +1531,11 @@ class ChatDock(QDockWidget):
 
 # ═══════════════════════  AI chat dock  ═══════════════════════════════════
 
+def _task_label(prompt: str, limit: int = 40) -> str:
+    text = " ".join(prompt.split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
 class AIWidget(QWidget):
     '''AI-Chat-Dock – fehlerbereinigte Version'''
 
@@ -1535,6 +1550,8 @@ class AIWidget(QWidget):
         self._api_key_missing: bool = not bool(self.api_key)
         self._model:   str = "o3-2025-04-16"                 # <<< zentrales Modell
         self._dropped_files: List[str] = []
+        # Modell-/Tool-Arbeit läuft im TaskScheduler, nie im GUI-Thread
+        self.tasks = TaskScheduler(self)
         self.scheme = _build_scheme(accent, base)                # Farbschema mergen
         self._build_ui()
         self._wire()
@@ -1622,6 +1639,14 @@ class AIWidget(QWidget):
             flay.addWidget(w, 0, Qt.AlignLeft)
         flay.addStretch()
 
+        # laufende / wartende Requests – Menü zum Abbrechen
+        self.btn_tasks = QToolButton(footer, objectName="taskQueue")
+        self.btn_tasks.setPopupMode(QToolButton.InstantPopup)
+        self.btn_tasks.setToolTip("Laufende Anfragen")
+        self.btn_tasks.setMenu(QMenu(self.btn_tasks))
+        self.btn_tasks.hide()
+        flay.addWidget(self.btn_tasks, 0, Qt.AlignRight)
+
         # 5) Gesamtlayout
         vbox = QVBoxLayout(self)
         vbox.setContentsMargins(0, 0, 0, 0)
@@ -1636,6 +1661,10 @@ class AIWidget(QWidget):
     def _wire(self) -> None:
             self.prompt_edit.filesDropped.connect(
                self. _remember_files)
+            self.tasks.queueChanged.connect(self._refresh_task_queue)
+            app = QApplication.instance()
+            if app is not None:
+                app.aboutToQuit.connect(self.tasks.shutdown)
     @Slot(list)
     def _remember_files(self, paths:list|None) -> None:
                 self._dropped_files = paths
@@ -1658,18 +1687,52 @@ class AIWidget(QWidget):
         url = self._dropped_files[:] 
         self._append("You", prompt)
         self.prompt_edit.clear()
-        
-        try:
-            reply = ChatCom(
-                _model=self._model,
+        self._dropped_files = []
+
+        # Request im TaskScheduler ("chat"-Lane, nacheinander); weitere
+        # Prompts werden eingereiht, Tokens erscheinen in der eigenen Bubble.
+        bubble = self.chat_view.begin_stream("AI")
+        model = self._model
+
+        def run(task) -> str:
+            return str(ChatCom(
+                _model=model,
                 _url=url,
-                _input_text=prompt
-            ).get_response()
-        except Exception as exc:
-            reply = f"[ERROR] {exc}"
+                _input_text=prompt,
+                on_delta=task.progress if CHAT_STREAM else None,
+            ).get_response())
+
+        def on_progress(text: str) -> None:
+            bubble.append_stream(text)
+            self.chat_view.scroll_to_bottom()
+
+        self.tasks.submit(
+            _task_label(prompt), run, lane="chat",
+            on_progress=on_progress,
+            on_done=lambda reply: self.chat_view.finish_stream(bubble, "AI", reply),
+            on_error=lambda err: self.chat_view.finish_stream(bubble, "AI", f"[ERROR] {err}"),
+            on_cancel=lambda: self.chat_view.finish_stream(
+                bubble, "AI", (bubble.streamed_text() + "\n\n[abgebrochen]").lstrip()),
+        )
 
-        self._append("AI", str(reply))
-        self._dropped_files = []
+    # ---------------------------------------------------------------------------
+    #  TASK-QUEUE – Anzeige + Abbrechen
+    # ---------------------------------------------------------------------------
+    @Slot()
+    def _refresh_task_queue(self) -> None:
+        tasks = self.tasks.tasks()
+        menu = self.btn_tasks.menu()
+        menu.clear()
+        for task in tasks:
+            state = "läuft" if task.state == "running" else "wartet"
+            act = menu.addAction(f"✕  {task.label}  ({state})")
+            act.triggered.connect(lambda _=False, tid=task.id: self.tasks.cancel(tid))
+        if len(tasks) > 1:
+            menu.addSeparator()
+            menu.addAction("Alle abbrechen").triggered.connect(self.tasks.cancel_all)
+        running = sum(t.state == "running" for t in tasks)
+        self.btn_tasks.setText(f"⏳ {running}/{len(tasks)}")
+        self.btn_tasks.setVisible(bool(tasks))
 
     # ---------------------------------------------------------------------------
     #  CHAT – Bild analysieren
@@ -1691,8 +1754,9 @@ class AIWidget(QWidget):
         self._append("You", prompt)
         self.prompt_edit.clear()
         url = self._dropped_files[0]
+        self._dropped_files = []
 
-        try:
+        def run(task) -> str:
             resp = ImageDescription(
                 _model="gpt-image-1-mini",
                 _url=url,
@@ -1700,16 +1764,16 @@ class AIWidget(QWidget):
             ).get_descript()
 
             if hasattr(resp, 'choices') and resp.choices:
-                reply = (resp.choices[0].message.content or "")
-            elif hasattr(resp, 'content'):
-                reply = (resp.content or "")
-            else:
-                reply = str(resp)
-        except Exception as exc:
-            reply = f"[ERROR] {exc}"
-
-        self._append("AI", reply)
-        self._dropped_files = []
+                return (resp.choices[0].message.content or "")
+            if hasattr(resp, 'content'):
+                return (resp.content or "")
+            return str(resp)
+
+        self.tasks.submit(
+            "🖼 " + _task_label(prompt), run, lane="image",
+            on_done=lambda reply: self._append("AI", reply),
+            on_error=lambda err: self._append("AI", f"[ERROR] {err}"),
+        )
 
     # ---------------------------------------------------------------------------
     #  CHAT – Bild generieren
@@ -1729,22 +1793,25 @@ class AIWidget(QWidget):
         self._append("You", prompt)
         self.prompt_edit.clear()    
 
-        try:
+        def run(task) -> Path:
             raw = ImageCreate(
                 _model="gpt-image-1-mini",
                 _input_text=prompt
             ).get_img()
-        except Exception as exc:
-            self._append("AI", f"[ERROR] {exc}")
-            return
-
-        try:
-            img_bytes, mime = decode_image_payload(raw)
-            path = save_generated_image(img_bytes, mime=mime)
-        except Exception as exc:
-            self._append("AI", f"[ERROR] Image decode/save failed: {exc}")
-            return
+            task.check_cancelled()
+            try:
+                img_bytes, mime = decode_image_payload(raw)
+                return save_generated_image(img_bytes, mime=mime)
+            except Exception as exc:
+                raise RuntimeError(f"Image decode/save failed: {exc}") from exc
+
+        self.tasks.submit(
+            "🎨 " + _task_label(prompt), run, lane="image",
+            on_done=self._show_created_img,
+            on_error=lambda err: self._append("AI", f"[ERROR] {err}"),
+        )
 
+    def _show_created_img(self, path: Path) -> None:
         # Open in a new tab in the (focused) tab-dock
         win = self.window()
         opener = getattr(win, "_open_path_in_focused_tab", None)
@@ -2031,6 +2098,29 @@ class MsgWidget(QWidget):
 
         # Kein Extra-Spacer, sonst wird die Bubble künstlich höher
         v_layout.addItem(QSpacerItem(0, 0, QSizePolicy.Minimum, QSizePolicy.Fixed))
+        self._v_layout = v_layout
+        self._stream_view: QTextBrowser | None = None
+
+    # ----------------------------------------------------------------
+    def append_stream(self, text: str) -> None:
+        """Hängt ein gestreamtes Text-Fragment an (Klartext, wird am Ende neu gerendert)."""
+        if self._stream_view is None:
+            br = QTextBrowser(self._bubble)
+            br.setFrameShape(QFrame.NoFrame)
+            br.document().setDocumentMargin(0)
+            br.setStyleSheet("QTextBrowser { background: transparent; color: #e0e0e0; }")
+            br.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            br.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            br.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+            self._v_layout.insertWidget(self._v_layout.count() - 1, br)
+            self._stream_view = br
+        cursor = self._stream_view.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self._fit_browser(self._stream_view)
+
+    def streamed_text(self) -> str:
+        return self._stream_view.toPlainText() if self._stream_view is not None else ""
 
     def resizeEvent(self, ev):  # noqa: N802
         super().resizeEvent(ev)
@@ -2091,9 +2181,32 @@ class ChatWindow(QWidget):
         self.vlayout.addWidget(msg)
 
         # nach unten scrollen
+        self.scroll_to_bottom()
+        return msg
+
+    def scroll_to_bottom(self) -> None:
         bar = self.scroller.verticalScrollBar()
         bar.setValue(bar.maximum())
 
+    # ----------------------------------------------------------------
+    def begin_stream(self, who: str) -> "MsgWidget":
+        """Leere Bubble, in die `MsgWidget.append_stream` Tokens schreibt."""
+        return self.add_message(who, "")
+
+    def finish_stream(self, msg: "MsgWidget", who: str, text: str) -> None:
+        """Ersetzt die Streaming-Bubble durch die fertig gerenderte Nachricht
+        (Markdown + Code-Highlighting)."""
+        text = text or msg.streamed_text()
+        index = self.vlayout.indexOf(msg)
+        final = MsgWidget(who, self._split_segments(text), self.viewport)
+        if index < 0:
+            self.vlayout.addWidget(final)
+        else:
+            self.vlayout.insertWidget(index, final)
+            self.vlayout.removeWidget(msg)
+            msg.deleteLater()
+        self.scroll_to_bottom()
+
     # ----------------------------------------------------------------
     @staticmethod
     def _split_segments(raw: str) -> list[tuple[str, str]]:
@@ -9,7 +9,7 @@ import subprocess
 import os 
 import json
 import time
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
 from pathlib import Path
 
 from datetime import datetime
@@ -30,6 +30,33 @@ except ImportError as e:
     else:
         raise
 
+try:
+    from .chat_stream import StreamCancelled, create_streamed  # type: ignore
+except ImportError as e:
+    msg = str(e)
+    if "no known parent package" in msg or "attempted relative import" in msg:
+        from chat_stream import StreamCancelled, create_streamed  # type: ignore
+    else:
+        raise
+
+try:
+    from .history_journal import HistoryJournal, json_safe  # type: ignore
+except ImportError as e:
+    msg = str(e)
+    if "no known parent package" in msg or "attempted relative import" in msg:
+        from history_journal import HistoryJournal, json_safe  # type: ignore
+    else:
+        raise
+
+try:
+    from .history_index import HistoryIndex  # type: ignore
+except ImportError as e:
+    msg = str(e)
+    if "no known parent package" in msg or "attempted relative import" in msg:
+        from history_index import HistoryIndex  # type: ignore
+    else:
+        raise
+
 try:
     from .get_path import GetPath  # type: ignore
 except ImportError as e:
@@ -240,24 +267,19 @@ class ChatHistory(VectorStore):
     # Backward-compat alias used in some older call sites.
     _FINAL_PATH = _HISTORY_PATH
 
-    # Autosave (throttled): helps ensure the most recent GUI run is persisted
-    # even if the process crashes or is terminated before Qt shutdown hooks run.
+    # Autosave: every logged message is appended to history.jsonl (journal,
+    # see history_journal.py); a background thread compacts the journal into
+    # history.json once it holds enough records. No full rewrite per message.
     #
     # Controls:
     #   AI_IDE_HISTORY_AUTOSAVE=0/1 (default: 1)
-    #   AI_IDE_HISTORY_AUTOSAVE_EVERY_N (default: 8)
-    #   AI_IDE_HISTORY_AUTOSAVE_MIN_SECONDS (default: 3)
+    #   AI_IDE_HISTORY_COMPACT_EVERY (journal records, default: 500)
     _AUTOSAVE_ENABLED = os.getenv("AI_IDE_HISTORY_AUTOSAVE", "1").strip() in {"1", "true", "True", "yes", "Yes", "on", "On"}
     try:
-        _AUTOSAVE_EVERY_N = max(1, int(os.getenv("AI_IDE_HISTORY_AUTOSAVE_EVERY_N", "8").strip() or "8"))
-    except Exception:
-        _AUTOSAVE_EVERY_N = 8
-    try:
-        _AUTOSAVE_MIN_SECONDS = max(0.0, float(os.getenv("AI_IDE_HISTORY_AUTOSAVE_MIN_SECONDS", "3").strip() or "3"))
+        _COMPACT_EVERY = max(1, int(os.getenv("AI_IDE_HISTORY_COMPACT_EVERY", "500").strip() or "500"))
     except Exception:
-        _AUTOSAVE_MIN_SECONDS = 3.0
-    _autosave_dirty_count: int = 0
-    _autosave_last_ts: float = 0.0
+        _COMPACT_EVERY = 500
+    _journals: dict[str, HistoryJournal] = {}
     _input:List[Dict[str,str]] = []
     # Lazy initialization: heavy operations (model loading, FAISS build)
     # must not run at import time because importing this module is done
@@ -270,6 +292,8 @@ class ChatHistory(VectorStore):
 
     #vsm:VectorStore = None  # type: VectorStore | None
     _history_: List[List[Dict[str, str]]] = []
+    # normalised per-thread view of _history_ for _insert (see history_index.py)
+    _index: HistoryIndex = HistoryIndex()
     vdb_history:VectorStore = None  # type: VectorStore | None
     # Liste bereits existierender Assistenten
     _assis_colec:list[dict[str,str]] = []
@@ -430,6 +454,29 @@ class ChatHistory(VectorStore):
             '''
             Try to read *.json* and return the list that was stored before.
             Returns an empty list if the file is missing or unreadable.
+            For the canonical history.json the journal tail (history.jsonl,
+            see history_journal.py) is replayed on top of the snapshot.
+            ---
+            path: str - Path to the JSON file to load.
+    
+            '''
+            canon = str(getattr(cls, "_HISTORY_PATH", "") or "")
+            if path and not (canon and os.path.abspath(str(path)) == os.path.abspath(canon)):
+                return cls._load_snapshot(path)
+            journal = cls._journal()
+            # Keine Kompaktierung zwischen Snapshot- und Journal-Lesen
+            with journal.paused():
+                data = cls._load_snapshot(path)
+                try:
+                    return journal.replay(data)
+                except Exception as exc:
+                    print(f"[WARNING] cannot replay chat history journal: {exc!s}")
+                    return data
+
+    @classmethod
+    def _load_snapshot(cls,path:str|None=None) -> List[Any]:
+            '''
+            Read the snapshot *.json* (canonical first, then legacy paths).
             ---
             path: str - Path to the JSON file to load.
     
@@ -599,63 +646,46 @@ class ChatHistory(VectorStore):
         ...
         p.flush(history)                      # store on exit
     """
+    @classmethod
+    def _journal(cls) -> HistoryJournal:
+        """Journal next to the current history path (one per path)."""
+        target = str(getattr(cls, "_HISTORY_PATH", None) or cls._FINAL_PATH)
+        journal = ChatHistory._journals.get(target)
+        if journal is None:
+            journal = ChatHistory._journals.setdefault(target, HistoryJournal(target))
+        return journal
+
     @classmethod
     def _flush(cls) -> None:
-        """Atomically dump chat history to disk."""
+        """Atomically dump chat history to disk and drop the journal."""
         if getattr(cls, "_is_flushing", False):
             return
         cls._is_flushing = True
         try:
-            target = getattr(cls, "_HISTORY_PATH", None) or cls._FINAL_PATH
-            tmp = f"{target}.tmp"
-
-            def _sanitize(obj: Any) -> Any:
-                """Recursively coerce data into JSON-safe types."""
-                if isinstance(obj, dict):
-                    safe: dict[str, Any] = {}
-                    for k, v in obj.items():
-                        key = k if isinstance(k, (str, int, float, bool)) or k is None else str(k)
-                        safe[str(key)] = _sanitize(v)
-                    return safe
-                if isinstance(obj, list):
-                    return [_sanitize(x) for x in obj]
-                if isinstance(obj, (str, int, float, bool)) or obj is None:
-                    return obj
-                # Avoid str()/repr() on arbitrary extension objects (e.g. Qt/PySide)
-                # which may segfault during shutdown.
-                t = type(obj)
-                return f"[{t.__module__}.{t.__name__}]"
-
             if cls._history_:
-                with open(tmp, "w", encoding="utf-8") as fp:
-                    json.dump(_sanitize(cls._history_), fp, indent=2, ensure_ascii=False)
-                os.replace(tmp, target)
+                cls._journal().reset(lambda: json_safe(cls._history_))
         except Exception as exc:
             print(f"ERROR:{exc}")
         finally:
             cls._is_flushing = False
 
-    @classmethod
-    def _maybe_autosave(cls) -> None:
-        """Best-effort, throttled autosave."""
-        if not getattr(cls, "_AUTOSAVE_ENABLED", False):
-            return
+    @staticmethod
+    def _persist_disabled() -> bool:
         # Respect the global disable switch used by the GUI shutdown logic.
-        if os.getenv("AI_IDE_DISABLE_HISTORY_FLUSH", "0").strip() in {"1", "true", "True", "yes", "Yes", "on", "On"}:
-            return
-        try:
-            cls._autosave_dirty_count = int(getattr(cls, "_autosave_dirty_count", 0)) + 1
-        except Exception:
-            cls._autosave_dirty_count = 1
-        now = time.time()
-        last = float(getattr(cls, "_autosave_last_ts", 0.0) or 0.0)
-        if cls._autosave_dirty_count < int(getattr(cls, "_AUTOSAVE_EVERY_N", 8) or 8):
-            return
-        if now - last < float(getattr(cls, "_AUTOSAVE_MIN_SECONDS", 3.0) or 3.0):
+        return os.getenv("AI_IDE_DISABLE_HISTORY_FLUSH", "0").strip() in {"1", "true", "True", "yes", "Yes", "on", "On"}
+
+    @classmethod
+    def _maybe_autosave(cls, message: dict | None = None) -> None:
+        """Append *message* to the journal; compact it in the background when due."""
+        if not getattr(cls, "_AUTOSAVE_ENABLED", False) or cls._persist_disabled():
             return
-        cls._autosave_dirty_count = 0
-        cls._autosave_last_ts = now
-        cls._flush()
+        journal = cls._journal()
+        if message is not None:
+            journal.append(message)
+        if journal.records >= int(getattr(cls, "_COMPACT_EVERY", 500) or 500):
+            journal.compact_async(
+                on_error=lambda exc: print(f"[WARNING] history compaction failed: {exc!s}")
+            )
 
     # ------------------------------------------------------------------
     #                         __init__()
@@ -862,39 +892,51 @@ class ChatHistory(VectorStore):
                                           # a new assistant must match a classification, if not its creation is omitted.
                                           # Validierungs-/Debug-Ausgabe   (kann später entfernt werden)
        
+        appended = False
         if ChatHistory._dev_state == False and _role == "developer" and _dev == True:
             ChatHistory._dev_state = True
             try:           
-                ChatHistory._history_.append(_message)  
+                ChatHistory._history_.append(_message)
+                appended = True
             except Exception as e:
                 print(f'Error during log messages to history: {e}')       
         elif ChatHistory._sys_state == False and _role == "system" and _sys == True:
             ChatHistory._sys_state = False
             try:
-                ChatHistory._history_.append(_message)  
+                ChatHistory._history_.append(_message)
+                appended = True
             except Exception as e:
                 print(f'Error during log messages to history: {e}')       
         elif _role == "user":
             try:  
-                ChatHistory._history_.append(_message)  
+                ChatHistory._history_.append(_message)
+                appended = True
             except Exception as e:
                 print(f'Error during log messages to history: {e}')       
         elif _role == "assistant":
             try:  
-                ChatHistory._history_.append(_message)  
+                ChatHistory._history_.append(_message)
+                appended = True
             except Exception as e:
                 print(f'Error during log messages to history: {e}')   
         elif _role == "tool":
             try:
                 ChatHistory._history_.append(_message)
+                appended = True
             except Exception as e:
                 print(f'Error during log messages to history: {e}')
 
-        # Throttled autosave to reduce history loss on crashes.
         try:
-            ChatHistory._maybe_autosave()
-        except Exception:
-            pass
+            ChatHistory._index.sync(ChatHistory._history_)
+        except Exception as e:
+            print(f'Error while indexing history: {e}')
+
+        # Journal append (O(1)) to reduce history loss on crashes.
+        if appended:
+            try:
+                ChatHistory._maybe_autosave(_message)
+            except Exception as e:
+                print(f'Error while journaling history: {e}')
 
 # ------------------------------------------------------------------------------
     def _insert(self,tool:bool | None = False, f_depth:int | None = None , f_role:str | None = None) -> List[Dict[str, Any]]:
@@ -906,136 +948,6 @@ class ChatHistory(VectorStore):
         Assistant messages with tool_calls that lack matching tool responses are stripped of tool_calls.
         """
         
-        # IMPORTANT: Avoid sending unbounded chat history to the model.
-            # Default to a bounded slice of recent history
-        def _truncate_text(val: Any, *, max_chars: int) -> str:
-            if val is None:
-                return ""
-            if not isinstance(val, str):
-                try:
-                    val = json.dumps(val, ensure_ascii=False)
-                except Exception:
-                    val = str(val)
-            if len(val) <= max_chars:
-                return val
-            return val[:max_chars] + "\n\n[TRUNCATED]"
-
-        def _normalize_msg_name(val: Any) -> str | None:
-            """OpenAI chat messages accept optional `name` but it must be a string."""
-            if val is None:
-                return None
-            if isinstance(val, str):
-                return val
-            try:
-                if isinstance(val, (list, tuple)) and val:
-                    first = val[0]
-                    if isinstance(first, dict):
-                        cand = first.get("name") or first.get("type")
-                        if isinstance(cand, str) and cand:
-                            return cand
-                    if all(isinstance(x, str) for x in val):
-                        joined = ",".join(val)
-                        return joined or None
-                    return json.dumps(val, ensure_ascii=False)
-                if isinstance(val, dict):
-                    cand = val.get("name") or val.get("type")
-                    if isinstance(cand, str) and cand:
-                        return cand
-                    return json.dumps(val, ensure_ascii=False)
-                return str(val)
-            except Exception:
-                return None
-
-        # Build valid message sequence ensuring tool messages follow their tool_calls
-        # Step 1: Map tool_call_id -> tool response
-        tool_responses: dict[str, dict] = {}
-        for idx, entry in enumerate(self._history_):
-            idx = idx
-            if isinstance(entry, dict) and entry.get("role") == "tool":
-                tid = entry.get("tool_call_id")
-                if tid:
-                    tool_name = _normalize_msg_name(entry.get("name"))
-                    tool_responses[tid] = {
-                        "role": "tool",
-                        # Tool outputs can be massive (vector results, JSON dumps). Hard-cap them.
-                        "content": _truncate_text(entry.get("content", ""), max_chars=8000),
-                        "tool_call_id": tid,
-                        **({"name": tool_name} if tool_name else {}),
-                    }
-            # If callers pass 0/None, treat it as "recent history".
-        
-        # Step 2: Build filtered list with proper sequencing
-        filtered: list[dict[str, Any]] = []
-        for idx, entry in enumerate(self._history_):
-            idx = idx
-            if not isinstance(entry, dict):
-                continue
-        
-            role = entry.get("role")
-            # Filter to current conversation thread (prevents mixing threads)
-            entry_thread_id = entry.get("thread-id")
-            if entry_thread_id is not None and entry_thread_id != self._thread_iD:
-                continue
-
-            role = entry.get("role")
-
-            # Skip tool messages here - they will be inserted after their assistant message
-            if role == "tool":
-                continue
-
-             # Build base message
-            msg = {
-                "role": role,
-                "content": entry.get("content", ""),
-            }
-            
-            # Ensure content is a string and clamp size.
-            msg["content"] = _truncate_text(msg.get("content"), max_chars=20000)
-            
-            name_val = entry.get("name")
-            name_str = _normalize_msg_name(name_val)
-            if name_str:
-                msg["name"] = name_str
-            
-            # Handle assistant messages with tool_calls
-            if role == "assistant" and entry.get("tool_calls") and tool:
-                tool_calls = entry.get("tool_calls")
-                # Only include tool_calls that have matching responses
-                valid_tool_calls = []
-                pending_tool_responses = []
-                
-                for tc in tool_calls:
-                    tc_id = tc.get("id") if isinstance(tc, dict) else getattr(tc, "id", None)
-                    if tc_id and tc_id in tool_responses:
-                        # Serialize tool_call
-                        if isinstance(tc, dict):
-                            valid_tool_calls.append(tc)
-                        elif hasattr(tc, "model_dump"):
-                            valid_tool_calls.append(tc.model_dump())
-                        else:
-                            valid_tool_calls.append({
-                                "id": tc_id, 
-                                "type": "function", 
-                                "function": {
-                                    "name": getattr(tc.function, "name", "") if hasattr(tc, "function") else "",
-                                    "arguments": getattr(tc.function, "arguments", "{}") if hasattr(tc, "function") else "{}"
-                                }
-                            })
-                        pending_tool_responses.append(tool_responses[tc_id])
-                
-                if valid_tool_calls:
-                    msg["tool_calls"] = valid_tool_calls
-                    filtered.append(msg)
-                    # Immediately add the tool responses after assistant message
-                    filtered.extend(pending_tool_responses)
-                    continue  # Skip the normal append
-            
-            # Skip role filter
-            if msg.get("role") == f_role:
-                continue
-            filtered.append(msg)
-            
-
         # IMPORTANT: Avoid sending unbounded chat history to the model.
         # If f_depth is None/0/negative, fall back to a safe default.
         try:
@@ -1045,7 +957,16 @@ class ChatHistory(VectorStore):
         if depth <= 0:
             depth = 15
 
-        out = filtered[-depth:]
+        # Per-thread window (history_index.py): cost depends on depth, not on the
+        # history size. Tool messages follow their assistant tool_calls;
+        # tool_calls without a matching response are stripped.
+        index = ChatHistory._index
+        index.sync(self._history_)
+        out = index.window(self._thread_iD, depth, tool=bool(tool), f_role=f_role)
+        if out is None:
+            # Ring buffer too short for this request -> full scan
+            out = HistoryIndex.scan(self._history_, self._thread_iD, depth, tool=bool(tool), f_role=f_role)
+
         # Safety: never start a prompt with a tool message.
         # If truncation cuts off the preceding assistant/tool_calls, OpenAI rejects the request.
         while out and isinstance(out[0], dict) and out[0].get("role") == "tool":
@@ -1152,11 +1073,14 @@ class ChatCom(ChatCompletion,ChatHistory):
             tool_choice: str | None = None,
             _name: str|None=None,
             _url: str=None,
-            _res: str=None
+            _res: str=None,
+            on_delta: Callable[[str], None] | None = None
             ) -> None:
 
         self._model = _model
         self._input_text = _input_text
+        # on_delta: Text-Fragmente beim Streaming (GUI, siehe chat_stream.py)
+        self._on_delta = on_delta
         self._tool_choice = tool_choice or "auto"
         tools=tools
         _name
@@ -1346,6 +1270,14 @@ class ChatCom(ChatCompletion,ChatHistory):
                 except Exception:
                     tools = None
            
+            if self._on_delta is not None:
+                return create_streamed(
+                    self._get_client(), self._on_delta,
+                    model = model,
+                    messages = _input,
+                    tools = tools,
+                    tool_choice = 'auto'
+                )
             response = self._get_client().chat.completions.create(
                 model = model,
                 messages = _input,
@@ -1363,6 +1295,9 @@ class ChatCom(ChatCompletion,ChatHistory):
         else:
             try:
                 _resp = _response(_input)
+            except StreamCancelled:
+                # abgebrochen (GUI): keine Fehlermeldung in die History schreiben
+                raise
             except Exception as exc:
                 err_text = (
                     "OpenAI chat call failed: "
@@ -1429,6 +1364,7 @@ class ChatCom(ChatCompletion,ChatHistory):
                         _messages=followup_messages,
                         tools=followup_tools,
                         tool_choice="auto",
+                        on_delta=self._on_delta,
                     )
                     resp = c._response()
                     if getattr(resp, "choices", None):
@@ -1439,10 +1375,13 @@ class ChatCom(ChatCompletion,ChatHistory):
                                 depth=0,
                                 ChatCom=ChatCom,
                                 agent_label=routing_request.get("agent_label") or args.get("target_agent") or "",
+                                on_delta=self._on_delta,
                             )
                             return "" if rec is None else (rec if isinstance(rec, str) else json.dumps(rec, ensure_ascii=False))
                         return (getattr(msg, "content", "") or "")
                     return ""
+                except StreamCancelled:
+                    raise
                 except Exception as e:
                     return f"Routing failed: {e}"
 
@@ -1460,6 +1399,7 @@ class ChatCom(ChatCompletion,ChatHistory):
                     ChatCom=ChatCom,
                     depth=0,
                     agent_label="_data_dispatcher",
+                    on_delta=self._on_delta,
                 )
 
                 print(f'FINAL_RESULT: {final_result}')
@@ -1558,12 +1498,14 @@ class ChatComE(ChatCompletion,ChatHistory):
             # path:str|list|None = None, file:str|list|None = None,
             _messages:list,
             tools:list[dict],
-            tool_choice:str
+            tool_choice:str,
+            on_delta: Callable[[str], None] | None = None
             ):
             self.model:str = _model
             self._messages:list = _messages
             self.tools:list[dict] = tools
             self.tool_choice:str = tool_choice
+            self.on_delta = on_delta
             super().__init__()
             api_key = self._read_api_key()
             #print(tools)
@@ -1600,6 +1542,16 @@ class ChatComE(ChatCompletion,ChatHistory):
        
         def _response(self):
                 tool_choice = getattr(self, "tool_choice", None) or "auto"
+                if getattr(self, "on_delta", None) is not None:
+                    # Gestreamt; Tool-Call-Deltas werden zu vollständigen Calls gesammelt
+                    self.response = create_streamed(
+                        self.client, self.on_delta,
+                        model=self.model,
+                        messages=self._messages,
+                        tools=self.tools,
+                        tool_choice=tool_choice,
+                    )
+                    return self.response
                 self.response = self.client.chat.completions.create(
                     model=self.model,
                     messages=self._messages,
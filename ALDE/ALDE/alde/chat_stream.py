@@ -0,0 +1,114 @@
+"""Streaming chat completions (`stream=True`) for ChatCom / ChatComE.
+
+Without streaming the GUI shows nothing until the whole reply is
+generated. With an `on_delta` callback, `ChatCom`/`ChatComE` request a
+streamed completion instead. Text deltas go to the callback as they
+arrive; `ai_ide_v1756` forwards them through a Qt signal into the
+current chat bubble.
+
+Tool calls arrive in fragments: the id and function name come in the first
+delta of each call, and the JSON arguments arrive in pieces. They are
+accumulated per `index` and only handed out once the stream is finished.
+`accumulate_stream` then returns a response-shaped object
+(`resp.choices[0].message.content / .tool_calls`), so callers such as
+`agents_factory._handle_tool_calls` need no streaming-specific code.
+
+A callback may raise `StreamCancelled` to stop reading the stream (the
+GUI task scheduler does this when a running prompt is cancelled); it is
+propagated and the HTTP stream is closed.
+
+Controls:
+    AI_IDE_CHAT_STREAM=0/1   stream replies in the GUI (default: 1)
+"""
+
+from __future__ import annotations
+
+import os
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable
+
+__all__ = ["CHAT_STREAM", "StreamCancelled", "accumulate_stream", "create_streamed"]
+
+CHAT_STREAM = os.getenv("AI_IDE_CHAT_STREAM", "1").strip() in {"1", "true", "True"}
+
+
+class StreamCancelled(Exception):
+    """Raised by an `on_delta` callback to abort a streamed reply."""
+
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    """Attribute or dict access (SDK objects and plain dicts)."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def accumulate_stream(
+    chunks: Iterable[Any],
+    on_delta: Callable[[str], None] | None = None,
+) -> SimpleNamespace:
+    """Consume streamed chat-completion *chunks* into a full response.
+
+    *on_delta* receives every text fragment in order. Errors raised by the
+    callback (e.g. a closed window) do not abort the stream, except
+    `StreamCancelled`.
+    """
+    parts: list[str] = []
+    calls: dict[int, dict[str, Any]] = {}
+    finish_reason = None
+    model = None
+    for chunk in chunks:
+        model = model or _field(chunk, "model")
+        for choice in _field(chunk, "choices") or []:
+            finish_reason = _field(choice, "finish_reason") or finish_reason
+            delta = _field(choice, "delta")
+            if delta is None:
+                continue
+            text = _field(delta, "content")
+            if text:
+                parts.append(text)
+                if on_delta is not None:
+                    try:
+                        on_delta(text)
+                    except StreamCancelled:
+                        raise
+                    except Exception:
+                        pass
+            for tc in _field(delta, "tool_calls") or []:
+                index = _field(tc, "index", 0) or 0
+                entry = calls.setdefault(index, {"id": None, "name": "", "arguments": []})
+                entry["id"] = _field(tc, "id") or entry["id"]
+                fn = _field(tc, "function")
+                if fn is not None:
+                    if _field(fn, "name"):
+                        entry["name"] = _field(fn, "name")
+                    if _field(fn, "arguments"):
+                        entry["arguments"].append(_field(fn, "arguments"))
+
+    tool_calls = [
+        SimpleNamespace(
+            id=entry["id"] or f"call_{index}",
+            type="function",
+            function=SimpleNamespace(name=entry["name"], arguments="".join(entry["arguments"]) or "{}"),
+        )
+        for index, entry in sorted(calls.items())
+    ]
+    message = SimpleNamespace(role="assistant", content="".join(parts) or None, tool_calls=tool_calls or None)
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)],
+    )
+
+
+def create_streamed(client: Any, on_delta: Callable[[str], None] | None, **kwargs: Any) -> SimpleNamespace:
+    """`client.chat.completions.create(..., stream=True)` as a full response."""
+    stream = client.chat.completions.create(stream=True, **kwargs)
+    try:
+        return accumulate_stream(stream, on_delta)
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
@@ -0,0 +1,231 @@
+"""Structure-aware chunking for `vstores.VectorStore.build`.
+
+One `RecursiveCharacterTextSplitter` for everything cuts functions in
+half and scatters PDF sections over many small chunks. `StructuredSplitter`
+has the same `split_documents` interface, but dispatches by document type:
+
+    Python  (.py)          top-level functions/classes via `ast`; classes
+                           that are too large are split into their methods.
+                           Metadata: symbol, line_start, line_end
+    PDF     (.pdf pages)   sections between heading lines of each page.
+                           Metadata: section
+    JSON chat history      one chunk per message (see vstores._load_json)
+    anything else          RecursiveCharacterTextSplitter as before
+
+Adjacent small units are merged up to the size budget, so the index gets
+fewer chunks that still end at natural boundaries. Units that are too large
+fall back to the character splitter and keep their metadata.
+
+`embedding_text` decides how chunk metadata reaches the embedding: as a
+short header line (title, section/symbol, page, role) in front of every
+chunk, as the legacy "Metadata: k: v | ..." suffix, or not at all. The
+stored chunk content stays the raw text in every mode.
+
+langchain is imported lazily; the span helpers are plain Python.
+"""
+
+from __future__ import annotations
+
+import ast
+import re
+from typing import Any, Iterable
+
+__all__ = [
+    "StructuredSplitter", "python_units", "heading_sections", "merge_units",
+    "METADATA_MODES", "metadata_header", "embedding_text",
+]
+
+# header: kompakte Kopfzeile je Chunk, full: alter "Metadata: ..."-Anhang,
+# none: nur der Rohtext wird eingebettet.
+METADATA_MODES = ("header", "full", "none")
+_HEADER_MAX_CHARS = 160
+
+# Überschriften: Markdown (#), nummeriert ("2.1 Ergebnisse", "IV. Anhang")
+# oder kurze Zeilen in Großbuchstaben.
+_HEADING_RE = re.compile(
+    r"^(?:#{1,6}\s+\S.*"
+    r"|(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s+[A-ZÄÖÜ].{0,80}"
+    r"|[A-ZÄÖÜ][A-ZÄÖÜ0-9 \-/&,:]{2,60})$"
+)
+_MAX_HEADING_CHARS = 90
+
+
+def _line_offsets(text: str) -> list[int]:
+    """Start offset of every line (1-based line n starts at offsets[n - 1])."""
+    offsets = [0]
+    pos = text.find("\n")
+    while pos != -1:
+        offsets.append(pos + 1)
+        pos = text.find("\n", pos + 1)
+    return offsets
+
+
+def python_units(text: str, max_chars: int) -> list[dict]:
+    """Spans of *text* at top-level def/class boundaries.
+
+    Returns dicts with start/end (char offsets), symbol, line_start and
+    line_end. Classes longer than *max_chars* are split per method.
+    Raises SyntaxError for unparsable sources.
+    """
+    tree = ast.parse(text)
+    offsets = _line_offsets(text)
+    n_lines = len(offsets)
+
+    def span(first: int, last: int, symbol: str) -> dict:
+        start = offsets[first - 1]
+        end = offsets[last] if last < n_lines else len(text)
+        return {"start": start, "end": end, "symbol": symbol, "line_start": first, "line_end": last}
+
+    def first_line(node: ast.AST) -> int:
+        return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+
+    defs = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    units: list[dict] = []
+    cursor = 1
+    for node in tree.body:
+        if not isinstance(node, defs):
+            continue
+        first, last = first_line(node), node.end_lineno
+        if first > cursor:
+            units.append(span(cursor, first - 1, ""))
+        whole = span(first, last, node.name)
+        if isinstance(node, ast.ClassDef) and whole["end"] - whole["start"] > max_chars:
+            inner = first
+            for child in node.body:
+                if not isinstance(child, defs):
+                    continue
+                c_first = first_line(child)
+                if c_first > inner:
+                    units.append(span(inner, c_first - 1, node.name))
+                units.append(span(c_first, child.end_lineno, f"{node.name}.{child.name}"))
+                inner = child.end_lineno + 1
+            if inner <= last:
+                units.append(span(inner, last, node.name))
+        else:
+            units.append(whole)
+        cursor = last + 1
+    if cursor <= n_lines:
+        units.append(span(cursor, n_lines, ""))
+    return [u for u in units if text[u["start"]:u["end"]].strip()]
+
+
+def heading_sections(text: str) -> list[dict]:
+    """Spans of *text* from one heading line to the next (start/end/section)."""
+    sections: list[dict] = []
+    start, title = 0, ""
+    for line_start in _line_offsets(text):
+        line_end = text.find("\n", line_start)
+        line = text[line_start:line_end if line_end != -1 else len(text)].strip()
+        if line and len(line) <= _MAX_HEADING_CHARS and _HEADING_RE.match(line):
+            if line_start > start and text[start:line_start].strip():
+                sections.append({"start": start, "end": line_start, "section": title})
+            start, title = line_start, line
+    if text[start:].strip():
+        sections.append({"start": start, "end": len(text), "section": title})
+    return sections
+
+
+def merge_units(units: list[dict], max_chars: int) -> list[list[dict]]:
+    """Group adjacent units greedily while the group spans <= *max_chars*."""
+    groups: list[list[dict]] = []
+    for unit in units:
+        if groups and unit["end"] - groups[-1][0]["start"] <= max_chars:
+            groups[-1].append(unit)
+        else:
+            groups.append([unit])
+    return groups
+
+
+def metadata_header(metadata: dict) -> str:
+    """One short line naming the chunk: title, section or symbol, page, role."""
+    parts = [str(metadata.get("titel") or metadata.get("title") or "").strip()]
+    parts.append(str(metadata.get("section") or metadata.get("symbol") or "").strip())
+    page = metadata.get("page")
+    if page not in (None, ""):
+        parts.append(f"S. {page}")
+    parts.append(str(metadata.get("role") or "").strip())
+    header = " | ".join(p for p in parts if p)
+    return header[:_HEADER_MAX_CHARS]
+
+
+def embedding_text(content: str, metadata: dict, mode: str = "header") -> str:
+    """Text that is embedded for a chunk (*content* is stored unchanged)."""
+    if mode == "full":
+        metadata_str = " | ".join(f"{k}: {v}" for k, v in metadata.items())
+        return f"{content}\n\nMetadata: {metadata_str}"
+    if mode == "header":
+        header = metadata_header(metadata)
+        if header:
+            return f"{header}\n{content}"
+    return content
+
+
+def _is_python(doc: Any) -> bool:
+    return str(doc.metadata.get("source", "")).lower().endswith(".py")
+
+
+def _is_pdf(doc: Any) -> bool:
+    return str(doc.metadata.get("source", "")).lower().endswith(".pdf")
+
+
+def _is_message(doc: Any) -> bool:
+    return "message-id" in doc.metadata and "role" in doc.metadata
+
+
+class StructuredSplitter:
+    """Drop-in for `RecursiveCharacterTextSplitter.split_documents` (by type)."""
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, code_chunk_size: int | None = None):
+        from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+        self.chunk_size = int(chunk_size)
+        self.code_chunk_size = int(code_chunk_size or chunk_size)
+        self._text = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size, chunk_overlap=chunk_overlap, length_function=len,
+        )
+        self._code = RecursiveCharacterTextSplitter.from_language(
+            Language.PYTHON, chunk_size=self.code_chunk_size, chunk_overlap=chunk_overlap,
+        )
+
+    def split_documents(self, docs: Iterable[Any]) -> list[Any]:
+        chunks: list[Any] = []
+        for doc in docs:
+            if _is_python(doc):
+                chunks.extend(self._split_python(doc))
+            elif _is_pdf(doc):
+                chunks.extend(self._split_spans(doc, heading_sections(doc.page_content), self.chunk_size))
+            elif _is_message(doc):
+                chunks.extend([doc] if len(doc.page_content) <= self.chunk_size else self._text.split_documents([doc]))
+            else:
+                chunks.extend(self._text.split_documents([doc]))
+        return chunks
+
+    def _split_python(self, doc: Any) -> list[Any]:
+        try:
+            units = python_units(doc.page_content, self.code_chunk_size)
+        except (SyntaxError, ValueError):
+            return self._code.split_documents([doc])
+        return self._split_spans(doc, units, self.code_chunk_size, code=True)
+
+    def _split_spans(self, doc: Any, units: list[dict], max_chars: int, code: bool = False) -> list[Any]:
+        from langchain_core.documents import Document
+
+        text = doc.page_content
+        fallback = self._code if code else self._text
+        out: list[Any] = []
+        for group in merge_units(units, max_chars):
+            meta = dict(doc.metadata)
+            if code:
+                meta["symbol"] = ", ".join(dict.fromkeys(u["symbol"] for u in group if u["symbol"]))
+                meta["line_start"] = group[0]["line_start"]
+                meta["line_end"] = group[-1]["line_end"]
+            else:
+                meta["section"] = next((u["section"] for u in group if u["section"]), "")
+            piece = Document(page_content=text[group[0]["start"]:group[-1]["end"]].strip(), metadata=meta)
+            if not piece.page_content:
+                continue
+            if len(piece.page_content) > max_chars:
+                out.extend(fallback.split_documents([piece]))
+            else:
+                out.append(piece)
+        return out
@@ -0,0 +1,565 @@
+"""SQLite docstore and persistence helpers for FAISS vector stores.
+
+`FAISS.save_local` pickles the whole docstore into `index.pkl` on every save.
+Every load then unpickles it again in full, which requires
+`allow_dangerous_deserialization=True`. This module replaces that pickle
+with `docstore.sqlite`. The file has one row per chunk, keyed by docstore id:
+
+* `SQLiteDocstore` implements LangChain's `Docstore`/`AddableMixin`.
+  Inserts are appended as rows; deletes take effect with the next
+  position sync on save. Lookups go through the primary key.
+* `id_map()` is a lazy `index_to_docstore_id` for read-only workers.
+  Together with a memory-mapped `index.faiss`, query processes share the OS
+  page cache instead of each holding a private copy.
+* Metadata filters (`filter_ids` / `filter_positions`) run as SQL over
+  expression indexes on frequently filtered keys, not as a Python scan.
+
+`save_faiss_store()` / `load_faiss_store()` replace `save_local` /
+`load_local`. A store that still has an `index.pkl` is migrated once on its
+first writable load. The pickle is kept as `index.pkl.migrated`.
+
+FAISS positions are versioned. The position -> id mapping (`positions`
+table) belongs to a *generation*. A save that only appended vectors adds
+the new positions to the current generation, so its cost follows the
+delta, not the store size. Only a save after `delete()` (FAISS renumbers,
+also when `rebuild_index` drops ids) writes the full mapping as a new
+generation. Every save stamps the generation with the file identity
+(inode, size, mtime) of the index.faiss it belongs to (`index_files`
+table); only then is index.faiss atomically replaced. A warm read-only
+worker resolves the generation of the file it actually opened and only
+sees the positions that file holds. It therefore never resolves old FAISS
+positions against a newer numbering. The last
+`AI_IDE_DOCSTORE_KEEP_GENERATIONS` (default 3) saved files stay
+resolvable; a row is deleted once no generation of those files
+references it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Iterator
+
+try:
+    from . import faiss_index  # type: ignore
+except ImportError as e:
+    msg = str(e)
+    if "no known parent package" in msg or "attempted relative import" in msg:
+        import faiss_index  # type: ignore
+    else:
+        raise
+
+try:
+    from langchain_community.docstore.base import AddableMixin, Docstore
+    _DOCSTORE_BASES: tuple = (Docstore, AddableMixin)
+except ImportError:
+    _DOCSTORE_BASES = (object,)
+
+__all__ = [
+    "DOCSTORE_FILE",
+    "INDEXED_METADATA_KEYS",
+    "SQLiteDocstore",
+    "attach_docstore",
+    "filter_text",
+    "load_faiss_store",
+    "metadata_matches",
+    "save_faiss_store",
+]
+
+DOCSTORE_FILE = "docstore.sqlite"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+try:
+    KEEP_GENERATIONS = max(1, int(os.getenv("AI_IDE_DOCSTORE_KEEP_GENERATIONS", "3").strip() or "3"))
+except Exception:
+    KEEP_GENERATIONS = 3
+
+# Metadata keys that get an SQLite expression index (filtered search).
+INDEXED_METADATA_KEYS = ("source", "titel", "role", "thread-id", "applied")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id       TEXT PRIMARY KEY,
+    content  TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    gen INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    id  TEXT NOT NULL,
+    PRIMARY KEY (gen, pos)
+);
+CREATE INDEX IF NOT EXISTS positions_id ON positions(id, gen);
+CREATE TABLE IF NOT EXISTS index_files (
+    seq      INTEGER PRIMARY KEY,
+    gen      INTEGER NOT NULL,
+    ino      INTEGER,
+    size     INTEGER,
+    mtime_ns INTEGER
+);
+"""
+
+_KEY_RE = re.compile(r"^[\w\-. ]+$")
+
+
+def _document(doc_id: str, content: str, metadata: dict):
+    from langchain_core.documents import Document
+
+    # id= keeps the docstore id on the Document (e.g. reranker score cache).
+    return Document(id=doc_id, page_content=content, metadata=metadata)
+
+
+def file_identity(path: str | Path) -> tuple[int, int, int] | None:
+    """(inode, size, mtime_ns) of *path*; survives os.replace of a temp file."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (int(st.st_ino), int(st.st_size), int(st.st_mtime_ns))
+
+
+def _meta_expr(key: str) -> str:
+    """SQL expression for a metadata key as text (literal path, so indexes apply)."""
+    if not _KEY_RE.match(key):
+        raise ValueError(f"unsupported metadata key: {key!r}")
+    return f"CAST(json_extract(metadata, '$.\"{key}\"') AS TEXT)"
+
+
+def filter_text(value: Any) -> str:
+    """Text form in which metadata filters compare values.
+
+    Both filter paths (`SQLiteDocstore._where` and `metadata_matches`)
+    compare this, so {"thread-id": "1"} matches a stored 1 on either.
+    Mirrors CAST(json_extract(...) AS TEXT): JSON true/false become 1/0,
+    lists and dicts compact JSON.
+    """
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+    return str(value)
+
+
+def metadata_matches(metadata: dict, where: dict) -> bool:
+    """Python twin of `SQLiteDocstore._where` for in-memory docstores."""
+    for key, value in (where or {}).items():
+        if value is None:
+            if metadata.get(key) is not None:
+                return False
+            continue
+        if metadata.get(key) is None:
+            return False
+        allowed = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+        if filter_text(metadata[key]) not in {filter_text(v) for v in allowed}:
+            return False
+    return True
+
+
+# CROSS JOIN fixes the join order: docs first, so the planner can use the
+# metadata expression indexes instead of scanning the generation.
+_FILTER_FROM = "docs d CROSS JOIN positions p ON p.id = d.id"
+
+
+class _PositionMap(Mapping):
+    """Lazy `index_to_docstore_id` (FAISS position -> docstore id) of the
+    docstore's generation."""
+
+    def __init__(self, docstore: "SQLiteDocstore") -> None:
+        self._ds = docstore
+
+    def __getitem__(self, pos: int) -> str:
+        row = None
+        limit = self._ds.limit
+        if 0 <= int(pos) and (limit is None or int(pos) < limit):
+            row = self._ds._query_one(
+                "SELECT id FROM positions WHERE gen = ? AND pos = ?", (self._ds.generation, int(pos))
+            )
+        if row is None:
+            raise KeyError(pos)
+        return row[0]
+
+    def __iter__(self) -> Iterator[int]:
+        scope, params = self._ds._scope()
+        for (pos,) in self._ds._query_all(f"SELECT pos FROM positions WHERE {scope} ORDER BY pos", params):
+            yield pos
+
+    def __len__(self) -> int:
+        return len(self._ds)
+
+
+class SQLiteDocstore(*_DOCSTORE_BASES):
+    """LangChain-compatible docstore backed by an SQLite file."""
+
+    def __init__(self, path: str | Path, read_only: bool = False) -> None:
+        self.path = Path(path)
+        self.read_only = read_only
+        # One connection per thread; sqlite3 objects must not be shared.
+        self._local = threading.local()
+        if not read_only:
+            with self._conn() as conn:
+                conn.executescript(_SCHEMA)
+                for key in INDEXED_METADATA_KEYS:
+                    self._create_metadata_index(conn, key)
+        # Generation, über die Positionen aufgelöst werden (Writer: neueste),
+        # und wie viele davon der geladene Index enthält (None: alle).
+        self.generation = self.latest_generation()
+        self.limit: int | None = None
+        # delete() seit dem letzten Sync: FAISS hat neu nummeriert.
+        self._renumbered = False
+
+    # ------------------------------------------------------------------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.read_only:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            else:
+                conn = sqlite3.connect(str(self.path))
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _query_one(self, sql: str, params: tuple = ()) -> tuple | None:
+        return self._conn().execute(sql, params).fetchone()
+
+    def _query_all(self, sql: str, params: tuple = ()) -> list[tuple]:
+        return self._conn().execute(sql, params).fetchall()
+
+    def _writable(self) -> sqlite3.Connection:
+        if self.read_only:
+            raise PermissionError(f"{self.path} is opened read-only")
+        return self._conn()
+
+    @staticmethod
+    def _create_metadata_index(conn: sqlite3.Connection, key: str) -> None:
+        name = "docs_meta_" + re.sub(r"\W", "_", key)
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON docs({_meta_expr(key)})')
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def __len__(self) -> int:
+        scope, params = self._scope()
+        row = self._query_one(f"SELECT COUNT(*) FROM positions WHERE {scope}", params)
+        return int(row[0]) if row else 0
+
+    def _scope(self, alias: str = "") -> tuple[str, tuple]:
+        """SQL condition for the positions this docstore resolves."""
+        if self.limit is None:
+            return f"{alias}gen = ?", (self.generation,)
+        return f"{alias}gen = ? AND {alias}pos < ?", (self.generation, self.limit)
+
+    # ------------------------------------------------------ generations
+    def latest_generation(self) -> int:
+        row = self._query_one("SELECT MAX(gen) FROM index_files")
+        return int(row[0]) if row and row[0] is not None else 0
+
+    def generation_for(self, identity: tuple[int, int, int] | None) -> int | None:
+        """Generation stamped with the index.faiss *identity* (None if unknown)."""
+        if identity is None:
+            return None
+        row = self._query_one(
+            "SELECT gen FROM index_files WHERE ino = ? AND size = ? AND mtime_ns = ? ORDER BY seq DESC",
+            tuple(identity),
+        )
+        return int(row[0]) if row else None
+
+    def use_generation(self, generation: int, limit: int | None = None) -> None:
+        """Resolve positions through *generation*, only those below *limit*
+        (the ntotal of the loaded index; later saves may have appended)."""
+        self.generation = int(generation)
+        self.limit = None if limit is None else int(limit)
+
+    # ------------------------------------------------- Docstore protocol
+    def search(self, search: str) -> Any:
+        row = self._query_one("SELECT content, metadata FROM docs WHERE id = ?", (search,))
+        if row is None:
+            # Same contract as langchain's InMemoryDocstore.
+            return f"ID {search} not found."
+        return _document(search, row[0], json.loads(row[1]))
+
+    def add(self, texts: dict) -> None:
+        """Append documents (not yet positioned until the next save)."""
+        rows = [
+            (
+                doc_id,
+                doc.page_content or "",
+                json.dumps(doc.metadata or {}, ensure_ascii=False, default=str),
+            )
+            for doc_id, doc in texts.items()
+        ]
+        conn = self._writable()
+        try:
+            with conn:
+                conn.executemany("INSERT INTO docs(id, content, metadata) VALUES (?, ?, ?)", rows)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Tried to add ids that already exist: {e}") from e
+
+    def delete(self, ids: list) -> None:
+        """Deferred: FAISS drops the ids from `index_to_docstore_id`. A row is
+        removed once no kept generation references it (`sync_positions()`),
+        so readers of an older index.faiss keep finding their rows.
+        """
+        self._writable()
+        if ids:
+            self._renumbered = True
+
+    # ------------------------------------------------------------ access
+    def id_map(self) -> Mapping:
+        return _PositionMap(self)
+
+    def positions(self) -> dict[int, str]:
+        """In-memory `index_to_docstore_id` for writers."""
+        scope, params = self._scope()
+        return dict(self._query_all(f"SELECT pos, id FROM positions WHERE {scope}", params))
+
+    def iter_documents(self) -> Iterator[Any]:
+        scope, params = self._scope("p.")
+        for doc_id, content, metadata in self._query_all(
+            "SELECT d.id, d.content, d.metadata FROM positions p JOIN docs d ON d.id = p.id "
+            f"WHERE {scope} ORDER BY p.pos",
+            params,
+        ):
+            yield _document(doc_id, content, json.loads(metadata))
+
+    def metadata_items(self) -> Iterator[tuple[str, dict]]:
+        scope, params = self._scope("p.")
+        for doc_id, metadata in self._query_all(
+            f"SELECT d.id, d.metadata FROM positions p JOIN docs d ON d.id = p.id WHERE {scope}",
+            params,
+        ):
+            yield doc_id, json.loads(metadata)
+
+    def _where(self, where: dict) -> tuple[str, list]:
+        scope, scope_params = self._scope("p.")
+        clauses: list[str] = [scope]
+        params: list[Any] = list(scope_params)
+        for key, value in (where or {}).items():
+            expr = _meta_expr(str(key))
+            if isinstance(value, (list, tuple, set, frozenset)):
+                values = [filter_text(v) for v in value]
+                if not values:
+                    return "0", []
+                clauses.append(f"{expr} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            elif value is None:
+                clauses.append(f"{expr} IS NULL")
+            else:
+                clauses.append(f"{expr} = ?")
+                params.append(filter_text(value))
+        return " AND ".join(clauses), params
+
+    def filter_ids(self, where: dict) -> list[str]:
+        """Docstore ids whose metadata matches *where* (equality / IN)."""
+        sql, params = self._where(where)
+        return [
+            row[0]
+            for row in self._query_all(
+                f"SELECT d.id FROM {_FILTER_FROM} WHERE {sql} ORDER BY p.pos",
+                tuple(params),
+            )
+        ]
+
+    def filter_positions(self, where: dict) -> list[int]:
+        """FAISS positions whose metadata matches *where*."""
+        sql, params = self._where(where)
+        return [
+            row[0]
+            for row in self._query_all(
+                f"SELECT p.pos FROM {_FILTER_FROM} WHERE {sql} ORDER BY p.pos",
+                tuple(params),
+            )
+        ]
+
+    # ------------------------------------------------------------ writer
+    def sync_positions(
+        self,
+        index_to_docstore_id: Mapping,
+        identity: tuple[int, int, int] | None = None,
+    ) -> tuple[int, int]:
+        """Store *index_to_docstore_id*, the writer's complete mapping.
+
+        If FAISS only appended since the last sync, the new positions are
+        added to the current generation. After `delete()`, or if the
+        stored positions are no longer a prefix of the mapping, the whole
+        mapping becomes a new generation. *identity* is the file identity
+        of the index.faiss that will carry the mapping (see
+        `file_identity`). Only the last `KEEP_GENERATIONS` files stay
+        resolvable; then every row none of their generations references is
+        dropped. Returns (positions that changed, deleted rows).
+        """
+        conn = self._writable()
+        appended = self._appended(index_to_docstore_id)
+        with conn:
+            if appended is not None:
+                gen = self.generation
+                rows = appended
+            else:
+                previous = self.positions()
+                gen = self.latest_generation() + 1
+                rows = sorted((int(pos), doc_id) for pos, doc_id in index_to_docstore_id.items())
+            ino, size, mtime_ns = identity if identity is not None else (None, None, None)
+            conn.execute(
+                "INSERT INTO index_files(gen, ino, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                (gen, ino, size, mtime_ns),
+            )
+            conn.executemany(
+                "INSERT INTO positions(gen, pos, id) VALUES (?, ?, ?)",
+                [(gen, pos, doc_id) for pos, doc_id in rows],
+            )
+            conn.execute(
+                "DELETE FROM index_files WHERE seq NOT IN "
+                "(SELECT seq FROM index_files ORDER BY seq DESC LIMIT ?)",
+                (KEEP_GENERATIONS,),
+            )
+            dropped = conn.execute(
+                "DELETE FROM positions WHERE gen < (SELECT MIN(gen) FROM index_files)"
+            ).rowcount
+            deleted = 0
+            if dropped or appended is None:
+                deleted = conn.execute(
+                    "DELETE FROM docs WHERE NOT EXISTS (SELECT 1 FROM positions p WHERE p.id = docs.id)"
+                ).rowcount
+        self.generation = gen
+        self.limit = None
+        self._renumbered = False
+        if appended is not None:
+            return len(appended), int(deleted or 0)
+        changed = sum(1 for pos, doc_id in rows if previous.get(pos) != doc_id)
+        return changed, int(deleted or 0)
+
+    def _appended(self, mapping: Mapping) -> list[tuple[int, str]] | None:
+        """Positions *mapping* added to the current generation, or None if
+        FAISS renumbered (then the full mapping needs a new generation)."""
+        if self._renumbered or self.generation != self.latest_generation() or not self.generation:
+            return None
+        row = self._query_one(
+            "SELECT pos, id FROM positions WHERE gen = ? ORDER BY pos DESC LIMIT 1", (self.generation,)
+        )
+        stored = int(row[0]) + 1 if row else 0
+        if len(mapping) < stored or (row is not None and mapping.get(row[0]) != row[1]):
+            return None
+        rows = [(pos, mapping.get(pos)) for pos in range(stored, len(mapping))]
+        if any(doc_id is None for _pos, doc_id in rows):
+            return None
+        return rows
+
+    def sync_from(self, store: Any) -> tuple[int, int]:
+        """Mirror a LangChain FAISS store with an in-memory docstore.
+
+        Used to migrate `index.pkl`. Returns (inserted, deleted).
+        """
+        conn = self._writable()
+        docs = store.docstore._dict
+        existing = {row[0] for row in conn.execute("SELECT id FROM docs")}
+        new = {i: docs[i] for i in store.index_to_docstore_id.values() if i not in existing and i in docs}
+        self.add(new)
+        return len(new), self.sync_positions(store.index_to_docstore_id)[1]
+
+
+# ───────────────────────── FAISS persistence ─────────────────────────
+def attach_docstore(store: Any, store_dir: str | Path) -> SQLiteDocstore:
+    """Move *store*'s documents into `<store_dir>/docstore.sqlite`.
+
+    Later `add_documents` calls then insert rows directly. No-op if the
+    store already uses that file.
+    """
+    path = Path(store_dir) / DOCSTORE_FILE
+    docstore = store.docstore
+    if isinstance(docstore, SQLiteDocstore) and docstore.path == path and not docstore.read_only:
+        return docstore
+    Path(store_dir).mkdir(parents=True, exist_ok=True)
+    target = SQLiteDocstore(path)
+    if isinstance(docstore, SQLiteDocstore):
+        rows = {i: docstore.search(i) for i in store.index_to_docstore_id.values()}
+        target.add({i: d for i, d in rows.items() if not isinstance(d, str)})
+    else:
+        target.sync_from(store)
+    store.docstore = target
+    return target
+
+
+def _read_index(index_file: Path, mmap: bool):
+    import faiss
+
+    if mmap:
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        try:
+            return faiss.read_index(str(index_file), flags)
+        except RuntimeError:
+            # Older FAISS versions cannot map every index type.
+            return faiss.read_index(str(index_file), faiss.IO_FLAG_READ_ONLY)
+    return faiss.read_index(str(index_file))
+
+
+def load_faiss_store(store_dir: str | Path, embeddings: Any, read_only: bool = False):
+    """Load a FAISS store backed by docstore.sqlite (or None if absent).
+
+    read_only=True memory-maps index.faiss and resolves ids lazily.
+    A writable load migrates a legacy index.pkl once.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    store_dir = Path(store_dir)
+    index_file = store_dir / "index.faiss"
+    if not index_file.exists():
+        return None
+    db_file = store_dir / DOCSTORE_FILE
+    legacy = store_dir / LEGACY_DOCSTORE_FILE
+
+    if legacy.exists() and (not read_only or not db_file.exists()):
+        # Pre-SQLite store: the pickle is trusted exactly once.
+        store = FAISS.load_local(str(store_dir), embeddings, allow_dangerous_deserialization=True)
+        if read_only:
+            return store
+        attach_docstore(store, store_dir)
+        os.replace(legacy, legacy.with_name(LEGACY_DOCSTORE_FILE + ".migrated"))
+        return store
+
+    if not db_file.exists():
+        raise FileNotFoundError(f"{db_file} missing for {index_file}")
+    # Identität vor und nach dem Lesen gleich => genau diese Datei geladen
+    # (ein Writer kann index.faiss dazwischen ersetzen).
+    for _attempt in range(3):
+        identity = file_identity(index_file)
+        index = _read_index(index_file, mmap=read_only)
+        if file_identity(index_file) == identity:
+            break
+    docstore = SQLiteDocstore(db_file, read_only=read_only)
+    generation = docstore.generation_for(identity) if read_only else None
+    # Spätere Saves können Positionen angehängt haben, die dieser Index nicht kennt.
+    docstore.use_generation(generation or docstore.generation, limit=int(index.ntotal))
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=docstore.id_map() if read_only else docstore.positions(),
+    )
+
+
+def save_faiss_store(store: Any, store_dir: str | Path) -> None:
+    """Persist *store*: new index file, its position generation, then the
+    atomic replace of index.faiss."""
+    import faiss
+
+    store_dir = Path(store_dir)
+    docstore = attach_docstore(store, store_dir)
+    tmp = store_dir / f".index.faiss.{os.getpid()}.tmp"
+    try:
+        # Direct-Map mitschreiben: mmap'd Reader können sie nicht selbst bauen.
+        faiss_index.prepare_for_mmap(store.index)
+        faiss.write_index(store.index, str(tmp))
+        # os.replace behält Inode und mtime: die Identität stempelt die Generation.
+        docstore.sync_positions(store.index_to_docstore_id, identity=file_identity(tmp))
+        os.replace(tmp, store_dir / "index.faiss")
+    finally:
+        tmp.unlink(missing_ok=True)
@@ -33,6 +33,11 @@ except Exception as exc:  # pragma: no cover
     print("[error] Required langchain/FAISS dependencies missing:", exc, file=sys.stderr)
     raise SystemExit(5)
 
+try:
+    from .docstore_db import attach_docstore, load_faiss_store, save_faiss_store
+except ImportError:
+    from docstore_db import attach_docstore, load_faiss_store, save_faiss_store
+
 #try:
  ##   from .iter_documents import iter_documents  # package relative
 #except Exception:  # pragma: no cover
@@ -55,7 +60,7 @@ def _load_index(index_dir: Path, embeddings: HuggingFaceEmbeddings) -> FAISS | N
         return None
     try:
         _verbose("Loading existing FAISS index")
-        return FAISS.load_local(str(index_dir), embeddings, allow_dangerous_deserialization=True)
+        return load_faiss_store(index_dir, embeddings)
     except Exception as exc:  # pragma: no cover
         print(f"[warn] Could not load index: {exc}")
         return None
@@ -94,6 +99,7 @@ def build(root: Path, index_dir: Path, model: str, chunk_size: int, chunk_overla
             print("[info] No documents to build index.")
             return
         store = FAISS.from_documents(chunks, embeddings)
+        attach_docstore(store, index_dir)
         _verbose("Created new index")
     else:
         if chunks:
@@ -101,7 +107,7 @@ def build(root: Path, index_dir: Path, model: str, chunk_size: int, chunk_overla
             _verbose("Extended existing index")
         else:
             _verbose("No new chunks to add")
-    store.save_local(str(index_dir))
+    save_faiss_store(store, index_dir)
     print(f"[ok] Index saved at {index_dir}")
 
 
@@ -131,7 +137,7 @@ def stats(root: Path, index_dir: Path, model: str) -> None:
     print(f"Vectors: {count}")
     # Show ext distribution from stored docs
     ext_counts: dict[str, int] = {}
-    for doc in store.docstore._dict.values():
+    for doc in store.docstore.iter_documents():
         src = str(doc.metadata.get("source", ""))
         ext = Path(src).suffix.lower()
         ext_counts[ext] = ext_counts.get(ext, 0) + 1
@@ -149,7 +155,7 @@ def dump(root: Path, index_dir: Path, model: str, out_file: Path) -> None:
         return
     payload = [
         {"content": d.page_content, "metadata": d.metadata}
-        for d in store.docstore._dict.values()
+        for d in store.docstore.iter_documents()
     ]
     out_file.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
     print(f"[ok] Dumped {len(payload)} documents to {out_file}")
@@ -0,0 +1,349 @@
+"""FAISS index types and trained-index lifecycle for `vstores.VectorStore`.
+
+`FAISS.from_documents` always creates an exact `IndexFlatL2`. Its query
+time grows linearly with the number of vectors, and it keeps the whole
+float32 matrix in RAM. For large stores this module can replace it with an
+approximate index:
+
+    flat    IndexFlatL2 (exact; the default)
+    ivf     IVF<nlist>,Flat     (trained coarse quantizer)
+    ivfpq   IVF<nlist>,PQ<m>    (trained, compressed codes)
+    hnsw    HNSW<M>             (graph, no training, no remove_ids)
+
+Any other value is passed to `faiss.index_factory` verbatim.
+
+The vectors of an existing index are reconstructed, a random sample is used
+for training, and the new index gets the vectors in the same order. The
+LangChain `index_to_docstore_id` mapping therefore stays valid. Compressed
+indexes (`is_lossy`, e.g. ivfpq) only reconstruct approximations; they are
+rebuilt from freshly embedded chunk texts instead (see
+`VectorStore.rebuild_index`).
+
+faiss/numpy are imported lazily (they come with langchain's FAISS store).
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Any
+
+__all__ = [
+    "INDEX_KINDS",
+    "factory_string",
+    "index_kind",
+    "is_lossy",
+    "apply_search_params",
+    "reconstruct_vectors",
+    "prepare_for_mmap",
+    "build_index",
+    "benchmark",
+    "vectors_at",
+    "search",
+    "search_subset",
+    "mmr_select",
+    "best_per_group",
+]
+
+INDEX_KINDS = ("flat", "ivf", "ivfpq", "hnsw")
+
+# FAISS trainiert IVF-Quantisierer mit ~39 Punkten je Liste am stabilsten.
+_MIN_POINTS_PER_LIST = 39
+_HNSW_M = 32
+
+
+def _nlist_for(ntotal: int) -> int:
+    """Faustregel: ~4*sqrt(n) Listen, aber genug Trainingspunkte pro Liste."""
+    nlist = int(4 * math.sqrt(max(ntotal, 1)))
+    nlist = min(nlist, max(1, ntotal // _MIN_POINTS_PER_LIST))
+    return max(1, nlist)
+
+
+def _pq_m_for(dim: int) -> int:
+    """Größtes übliches Subquantizer-M, das `dim` teilt (8 bit je Code)."""
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2):
+        if m <= dim and dim % m == 0:
+            return m
+    return 1
+
+
+def factory_string(kind: str, dim: int, ntotal: int) -> str:
+    """`faiss.index_factory` string for *kind* at the given size."""
+    kind = (kind or "flat").strip()
+    key = kind.lower()
+    if key == "flat":
+        return "Flat"
+    if key == "ivf":
+        return f"IVF{_nlist_for(ntotal)},Flat"
+    if key == "ivfpq":
+        return f"IVF{_nlist_for(ntotal)},PQ{_pq_m_for(dim)}"
+    if key == "hnsw":
+        return f"HNSW{_HNSW_M}"
+    return kind
+
+
+def index_kind(index: Any) -> str:
+    """Best-effort classification of a live FAISS index."""
+    name = type(index).__name__
+    if "HNSW" in name:
+        return "hnsw"
+    if "IVFPQ" in name:
+        return "ivfpq"
+    if "IVF" in name:
+        return "ivf"
+    if "Flat" in name:
+        return "flat"
+    return name
+
+
+def is_lossy(index: Any) -> bool:
+    """True if `reconstruct` only yields approximations (PQ/SQ codes, unknown types).
+
+    Training a new quantizer on such reconstructions compounds the error.
+    """
+    name = type(index).__name__
+    if any(tag in name for tag in ("PQ", "ScalarQuantizer", "LSH", "RaBitQ")):
+        return True
+    return index_kind(index) not in INDEX_KINDS
+
+
+def apply_search_params(index: Any, nprobe: int = 0, ef_search: int = 0) -> None:
+    """Set `nprobe` (IVF) / `efSearch` (HNSW) on *index*; no-op for Flat."""
+    import faiss
+
+    kind = index_kind(index)
+    try:
+        if kind in {"ivf", "ivfpq"} and nprobe > 0:
+            ivf = faiss.extract_index_ivf(index)
+            ivf.nprobe = min(int(nprobe), ivf.nlist)
+        elif kind == "hnsw" and ef_search > 0:
+            index.hnsw.efSearch = int(ef_search)
+    except Exception:
+        pass
+
+
+def reconstruct_vectors(index: Any):
+    """All stored vectors (ntotal x d, float32) in id order."""
+    import faiss
+    import numpy as np
+
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype="float32")
+    if index_kind(index) in {"ivf", "ivfpq"}:
+        _ensure_direct_map(index)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def _ensure_direct_map(index: Any) -> None:
+    """Hashtable direct map on IVF indices: allows reconstruct AND remove_ids."""
+    import faiss
+
+    ivf = faiss.extract_index_ivf(index)
+    if ivf.direct_map.type != faiss.DirectMap.Hashtable:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+
+def prepare_for_mmap(index: Any) -> bool:
+    """Build the IVF direct map before `write_index`; False if that failed.
+
+    The map is serialised with the index. Read-only mmap'd copies then
+    reconstruct vectors without having to build it themselves, which some
+    FAISS versions refuse on a read-only mapping.
+    """
+    if index_kind(index) not in {"ivf", "ivfpq"}:
+        return True
+    try:
+        _ensure_direct_map(index)
+    except Exception:
+        return False
+    return True
+
+
+def build_index(kind: str, vectors, train_sample: int = 50_000, seed: int = 1234):
+    """New index of *kind* holding *vectors* in the same order.
+
+    Trainable indices are trained on a random sample of at most
+    `train_sample` vectors.
+    """
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(kind, dim, n), faiss.METRIC_L2)
+    if not index.is_trained:
+        if n == 0:
+            raise ValueError("cannot train an index without vectors")
+        sample = vectors
+        if train_sample and n > train_sample:
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(n, size=int(train_sample), replace=False)]
+        index.train(sample)
+    if n:
+        index.add(vectors)
+    return index
+
+
+def benchmark(index: Any, vectors=None, k: int = 10, n_queries: int = 100, seed: int = 1234) -> dict:
+    """Recall@k and mean latency of *index* against an exact flat search.
+
+    Stored vectors (sampled) serve as queries, so no embedding model is
+    needed. Returns a JSON-serialisable dict.
+    """
+    import faiss
+    import numpy as np
+
+    if vectors is None:
+        vectors = reconstruct_vectors(index)
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n = vectors.shape[0]
+    report: dict[str, Any] = {
+        "kind": index_kind(index),
+        "ntotal": int(index.ntotal),
+        "k": int(k),
+        "queries": 0,
+    }
+    if n == 0:
+        return report
+    k = min(int(k), n)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(n, size=min(int(n_queries), n), replace=False)]
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+
+    t0 = time.perf_counter()
+    _, truth = exact.search(queries, k)
+    t_exact = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _, found = index.search(queries, k)
+    t_index = time.perf_counter() - t0
+
+    hits = sum(len(set(t.tolist()) & set(f.tolist())) for t, f in zip(truth, found))
+    report.update(
+        queries=int(len(queries)),
+        recall_at_k=hits / float(len(queries) * k),
+        latency_ms_index=1000.0 * t_index / len(queries),
+        latency_ms_exact=1000.0 * t_exact / len(queries),
+    )
+    if hasattr(faiss, "extract_index_ivf") and report["kind"] in {"ivf", "ivfpq"}:
+        report["nprobe"] = int(faiss.extract_index_ivf(index).nprobe)
+    if report["kind"] == "hnsw":
+        report["efSearch"] = int(index.hnsw.efSearch)
+    return report
+
+
+def vectors_at(index: Any, positions):
+    """Stored vectors for *positions* (len(positions) x d, float32)."""
+    import numpy as np
+
+    positions = np.asarray(positions, dtype="int64")
+    if index_kind(index) in {"ivf", "ivfpq"}:
+        # reconstruct() auf IVF braucht eine Direct-Map.
+        _ensure_direct_map(index)
+    try:
+        return np.asarray(index.reconstruct_batch(positions), dtype="float32")
+    except Exception:
+        return np.vstack([index.reconstruct(int(p)) for p in positions]).astype("float32")
+
+
+def search(index: Any, query_vector, k: int):
+    """Plain top-k over the whole index: (distances, positions) ascending."""
+    import numpy as np
+
+    q = np.asarray(query_vector, dtype="float32").reshape(1, -1)
+    k = min(int(k), int(index.ntotal))
+    if k <= 0:
+        return np.zeros(0, dtype="float32"), np.zeros(0, dtype="int64")
+    dist, ids = index.search(q, k)
+    keep = ids[0] >= 0
+    return dist[0][keep], ids[0][keep]
+
+
+def search_subset(index: Any, query_vector, positions, k: int, exact_max: int = 4096, nprobe: int = 0):
+    """k-NN restricted to *positions* (e.g. from a metadata pre-filter).
+
+    Small candidate sets are scored exactly from their reconstructed
+    vectors, at a cost proportional to the set rather than the index.
+    Larger sets, and indexes that cannot reconstruct (e.g. a read-only
+    mmap'd IVF index without a direct map), use a FAISS `IDSelectorBatch`,
+    which IVF indices combine with list pruning. Returns (distances,
+    positions) sorted ascending.
+    """
+    import faiss
+    import numpy as np
+
+    positions = np.asarray(positions, dtype="int64")
+    q = np.asarray(query_vector, dtype="float32").reshape(1, -1)
+    k = min(int(k), len(positions))
+    if k <= 0:
+        return np.zeros(0, dtype="float32"), np.zeros(0, dtype="int64")
+
+    if len(positions) <= exact_max:
+        try:
+            vectors = vectors_at(index, positions)
+        except Exception:
+            vectors = None  # keine Direct-Map möglich → IDSelector-Suche
+        if vectors is not None:
+            dist = ((vectors - q) ** 2).sum(axis=1)
+            top = np.argpartition(dist, k - 1)[:k] if k < len(dist) else np.arange(len(dist))
+            top = top[np.argsort(dist[top], kind="stable")]
+            return dist[top].astype("float32"), positions[top]
+
+    selector = faiss.IDSelectorBatch(positions)
+    if index_kind(index) in {"ivf", "ivfpq"}:
+        ivf = faiss.extract_index_ivf(index)
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=int(nprobe or ivf.nprobe))
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    dist, ids = index.search(q, k, params=params)
+    keep = ids[0] >= 0
+    return dist[0][keep], ids[0][keep]
+
+
+def mmr_select(query_vector, vectors, k: int, lambda_mult: float = 0.5, groups=None) -> list[int]:
+    """Maximal-marginal-relevance selection over candidate *vectors*.
+
+    Same criterion as LangChain's `maximal_marginal_relevance` (cosine
+    similarity, first pick = most relevant). Relevance and the pairwise
+    similarity matrix are computed once, so each step is one vector update.
+    With *groups* (one int per candidate, e.g. the source) at most one
+    candidate per group is selected, which dedups in the same pass.
+    Returns row indices into *vectors* in selection order.
+    """
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype="float32")
+    n = len(vectors)
+    if n == 0 or k <= 0:
+        return []
+    q = np.asarray(query_vector, dtype="float32").reshape(-1)
+    unit = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    relevance = unit @ (q / max(float(np.linalg.norm(q)), 1e-12))
+    pairwise = unit @ unit.T
+
+    available = np.ones(n, dtype=bool)
+    redundancy = np.full(n, -np.inf, dtype="float32")
+    groups = None if groups is None else np.asarray(groups)
+    selected: list[int] = []
+    while len(selected) < k and available.any():
+        score = relevance if not selected else lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        score = np.where(available, score, -np.inf)
+        i = int(np.argmax(score))
+        selected.append(i)
+        available[i] = False
+        if groups is not None:
+            available &= groups != groups[i]
+        np.maximum(redundancy, pairwise[i], out=redundancy)
+    return selected
+
+
+def best_per_group(distances, groups):
+    """Index of the smallest distance per group, in ascending distance order."""
+    import numpy as np
+
+    distances = np.asarray(distances)
+    order = np.argsort(distances, kind="stable")
+    _, first = np.unique(np.asarray(groups)[order], return_index=True)
+    return order[np.sort(first)]
@@ -0,0 +1,156 @@
+"""Federated query over several vector stores (one round trip).
+
+`tools.vectordb()` and `tools.memorydb()` each hit one store. An agent
+that needs project code *and* chat history paid for two worker calls in a
+row. `federated_query` searches several loaded `VectorStore`s concurrently
+(FAISS and the embedding model release the GIL), then merges everything
+into one ranked payload:
+
+* FAISS scores are L2 distances, and their scale differs per store and
+  index type. Each store's hits are first mapped to a relevance in [0, 1]
+  (min-max within the store, 1 => best hit). With `method="rrf"`, reciprocal
+  rank fusion is used instead, which ignores the raw distances.
+* per-store quotas cap how many hits one store may contribute (default:
+  ceil(k / n_stores)). Free slots are then filled from the remaining hits
+  in relevance order, so a quota never leaves the result short.
+* the same chunk indexed in two stores (same source/page/content) is kept
+  once.
+
+Every item keeps its original fields (`score` stays the store distance) and
+gains `store` and `relevance`; `rank` is renumbered across the merge.
+A store that fails is reported under `errors` and does not fail the query.
+
+Used by `tools.vectordb_multi`. With the worker pool (vdb_pool.py), the
+stores passed in are proxies that query each store's own warm worker.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Mapping, Sequence
+
+__all__ = ["normalize_scores", "merge_results", "federated_query"]
+
+_RRF_K = 60
+
+
+def normalize_scores(items: Sequence[dict], method: str = "minmax") -> list[float]:
+    """Relevance in [0, 1] per item (higher is better) from store distances."""
+    if not items:
+        return []
+    if method == "rrf":
+        # Skaliert auf 1.0 für den besten Treffer
+        return [(_RRF_K + 1) / (_RRF_K + rank) for rank in range(1, len(items) + 1)]
+    scores = []
+    for item in items:
+        try:
+            scores.append(float(item.get("score")))
+        except (TypeError, ValueError):
+            scores.append(math.inf)
+    finite = [s for s in scores if math.isfinite(s)]
+    if not finite:
+        return [0.0] * len(items)
+    lo, hi = min(finite), max(finite)
+    span = hi - lo
+    out = []
+    for s in scores:
+        if not math.isfinite(s):
+            out.append(0.0)
+        elif span <= 0:
+            out.append(1.0)
+        else:
+            out.append(1.0 - (s - lo) / span)
+    return out
+
+
+def _identity(item: dict) -> tuple:
+    content = str(item.get("content") or "")
+    digest = hashlib.sha1(content.encode("utf-8", "surrogatepass")).hexdigest()
+    return (item.get("source"), item.get("page"), digest)
+
+
+def merge_results(
+    results: Mapping[str, Sequence[dict]],
+    k: int,
+    quotas: Mapping[str, int] | None = None,
+    method: str = "minmax",
+) -> list[dict]:
+    """Merge per-store payloads (store -> ranked items) into one ranking."""
+    k = max(1, int(k))
+    stores = [name for name, items in results.items() if items]
+    if not stores:
+        return []
+    default_quota = math.ceil(k / len(stores))
+    quotas = dict(quotas or {})
+
+    candidates: list[tuple] = []
+    for order, name in enumerate(stores):
+        items = [it for it in results[name] if isinstance(it, dict)]
+        for pos, (item, relevance) in enumerate(zip(items, normalize_scores(items, method))):
+            merged = dict(item)
+            merged["store"] = name
+            merged["relevance"] = round(relevance, 6)
+            # Tie-break: Position im Store, dann Reihenfolge der Stores
+            candidates.append((-relevance, pos, order, merged))
+    candidates.sort(key=lambda c: c[:3])
+
+    taken: list[dict] = []
+    seen: set[tuple] = set()
+    per_store: dict[str, int] = {}
+    overflow: list[dict] = []
+    for *_, item in candidates:
+        key = _identity(item)
+        if key in seen:
+            continue
+        seen.add(key)
+        name = item["store"]
+        if per_store.get(name, 0) >= int(quotas.get(name, default_quota)):
+            overflow.append(item)
+            continue
+        per_store[name] = per_store.get(name, 0) + 1
+        taken.append(item)
+        if len(taken) >= k:
+            break
+    if len(taken) < k:
+        taken.extend(overflow[: k - len(taken)])
+        taken.sort(key=lambda it: -it["relevance"])
+
+    for rank, item in enumerate(taken, 1):
+        item["rank"] = rank
+    return taken
+
+
+def federated_query(
+    stores: Mapping[str, Any],
+    query: str,
+    k: int = 5,
+    filter_dict: dict | None = None,
+    quotas: Mapping[str, int] | None = None,
+    method: str = "minmax",
+    max_workers: int | None = None,
+) -> dict:
+    """Query every store in *stores* (name -> VectorStore) concurrently.
+
+    Returns {"results": [...], "errors": {store: message}}.
+    """
+    errors: dict[str, str] = {}
+    results: dict[str, list] = {}
+    if not stores:
+        return {"results": [], "errors": errors}
+
+    def _one(name: str) -> list:
+        return stores[name].query(query, k=int(k), filter_dict=dict(filter_dict or {}))
+
+    names = list(stores)
+    with ThreadPoolExecutor(max_workers=max_workers or len(names), thread_name_prefix="vdb-federated") as pool:
+        futures = {name: pool.submit(_one, name) for name in names}
+        for name in names:
+            try:
+                payload = futures[name].result()
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+                continue
+            results[name] = payload if isinstance(payload, list) else []
+    return {"results": merge_results(results, k, quotas=quotas, method=method), "errors": errors}
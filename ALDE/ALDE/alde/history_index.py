@@ -0,0 +1,297 @@
+"""Per-thread message window for `ChatHistory._insert`.
+
+`_insert` builds the messages for every model call. It used to scan the
+whole `ChatHistory._history_` twice: once to map tool_call_id → tool
+response, once to filter by thread and normalise. Only after that did it
+slice the last `f_depth` messages. The history is loaded from
+history.json and grows across sessions, so each turn got slower over
+time.
+
+`HistoryIndex` keeps the normalised data up to date as messages arrive:
+
+* one ring buffer per thread-id. Entries hold the message dict already
+  built for the API (content clamped, `name` coerced to str) and the
+  serialised tool calls. Entries without a thread-id sit in a shared
+  buffer that every thread sees, as before.
+* tool responses keyed by tool_call_id (clamped, bounded LRU).
+
+`window()` walks the buffers backwards and stops once it has `depth`
+messages, so its cost depends on the depth, not on the size of the
+history. `sync(history)` indexes only entries appended since the last
+call. If the list was replaced (e.g. reloaded from disk) or shrank, it
+rebuilds the index once. Entries changed in place after they were
+logged are not picked up.
+
+`window()` returns None if a ring buffer is too short for the request
+(e.g. `f_role` filters out many entries), or if a tool call in the window
+has no response in the index and responses logged after it have been
+evicted from the LRU (the response may have been among them). `scan()`
+then gives the same result from the full list.
+
+Controls:
+    AI_IDE_HISTORY_WINDOW       entries kept per thread (default: 512)
+    AI_IDE_HISTORY_TOOL_INDEX   tool responses kept by id (default: 4096)
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Hashable, Iterable, Iterator
+
+__all__ = [
+    "HistoryIndex",
+    "normalize_msg_name",
+    "truncate_text",
+    "CONTENT_MAX_CHARS",
+    "TOOL_CONTENT_MAX_CHARS",
+]
+
+CONTENT_MAX_CHARS = 20000
+# Tool outputs can be massive (vector results, JSON dumps). Hard-cap them.
+TOOL_CONTENT_MAX_CHARS = 8000
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default)).strip() or default))
+    except Exception:
+        return default
+
+
+HISTORY_WINDOW = _env_int("AI_IDE_HISTORY_WINDOW", 512)
+HISTORY_TOOL_INDEX = _env_int("AI_IDE_HISTORY_TOOL_INDEX", 4096)
+
+
+def truncate_text(val: Any, *, max_chars: int) -> str:
+    if val is None:
+        return ""
+    if not isinstance(val, str):
+        try:
+            val = json.dumps(val, ensure_ascii=False)
+        except Exception:
+            val = str(val)
+    if len(val) <= max_chars:
+        return val
+    return val[:max_chars] + "\n\n[TRUNCATED]"
+
+
+def normalize_msg_name(val: Any) -> str | None:
+    """OpenAI chat messages accept optional `name` but it must be a string."""
+    if val is None:
+        return None
+    if isinstance(val, str):
+        return val
+    try:
+        if isinstance(val, (list, tuple)) and val:
+            first = val[0]
+            if isinstance(first, dict):
+                cand = first.get("name") or first.get("type")
+                if isinstance(cand, str) and cand:
+                    return cand
+            if all(isinstance(x, str) for x in val):
+                joined = ",".join(val)
+                return joined or None
+            return json.dumps(val, ensure_ascii=False)
+        if isinstance(val, dict):
+            cand = val.get("name") or val.get("type")
+            if isinstance(cand, str) and cand:
+                return cand
+            return json.dumps(val, ensure_ascii=False)
+        return str(val)
+    except Exception:
+        return None
+
+
+def _serialize_tool_call(tc: Any) -> tuple[Any, Any]:
+    """(id, API dict) for a logged tool call (dict or SDK object)."""
+    tc_id = tc.get("id") if isinstance(tc, dict) else getattr(tc, "id", None)
+    if isinstance(tc, dict):
+        return tc_id, tc
+    if hasattr(tc, "model_dump"):
+        return tc_id, tc.model_dump()
+    fn = getattr(tc, "function", None)
+    return tc_id, {
+        "id": tc_id,
+        "type": "function",
+        "function": {
+            "name": getattr(fn, "name", "") if fn is not None else "",
+            "arguments": getattr(fn, "arguments", "{}") if fn is not None else "{}",
+        },
+    }
+
+
+def _thread_key(entry: dict) -> Hashable:
+    key = entry.get("thread-id")
+    try:
+        hash(key)
+    except TypeError:
+        key = str(key)
+    return key
+
+
+def _tool_response(entry: dict) -> tuple[Any, dict] | None:
+    tid = entry.get("tool_call_id")
+    if not tid:
+        return None
+    tool_name = normalize_msg_name(entry.get("name"))
+    return tid, {
+        "role": "tool",
+        "content": truncate_text(entry.get("content", ""), max_chars=TOOL_CONTENT_MAX_CHARS),
+        "tool_call_id": tid,
+        **({"name": tool_name} if tool_name else {}),
+    }
+
+
+def _message(pos: int, entry: dict) -> tuple[int, dict, list]:
+    """Index entry: (position, API message, [(tool_call_id, tool_call), ...])."""
+    msg = {
+        "role": entry.get("role"),
+        "content": truncate_text(entry.get("content", ""), max_chars=CONTENT_MAX_CHARS),
+    }
+    name_str = normalize_msg_name(entry.get("name"))
+    if name_str:
+        msg["name"] = name_str
+    calls = []
+    if entry.get("role") == "assistant" and entry.get("tool_calls"):
+        calls = [_serialize_tool_call(tc) for tc in entry.get("tool_calls")]
+    return pos, msg, calls
+
+
+def _expand(item: tuple[int, dict, list], tool: bool, f_role: str | None,
+            responses: dict) -> list[dict]:
+    """API messages for one entry: assistant + its answered tool responses."""
+    _pos, base, calls = item
+    if tool and calls:
+        valid = [(tc_id, tc) for tc_id, tc in calls if tc_id and tc_id in responses]
+        if valid:
+            msg = dict(base)
+            msg["tool_calls"] = [tc for _, tc in valid]
+            return [msg] + [dict(responses[tc_id]) for tc_id, _ in valid]
+    if base.get("role") == f_role:
+        return []
+    return [dict(base)]
+
+
+def _collect(items: Iterable[tuple[int, dict, list]], depth: int, tool: bool,
+             f_role: str | None, responses: dict) -> tuple[list[dict], bool]:
+    """Walk *items* newest-first until *depth* messages; (messages, complete)."""
+    chunks: list[list[dict]] = []
+    count = 0
+    for item in items:
+        part = _expand(item, tool, f_role, responses)
+        if part:
+            chunks.append(part)
+            count += len(part)
+            if count >= depth:
+                break
+    out = [msg for part in reversed(chunks) for msg in part]
+    return out[-depth:], count >= depth
+
+
+class HistoryIndex:
+    """Incremental per-thread index over a ChatHistory list (see module doc)."""
+
+    def __init__(self, window: int = HISTORY_WINDOW, tool_index: int = HISTORY_TOOL_INDEX) -> None:
+        self.window_size = max(1, int(window))
+        self.tool_index_size = max(1, int(tool_index))
+        self._lock = threading.RLock()
+        self._reset(None)
+
+    def _reset(self, history: list | None) -> None:
+        self._source = history  # Referenz statt id(): id() kann nach GC wiederverwendet werden
+        self._indexed = 0
+        self._threads: dict[Hashable, deque] = {}
+        self._truncated: set[Hashable] = set()
+        self._tools: OrderedDict[Any, dict] = OrderedDict()
+        # Position below which evicted tool responses may have been logged.
+        self._tools_horizon = -1
+
+    # ------------------------------------------------------------------
+    def sync(self, history: list) -> None:
+        """Index entries appended to *history* since the last call."""
+        with self._lock:
+            if history is not self._source or len(history) < self._indexed:
+                self._reset(history)
+            for pos in range(self._indexed, len(history)):
+                self._add(pos, history[pos])
+            self._indexed = len(history)
+
+    def _add(self, pos: int, entry: Any) -> None:
+        if not isinstance(entry, dict):
+            return
+        if entry.get("role") == "tool":
+            resp = _tool_response(entry)
+            if resp is not None:
+                tid, msg = resp
+                self._tools[tid] = msg
+                self._tools.move_to_end(tid)
+                while len(self._tools) > self.tool_index_size:
+                    self._tools.popitem(last=False)
+                    self._tools_horizon = pos
+            return
+        key = _thread_key(entry)
+        bucket = self._threads.get(key)
+        if bucket is None:
+            bucket = self._threads[key] = deque(maxlen=self.window_size)
+        if len(bucket) == bucket.maxlen:
+            self._truncated.add(key)
+        bucket.append(_message(pos, entry))
+
+    def _newest_first(self, thread_id: Any) -> tuple[Iterator[tuple[int, dict, list]], int]:
+        """Merged entries of the thread and the shared bucket, newest first.
+
+        Also returns the horizon: the oldest position below which a truncated
+        buffer has lost entries. The merge is only complete above that.
+        """
+        keys = [thread_id] if thread_id is None else [thread_id, None]
+        buckets = [self._threads[k] for k in keys if k in self._threads]
+        horizon = max((self._threads[k][0][0] for k in keys if k in self._truncated), default=-1)
+        merged = heapq.merge(*(reversed(b) for b in buckets), key=lambda item: -item[0])
+        return (item for item in merged if item[0] >= horizon), horizon
+
+    # ------------------------------------------------------------------
+    def window(self, thread_id: Any, depth: int, *, tool: bool = False,
+               f_role: str | None = None) -> list[dict] | None:
+        """Last *depth* API messages of *thread_id*; None if the buffer is too short."""
+        with self._lock:
+            items, horizon = self._newest_first(thread_id)
+            seen: list[tuple[int, dict, list]] = []
+            out, complete = _collect((seen.append(item) or item for item in items),
+                                     depth, tool, f_role, self._tools)
+            if not complete and horizon >= 0:
+                return None
+            if tool and self._lost_tool_response(seen):
+                return None
+            return out
+
+    def _lost_tool_response(self, items: list[tuple[int, dict, list]]) -> bool:
+        """True if a call in *items* lacks a response that may have been evicted."""
+        return any(
+            pos < self._tools_horizon and tc_id and tc_id not in self._tools
+            for pos, _msg, calls in items
+            for tc_id, _tc in calls
+        )
+
+    @staticmethod
+    def scan(history: list, thread_id: Any, depth: int, *, tool: bool = False,
+             f_role: str | None = None) -> list[dict]:
+        """Same result as `window()`, computed from the full *history*."""
+        responses: dict = {}
+        items = []
+        for pos, entry in enumerate(history):
+            if not isinstance(entry, dict):
+                continue
+            if entry.get("role") == "tool":
+                resp = _tool_response(entry)
+                if resp is not None:
+                    responses[resp[0]] = resp[1]
+                continue
+            entry_thread_id = entry.get("thread-id")
+            if entry_thread_id is not None and entry_thread_id != thread_id:
+                continue
+            items.append(_message(pos, entry))
+        return _collect(reversed(items), depth, tool, f_role, responses)[0]
@@ -0,0 +1,224 @@
+"""Append-only journal for `ChatHistory` persistence.
+
+`ChatHistory._flush` dumps the whole history as pretty-printed JSON.
+`_maybe_autosave` used to call it every 8 messages, so long-running
+installations with tens of MB of history stalled on every autosave.
+
+Now `history.json` is only the *snapshot*. `ChatHistory._log` appends
+each message as one line to `history.jsonl` next to it (the journal), so
+each write is O(1):
+
+* `append(record)` writes one JSON line (sanitised with `json_safe`).
+* `compact_async(...)` rotates the journal to `history.jsonl.compacting`.
+  A background thread then merges that segment into the snapshot and
+  removes it. New messages go to a fresh journal meanwhile. Compaction
+  works from the files on disk, not from the in-memory list, so it is
+  correct even in processes that never loaded the history.
+* `load()` / `replay(snapshot)` return snapshot + segment + journal (used
+  by `ChatHistory._load`).
+* `reset(snapshot_fn)` writes a full snapshot and drops the journal
+  (`ChatHistory._flush`).
+
+A process may crash after the snapshot was written but before the
+segment or journal was removed. Records that already form the
+snapshot's tail are therefore not applied twice on replay.
+
+An existing `history.json` is used as the snapshot as-is, so old installs
+need no migration step. Other readers of `history.json` (vector store,
+JSON tree) see new messages after the next compaction.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+__all__ = ["HistoryJournal", "json_safe", "read_snapshot", "write_snapshot"]
+
+
+def json_safe(obj: Any) -> Any:
+    """Recursively coerce data into JSON-safe types."""
+    if isinstance(obj, dict):
+        safe: dict[str, Any] = {}
+        for k, v in obj.items():
+            key = k if isinstance(k, (str, int, float, bool)) or k is None else str(k)
+            safe[str(key)] = json_safe(v)
+        return safe
+    if isinstance(obj, (list, tuple)):
+        return [json_safe(x) for x in obj]
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    # Avoid str()/repr() on arbitrary extension objects (e.g. Qt/PySide)
+    # which may segfault during shutdown.
+    t = type(obj)
+    return f"[{t.__module__}.{t.__name__}]"
+
+
+def read_snapshot(path: str) -> list[Any]:
+    """The snapshot list at *path* ([] if missing); raises on corrupt JSON."""
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+    except FileNotFoundError:
+        return []
+    return data if isinstance(data, list) else []
+
+
+def write_snapshot(path: str, data: list[Any]) -> None:
+    """Atomically write *data* (already JSON-safe) as the snapshot."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fp:
+        json.dump(data, fp, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_lines(path: str) -> list[Any]:
+    records: list[Any] = []
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # halb geschriebene letzte Zeile nach Absturz
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def _ends_with(data: list[Any], tail: list[Any]) -> bool:
+    return bool(tail) and len(tail) <= len(data) and data[-len(tail):] == tail
+
+
+class HistoryJournal:
+    """JSONL journal next to the snapshot *snapshot_path* (see module doc)."""
+
+    def __init__(self, snapshot_path: str, journal_path: str | None = None) -> None:
+        self.snapshot_path = str(snapshot_path)
+        self.path = journal_path or os.path.splitext(self.snapshot_path)[0] + ".jsonl"
+        self.segment_path = self.path + ".compacting"
+        self.records = 0  # lines appended since the last rotation
+        self._fp = None
+        self._lock = threading.Lock()           # append / rotate
+        self._compact_lock = threading.RLock()  # one compaction at a time
+        self._thread: threading.Thread | None = None
+
+    # ------------------------------------------------------------------
+    def append(self, record: Any) -> None:
+        line = json.dumps(json_safe(record), ensure_ascii=False)
+        with self._lock:
+            if self._fp is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._fp = open(self.path, "a", encoding="utf-8")
+            self._fp.write(line + "\n")
+            self._fp.flush()
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._fp is not None:
+            try:
+                self._fp.close()
+            finally:
+                self._fp = None
+
+    # ------------------------------------------------------------------
+    @contextmanager
+    def paused(self) -> Iterator["HistoryJournal"]:
+        """Hold off compaction, e.g. to read snapshot and journal consistently."""
+        with self._compact_lock:
+            yield self
+
+    def load(self) -> list[Any]:
+        """Snapshot + journal; waits for a running compaction."""
+        with self._compact_lock:
+            return self._replay(read_snapshot(self.snapshot_path))
+
+    def replay(self, snapshot: list[Any]) -> list[Any]:
+        """*snapshot* plus all journal records not yet compacted into it."""
+        with self._compact_lock:
+            return self._replay(snapshot)
+
+    def _replay(self, snapshot: list[Any]) -> list[Any]:
+        with self._lock:
+            segment = _read_lines(self.segment_path)
+            journal = _read_lines(self.path)
+        data = list(snapshot)
+        if _ends_with(data, segment + journal):
+            return data
+        if not _ends_with(data, segment):
+            data.extend(segment)
+        data.extend(journal)
+        return data
+
+    def _rotate(self) -> bool:
+        """Move the journal to the segment; False if there is nothing to merge."""
+        with self._lock:
+            if os.path.exists(self.segment_path):
+                return True  # Rest einer unterbrochenen Kompaktierung
+            self._close()
+            self.records = 0
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                return False
+            os.replace(self.path, self.segment_path)
+            return True
+
+    def compact(self) -> None:
+        """Merge the journal into the snapshot (blocking)."""
+        with self._compact_lock:
+            if not self._rotate():
+                return
+            snapshot = read_snapshot(self.snapshot_path)
+            segment = _read_lines(self.segment_path)
+            if not _ends_with(snapshot, segment):
+                snapshot.extend(segment)
+                write_snapshot(self.snapshot_path, snapshot)
+            os.remove(self.segment_path)
+
+    def compact_async(self, on_error: Callable[[Exception], None] | None = None) -> bool:
+        """Start `compact()` in a daemon thread unless one is running."""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+
+        def run() -> None:
+            try:
+                self.compact()
+            except Exception as exc:
+                if on_error is not None:
+                    on_error(exc)
+
+        self._thread = threading.Thread(target=run, name="history-compact", daemon=True)
+        self._thread.start()
+        return True
+
+    def wait(self, timeout: float | None = None) -> None:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def reset(self, snapshot: Callable[[], list[Any]]) -> None:
+        """Write `snapshot()` (the complete history) and drop the journal.
+
+        Appends are blocked meanwhile, so no record falls between the
+        snapshot and the removed journal.
+        """
+        with self._compact_lock, self._lock:
+            data = snapshot()
+            self._close()
+            self.records = 0
+            write_snapshot(self.snapshot_path, data)
+            for p in (self.segment_path, self.path):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
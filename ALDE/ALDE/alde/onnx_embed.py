@@ -0,0 +1,304 @@
+"""ONNX Runtime (int8) CPU backend for the sentence-transformers embedding model.
+
+`vstores` and `rag_core` run `paraphrase-multilingual-MiniLM-L12-v2` through
+PyTorch in fp32. On CPU-only machines the same model exported to ONNX with
+dynamic int8 quantisation is considerably faster. The runtime needs only
+`onnxruntime`, `tokenizers` and `numpy`, so torch is never imported.
+
+Export once (needs `optimum[onnxruntime]`, which does use torch):
+
+    python -m alde.onnx_embed export --out AppData/onnx/paraphrase-multilingual-MiniLM-L12-v2
+
+Then check it against the torch model and measure throughput:
+
+    python -m alde.onnx_embed check AppData/onnx/paraphrase-multilingual-MiniLM-L12-v2
+    python -m alde.onnx_embed bench AppData/onnx/paraphrase-multilingual-MiniLM-L12-v2
+
+`OnnxEmbeddings` implements the LangChain `Embeddings` interface
+(embed_documents/embed_query). It also provides a
+`SentenceTransformer.encode`-compatible `encode` that returns float32 arrays.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterable, List
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:
+    _EmbeddingsBase = object
+
+__all__ = [
+    "DEFAULT_MODEL",
+    "MODEL_FILE",
+    "QUANTIZED_MODEL_FILE",
+    "OnnxEmbeddings",
+    "export_model",
+    "is_exported",
+    "parity_check",
+    "benchmark",
+]
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+DEFAULT_MAX_LENGTH = 128          # max_seq_length of the MiniLM sentence-transformer
+DEFAULT_PARITY_THRESHOLD = 0.99   # min. cosine(onnx, torch) per text
+PARITY_SAMPLE_TEXTS = (
+    "Wie erstelle ich einen FAISS-Index für meine Projektdateien?",
+    "Bewerbung als Python-Entwickler mit Erfahrung in verteilten Systemen.",
+    "def build(self, path): streams documents into the vector store",
+    "The quick brown fox jumps over the lazy dog.",
+    "Metadaten-Filter werden vor der Ähnlichkeitssuche angewendet.",
+    "Senior backend engineer, remote, Kubernetes and PostgreSQL.",
+    "",
+    "x" * 2000,
+)
+
+
+def is_exported(model_dir: str | Path, quantized: bool = True) -> bool:
+    """True if *model_dir* holds the tokenizer and the requested model file."""
+    model_dir = Path(model_dir)
+    model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+    return (model_dir / TOKENIZER_FILE).is_file() and (model_dir / model_file).is_file()
+
+
+def export_model(model_name: str = DEFAULT_MODEL, out_dir: str | Path = ".", quantize: bool = True) -> Path:
+    """Export *model_name* to ONNX (plus int8 copy) in *out_dir*.
+
+    Needs `optimum[onnxruntime]`; this is the only step that loads torch.
+    Returns the path of the model file the runtime will use.
+    """
+    from optimum.exporters.onnx import main_export
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    main_export(model_name, output=out_dir, task="feature-extraction", library_name="transformers")
+    model_path = out_dir / MODEL_FILE
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized = out_dir / QUANTIZED_MODEL_FILE
+        quantize_dynamic(str(model_path), str(quantized), weight_type=QuantType.QInt8)
+        model_path = quantized
+    (out_dir / "onnx_embed.json").write_text(
+        json.dumps({"model_name": model_name, "max_length": DEFAULT_MAX_LENGTH, "quantized": quantize}),
+        encoding="utf-8",
+    )
+    return model_path
+
+
+class OnnxEmbeddings(_EmbeddingsBase):
+    """Mean-pooled sentence embeddings from an exported ONNX model.
+
+    The pooling mirrors the sentence-transformers model: an attention-masked
+    mean over the token embeddings. L2 normalisation is optional.
+    """
+
+    def __init__(
+        self,
+        model_dir: str | Path,
+        quantized: bool = True,
+        batch_size: int = 32,
+        max_length: int | None = None,
+        normalize: bool = False,
+        threads: int = 0,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = Path(model_dir)
+        self.quantized = quantized
+        self.batch_size = max(1, int(batch_size))
+        self.normalize = normalize
+        model_file = self.model_dir / (QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not model_file.is_file():
+            raise FileNotFoundError(f"ONNX model not found: {model_file} (run `onnx_embed export` first)")
+
+        if max_length is None:
+            max_length = DEFAULT_MAX_LENGTH
+            meta_file = self.model_dir / "onnx_embed.json"
+            if meta_file.is_file():
+                max_length = int(json.loads(meta_file.read_text(encoding="utf-8")).get("max_length", max_length))
+        self.max_length = int(max_length)
+
+        self._tokenizer = Tokenizer.from_file(str(self.model_dir / TOKENIZER_FILE))
+        self._tokenizer.enable_truncation(max_length=self.max_length)
+        pad_token = next((t for t in ("<pad>", "[PAD]") if self._tokenizer.token_to_id(t) is not None), None)
+        if pad_token is not None:
+            self._tokenizer.enable_padding(pad_id=self._tokenizer.token_to_id(pad_token), pad_token=pad_token)
+        else:
+            self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = int(threads)
+        self._session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self._session.get_inputs()}
+        self._outputs = [o.name for o in self._session.get_outputs()]
+
+    @property
+    def name(self) -> str:
+        return f"onnx-int8:{self.model_dir.name}" if self.quantized else f"onnx:{self.model_dir.name}"
+
+    def _run(self, texts: List[str]):
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        outputs = dict(zip(self._outputs, self._session.run(None, feeds)))
+        if "sentence_embedding" in outputs:
+            return np.asarray(outputs["sentence_embedding"], dtype=np.float32)
+        hidden = outputs.get("last_hidden_state", next(iter(outputs.values())))
+        weights = mask[..., None].astype(np.float32)
+        summed = (hidden * weights).sum(axis=1)
+        return (summed / np.clip(weights.sum(axis=1), 1e-9, None)).astype(np.float32)
+
+    def embed_array(self, texts: List[str], normalize: bool | None = None, batch_size: int | None = None):
+        """Embeddings for *texts* as a contiguous ``(n, dim)`` float32 array."""
+        import numpy as np
+
+        batch_size = max(1, int(batch_size or self.batch_size))
+        texts = [t.replace("\n", " ") for t in texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Length-sorted batches keep the padding small.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out: Any = None
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            vectors = self._run([texts[i] for i in idx])
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[idx] = vectors
+        if self.normalize if normalize is None else normalize:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+    def encode(self, sentences, batch_size: int | None = None, show_progress_bar: bool = False,
+               normalize_embeddings: bool = False, **_kwargs):
+        """`SentenceTransformer.encode` subset (numpy output only)."""
+        single = isinstance(sentences, str)
+        vectors = self.embed_array(
+            [sentences] if single else list(sentences),
+            normalize=normalize_embeddings,
+            batch_size=batch_size,
+        )
+        return vectors[0] if single else vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+def _as_array(embedder: Any, texts: List[str]):
+    import numpy as np
+
+    if hasattr(embedder, "embed_array"):
+        return embedder.embed_array(texts)
+    return np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+
+
+def parity_check(candidate: Any, reference: Any, texts: Iterable[str] = PARITY_SAMPLE_TEXTS,
+                 threshold: float = DEFAULT_PARITY_THRESHOLD) -> dict:
+    """Cosine agreement of *candidate* with *reference* embeddings per text.
+
+    Both take LangChain `Embeddings` (or anything with `embed_array`).
+    ``passed`` is True if every text reaches *threshold*.
+    """
+    import numpy as np
+
+    texts = list(texts)
+    a = _as_array(candidate, texts)
+    b = _as_array(reference, texts)
+    if a.shape != b.shape:
+        return {"n": len(texts), "passed": False, "error": f"shape mismatch {a.shape} vs {b.shape}"}
+    denom = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    cosine = (a * b).sum(axis=1) / np.clip(denom, 1e-12, None)
+    return {
+        "n": len(texts),
+        "threshold": float(threshold),
+        "min_cosine": float(cosine.min()) if len(cosine) else 1.0,
+        "mean_cosine": float(cosine.mean()) if len(cosine) else 1.0,
+        "passed": bool((cosine >= threshold).all()),
+    }
+
+
+def benchmark(embedders: dict[str, Any], texts: Iterable[str], repeat: int = 3) -> dict:
+    """Throughput (texts/s, best of *repeat*) per named embedder."""
+    texts = list(texts)
+    report: dict[str, dict] = {}
+    for name, embedder in embedders.items():
+        _as_array(embedder, texts[:8])  # warm-up (session/graph init)
+        best = float("inf")
+        for _ in range(max(1, int(repeat))):
+            t0 = time.perf_counter()
+            _as_array(embedder, texts)
+            best = min(best, time.perf_counter() - t0)
+        report[name] = {
+            "texts": len(texts),
+            "seconds": best,
+            "texts_per_s": len(texts) / best if best > 0 else float("inf"),
+        }
+    return report
+
+
+def _benchmark_texts(n: int) -> List[str]:
+    base = [t for t in PARITY_SAMPLE_TEXTS if t]
+    return [f"{base[i % len(base)]} ({i})" for i in range(n)]
+
+
+def _torch_reference(model_name: str):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": "cpu"})
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser("ONNX embedding backend")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    p_export = sub.add_parser("export", help="Export + int8-quantise the model")
+    p_export.add_argument("--model", default=DEFAULT_MODEL)
+    p_export.add_argument("--out", required=True)
+    p_export.add_argument("--no-quantize", action="store_true")
+
+    for name, help_text in (("check", "Parity check against torch"), ("bench", "Throughput onnx vs torch")):
+        sp = sub.add_parser(name, help=help_text)
+        sp.add_argument("model_dir")
+        sp.add_argument("--model", default=DEFAULT_MODEL)
+        sp.add_argument("--fp32", action="store_true", help="Use the unquantised model.onnx")
+    sub.choices["check"].add_argument("--threshold", type=float, default=DEFAULT_PARITY_THRESHOLD)
+    sub.choices["bench"].add_argument("-n", type=int, default=512, help="Number of texts")
+
+    args = p.parse_args(argv)
+    if args.cmd == "export":
+        path = export_model(args.model, args.out, quantize=not args.no_quantize)
+        print(f"[ok] Exported {args.model} -> {path}")
+        return 0
+
+    onnx = OnnxEmbeddings(args.model_dir, quantized=not args.fp32)
+    if args.cmd == "check":
+        report = parity_check(onnx, _torch_reference(args.model), threshold=args.threshold)
+        print(json.dumps(report, indent=2))
+        return 0 if report["passed"] else 1
+    report = benchmark({onnx.name: onnx, "torch-fp32": _torch_reference(args.model)}, _benchmark_texts(args.n))
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""Bounded LRU caches for `VectorStore.query`.
+
+Agents ask the same questions over and over across turns. Each of those
+calls used to embed the query again and rerun the FAISS search, then the
+MMR or cross-encoder rerank.
+
+`QueryCache` keeps two LRU maps:
+
+* query embeddings, keyed by (embedding model, query). These do not
+  depend on the index, so they survive rebuilds.
+* final ranked payloads, keyed by (store, index version, query, k,
+  ranking settings). An index change makes the version differ, so stale
+  entries stop matching. `invalidate()` also drops them eagerly.
+
+The cache can optionally be persisted as JSON next to the index. It then
+survives worker restarts (see vdb_pool.py). Writing the whole file on
+every query would cost more than the cache saves, so changes only mark
+the cache dirty. A timer writes it `save_delay` seconds after the first
+change, and `flush_all()` writes every dirty cache at interpreter exit and
+when a pooled worker process ends.
+
+Controls (read by `vstores.py`):
+    AI_IDE_VSTORE_QUERY_CACHE          payload entries (0 => off, default: 256)
+    AI_IDE_VSTORE_EMBED_CACHE          query-embedding entries (0 => off, default: 1024)
+    AI_IDE_VSTORE_QUERY_CACHE_PERSIST  0/1 persist to <store>/query_cache.json (default: 0)
+    AI_IDE_VSTORE_QUERY_CACHE_SAVE_S   write delay after a change, 0 => at once (default: 30)
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable
+
+__all__ = ["LRUCache", "QueryCache", "flush_all"]
+
+CACHE_SCHEMA = "vstore_query_cache_v1"
+
+# Persistierte Caches dieses Prozesses (für flush_all beim Beenden).
+_PERSISTED: "weakref.WeakSet[QueryCache]" = weakref.WeakSet()
+_EXIT_HOOK_PID: int | None = None
+_EXIT_HOOK_LOCK = threading.Lock()
+
+
+def flush_all() -> None:
+    """Write every dirty persisted cache of this process."""
+    for cache in list(_PERSISTED):
+        cache.flush()
+
+
+def _register_exit_flush() -> None:
+    """Run flush_all() at exit, once per process.
+
+    multiprocessing children leave through os._exit() and skip atexit,
+    but they do run multiprocessing.util finalizers. A forked child also
+    clears the registry it inherited, hence the per-pid check.
+    """
+    global _EXIT_HOOK_PID
+    with _EXIT_HOOK_LOCK:
+        if _EXIT_HOOK_PID == os.getpid():
+            return
+        _EXIT_HOOK_PID = os.getpid()
+        atexit.register(flush_all)
+        try:
+            from multiprocessing import util
+
+            util.Finalize(None, flush_all, exitpriority=10)
+        except Exception:
+            pass
+
+
+class LRUCache:
+    """Small thread-safe LRU map. `maxsize <= 0` disables the cache."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = int(maxsize)
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        with self._lock:
+            return list(self._data.items())
+
+    def discard_if(self, predicate) -> int:
+        """Drop every entry whose key matches *predicate*; returns the count."""
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def _freeze(value: Any) -> Hashable:
+    """Turn dicts/lists (e.g. filter_dict) into a hashable, order-stable key."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_freeze(v) for v in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Inverse of JSON flattening: lists back to tuples so keys are hashable."""
+    if isinstance(value, list):
+        return tuple(_thaw(v) for v in value)
+    return value
+
+
+class QueryCache:
+    """Query-embedding + ranked-payload cache for one vector store."""
+
+    def __init__(
+        self,
+        max_payloads: int = 256,
+        max_embeddings: int = 1024,
+        persist_path: str | Path | None = None,
+        embedding_cache: LRUCache | None = None,
+        save_delay: float = 30.0,
+    ) -> None:
+        self.payloads = LRUCache(max_payloads)
+        # Query-Embeddings hängen nur vom Modell ab und können von mehreren
+        # Stores eines Prozesses geteilt werden (siehe federated.py).
+        self.embeddings = embedding_cache if embedding_cache is not None else LRUCache(max_embeddings)
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.save_delay = float(save_delay)
+        self._version: Hashable = None
+        self._dirty = False
+        self._timer: threading.Timer | None = None
+        self._save_lock = threading.Lock()
+        if self.persist_path is not None:
+            self.load()
+            _PERSISTED.add(self)
+            _register_exit_flush()
+
+    @property
+    def version(self) -> Hashable:
+        """Index version the cached payloads were last validated against."""
+        return self._version
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def payload_key(version: Hashable, query: str, k: int, **settings: Any) -> Hashable:
+        return (_freeze(version), query, int(k), _freeze(settings))
+
+    def get_embedding(self, model: str, query: str) -> list[float] | None:
+        return self.embeddings.get((model, query))
+
+    def put_embedding(self, model: str, query: str, vector) -> None:
+        self.embeddings.put((model, query), [float(x) for x in vector])
+
+    def get_payload(self, key: Hashable) -> list[dict] | None:
+        payload = self.payloads.get(key)
+        # Callers may mutate the result (e.g. _shrink_vectordb_result).
+        return copy.deepcopy(payload) if payload is not None else None
+
+    def put_payload(self, key: Hashable, payload: list[dict]) -> None:
+        self.payloads.put(key, copy.deepcopy(payload))
+        self._mark_dirty()
+
+    def invalidate(self, version: Hashable = None) -> int:
+        """Drop ranked payloads that were not computed for *version*.
+
+        Embeddings are kept; they only depend on the embedding model.
+        """
+        self._version = _freeze(version)
+        dropped = self.payloads.discard_if(lambda key: key[0] != self._version)
+        if dropped:
+            self._mark_dirty()
+        return dropped
+
+    def ensure_version(self, version: Hashable) -> None:
+        """Cheap per-query check; invalidates only when *version* changed."""
+        if _freeze(version) != self._version:
+            self.invalidate(version)
+
+    # ------------------------------------------------------------------
+    def load(self) -> None:
+        if self.persist_path is None or not self.persist_path.exists():
+            return
+        try:
+            data = json.loads(self.persist_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict) or data.get("schema") != CACHE_SCHEMA:
+            return
+        for key, vector in data.get("embeddings") or []:
+            self.embeddings.put(_thaw(key), vector)
+        for key, payload in data.get("payloads") or []:
+            self.payloads.put(_thaw(key), payload)
+
+    def _mark_dirty(self) -> None:
+        """Schedule a save; the first change arms the timer, later ones ride along."""
+        if self.persist_path is None:
+            return
+        if self.save_delay <= 0:
+            self.save()
+            return
+        with self._save_lock:
+            self._dirty = True
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        """Write the cache now if it changed since the last save."""
+        with self._save_lock:
+            timer, self._timer = self._timer, None
+            dirty, self._dirty = self._dirty, False
+        if timer is not None and timer is not threading.current_thread():
+            timer.cancel()
+        if dirty:
+            self.save()
+
+    def save(self) -> None:
+        if self.persist_path is None:
+            return
+        data = {
+            "schema": CACHE_SCHEMA,
+            "embeddings": [[list(k), v] for k, v in self.embeddings.items()],
+            "payloads": [[k, v] for k, v in self.payloads.items()],
+        }
+        tmp = self.persist_path.with_name(f".{self.persist_path.name}.{os.getpid()}.tmp")
+        try:
+            tmp.write_text(json.dumps(data, ensure_ascii=False, default=str), encoding="utf-8")
+            os.replace(tmp, self.persist_path)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
@@ -23,6 +23,11 @@ USAGE:
     # Build index from documents
     rag.build(root_dir="./documents", chunk_size=1000)
     
+    # Bulk ingest: index/manifest are written once when the block exits
+    with rag.deferred():
+        for text, path in documents:
+            rag.add_document(text, source=path)
+    
     # Query for relevant context
     results = rag.query("How to implement feature X?", k=5)
     
@@ -39,42 +44,49 @@ REFERENCE IMPLEMENTATION FOR:
 
 from __future__ import annotations
 
+import atexit
 import json
 import os
 import sys
 import hashlib
+import importlib.util
+import sqlite3
+import threading
+import time
+import weakref
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, List, Optional, Tuple
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import logging
 
 # ────────────────────── Optional Imports ──────────────────────
-# Try multiple embedding backends: OpenAI, sentence-transformers, HuggingFace
+# Try multiple embedding backends: OpenAI, sentence-transformers, HuggingFace,
+# ONNX. The local model libraries pull in torch, so they are only looked up
+# here and imported when that backend is actually selected.
 
 _HAS_OPENAI_EMBEDDINGS = False
-_HAS_SENTENCE_TRANSFORMERS = False
-_HAS_HUGGINGFACE_EMBEDDINGS = False
+_HAS_SENTENCE_TRANSFORMERS = importlib.util.find_spec("sentence_transformers") is not None
+_HAS_HUGGINGFACE_EMBEDDINGS = (
+    not _HAS_SENTENCE_TRANSFORMERS and importlib.util.find_spec("langchain_huggingface") is not None
+)
+_HAS_ONNX_EMBEDDINGS = all(importlib.util.find_spec(m) for m in ("onnxruntime", "tokenizers", "numpy"))
 
 try:
-    from openai import OpenAI
-    _HAS_OPENAI_EMBEDDINGS = True
+    import numpy as np
 except ImportError:
-    pass
+    np = None
 
 try:
-    from sentence_transformers import SentenceTransformer
-    _HAS_SENTENCE_TRANSFORMERS = True
+    from openai import OpenAI
+    _HAS_OPENAI_EMBEDDINGS = True
 except ImportError:
     pass
 
-if not _HAS_SENTENCE_TRANSFORMERS:
-    try:
-        from langchain_huggingface import HuggingFaceEmbeddings
-        _HAS_HUGGINGFACE_EMBEDDINGS = True
-    except ImportError:
-        pass
-
 # FAISS is always required for vector store
 try:
     from langchain_community.vectorstores import FAISS
@@ -84,6 +96,21 @@ except ImportError:
     FAISS = None
     Document = None
 
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:
+    _EmbeddingsBase = object
+
+try:
+    from .docstore_db import attach_docstore, load_faiss_store, save_faiss_store
+except ImportError:
+    from docstore_db import attach_docstore, load_faiss_store, save_faiss_store
+
+try:
+    from . import onnx_embed
+except ImportError:
+    import onnx_embed
+
 # ────────────────────── Constants ──────────────────────
 
 DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
@@ -92,6 +119,16 @@ DEFAULT_CHUNK_OVERLAP = 150
 DEFAULT_TOP_K = 5
 MAX_CHUNK_SIZE = 4000
 MIN_CHUNK_SIZE = 100
+DEFAULT_AUTOFLUSH_DOCUMENTS = 200
+DEFAULT_AUTOFLUSH_SECONDS = 30.0
+DEFAULT_MAX_BATCH_TOKENS = 8192   # per embedding request/forward pass
+DEFAULT_MAX_BATCH_ITEMS = 256
+DEFAULT_EMBED_CONCURRENCY = 4     # parallel requests for remote backends
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite"
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_PROBE_TTL_SECONDS = 6 * 3600.0
+DUMMY_EMBEDDING_DIM = 384  # Default for paraphrase-MiniLM
+CHARS_PER_TOKEN = 4               # token approximation when no tokenizer is set
 
 # ────────────────────── Logging ──────────────────────
 
@@ -108,12 +145,20 @@ logger = logging.getLogger(__name__)
 class EmbeddingConfig:
     """Configuration for embedding generation."""
     model_name: str = DEFAULT_MODEL
-    backend: str = "auto"  # "auto", "openai", "sentence-transformers", "huggingface"
+    backend: str = "auto"  # "auto", "openai", "sentence-transformers", "huggingface", "onnx"
     device: str = "cpu"  # "cpu" or "cuda"
     normalize_embeddings: bool = True
     batch_size: int = 32
     show_progress_bar: bool = False
     openai_api_key: str | None = None  # Optional: read from env if None
+    max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS
+    max_batch_items: int = DEFAULT_MAX_BATCH_ITEMS
+    max_concurrency: int = DEFAULT_EMBED_CONCURRENCY
+    cache_path: str | None = None  # SQLite content-hash -> vector cache; None disables
+    probe_cache_path: str | None = None  # JSON file for backend probe results; None = per process
+    probe_ttl_seconds: float = DEFAULT_PROBE_TTL_SECONDS
+    onnx_model_dir: str | None = None  # exported model (see onnx_embed.py); env AI_IDE_ONNX_MODEL_DIR
+    onnx_quantized: bool = True
     
     def to_dict(self) -> dict:
         return asdict(self)
@@ -125,11 +170,31 @@ class ChunkingConfig:
     chunk_size: int = DEFAULT_CHUNK_SIZE
     chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
     separator: str = "\n\n"
+    max_tokens: int | None = None  # token budget per chunk (on top of chunk_size chars)
+    tokenizer: str | None = None  # HF fast tokenizer for max_tokens; None => ~4 chars/token
     
     def to_dict(self) -> dict:
         return asdict(self)
 
 
+@dataclass
+class PersistenceConfig:
+    """Configuration for index/manifest persistence.
+
+    With ``write_behind`` the index and manifest are only written by
+    ``flush()`` or once one of the autoflush thresholds is crossed. The
+    time threshold is enforced by a timer, so pending documents are written
+    even if no further ``add_documents`` follows. Anything still pending at
+    interpreter exit is flushed as well.
+    """
+    write_behind: bool = False
+    autoflush_documents: int = DEFAULT_AUTOFLUSH_DOCUMENTS  # 0 disables
+    autoflush_seconds: float = DEFAULT_AUTOFLUSH_SECONDS  # 0 disables
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
 @dataclass
 class RetrievalResult:
     """Single retrieval result with metadata."""
@@ -143,10 +208,161 @@ class RetrievalResult:
         return asdict(self)
 
 
+# ────────────────────── Embedding Cache ──────────────────────
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def _estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars/token) used for batch budgeting."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _token_batches(texts: List[str], max_tokens: int, max_items: int) -> List[List[int]]:
+    """Group indices of *texts* into length-sorted, token-budgeted batches.
+
+    Sorting by length keeps similar lengths together, so local models pad
+    less and remote requests stay under the per-request limit.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches: List[List[int]] = []
+    current: List[int] = []
+    budget = 0
+    for i in order:
+        cost = _estimate_tokens(texts[i])
+        if current and (budget + cost > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, budget = [], 0
+        current.append(i)
+        budget += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _vector_bytes(vec: Any) -> bytes:
+    """float32 bytes of a list or array row."""
+    if np is not None:
+        return np.asarray(vec, dtype=np.float32).tobytes()
+    return array("f", vec).tobytes()
+
+
+class EmbeddingCache:
+    """Persistent content-hash -> vector cache (SQLite, keyed by model).
+
+    Vectors are stored as float32 blobs. Re-indexing unchanged text is a
+    primary-key lookup instead of a model call.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors ("
+                " model TEXT NOT NULL, hash TEXT NOT NULL, vec BLOB NOT NULL,"
+                " PRIMARY KEY (model, hash))"
+            )
+
+    def get_many(self, model: str, hashes: List[str], as_array: bool = False) -> dict[str, Any]:
+        """Cached vectors by hash: lists, or float32 arrays if *as_array*."""
+        as_array = as_array and np is not None
+        found: dict[str, Any] = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit.
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vec FROM vectors WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    (model, *part),
+                ).fetchall()
+                for h, blob in rows:
+                    if as_array:
+                        found[h] = np.frombuffer(blob, dtype=np.float32)
+                        continue
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[h] = vec.tolist()
+        return found
+
+    def put_many(self, model: str, items: dict[str, Any]) -> None:
+        if not items:
+            return
+        rows = [(model, h, _vector_bytes(vec)) for h, vec in items.items()]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO vectors(model, hash, vec) VALUES (?, ?, ?)", rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ────────────────────── Backend Probe Cache ──────────────────────
+# Outcome of the first real remote call per (backend, credential). Kept per
+# process and optionally on disk, so engines created later skip a backend
+# that is known to fail instead of paying a network round trip at startup.
+
+_PROBE_LOCK = threading.Lock()
+_PROBE_RESULTS: dict[str, dict] = {}
+
+
+def _probe_key(backend: str, secret: str) -> str:
+    # Never persist the credential itself, only a short fingerprint.
+    return f"{backend}:{hashlib.sha256(secret.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _probe_lookup(key: str, ttl: float, path: str | None) -> bool | None:
+    """Cached probe result (True/False) or None if unknown/expired."""
+    now = time.time()
+    with _PROBE_LOCK:
+        entry = _PROBE_RESULTS.get(key)
+        if entry is None and path:
+            try:
+                entry = json.loads(Path(path).read_text(encoding="utf-8")).get(key)
+            except (OSError, ValueError, AttributeError):
+                entry = None
+            if entry:
+                _PROBE_RESULTS[key] = entry
+    if not entry or ttl <= 0 or now - float(entry.get("ts", 0)) > ttl:
+        return None
+    return bool(entry.get("ok"))
+
+
+def _probe_record(key: str, ok: bool, path: str | None, error: str = "") -> None:
+    entry = {"ok": ok, "ts": time.time(), "error": error[:200]}
+    with _PROBE_LOCK:
+        _PROBE_RESULTS[key] = entry
+        if not path:
+            return
+        try:
+            probe_file = Path(path)
+            try:
+                data = json.loads(probe_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            data[key] = entry
+            probe_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = probe_file.with_name(f"{probe_file.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, probe_file)
+        except OSError as e:
+            logger.debug(f"Could not persist backend probe: {e}")
+
+
 # ────────────────────── Embedding Engine ──────────────────────
 
-class EmbeddingEngine:
-    """Handles text embedding with automatic fallback."""
+class EmbeddingEngine(_EmbeddingsBase):
+    """Handles text embedding with automatic fallback.
+
+    Construction is instant: the backend is selected on the first embed
+    call. The first real OpenAI request doubles as the capability probe. A
+    failure is cached (see ``probe_ttl_seconds``), and the engine then falls
+    back to the local backends.
+    """
     
     def __init__(self, config: EmbeddingConfig | None = None):
         self.config = config or EmbeddingConfig()
@@ -154,32 +370,74 @@ class EmbeddingEngine:
         self.embeddings_obj = None
         self.openai_client = None
         self.backend_type = None
-        self._init_embeddings()
+        self.cache = EmbeddingCache(self.config.cache_path) if self.config.cache_path else None
+        self._backend_lock = threading.RLock()
+        self._backend_ready = False
+        self._openai_probe_key: str | None = None
+        self._openai_verified = False
+
+    def _ensure_backend(self) -> None:
+        """Select the backend once, on first use."""
+        if self._backend_ready:
+            return
+        with self._backend_lock:
+            if not self._backend_ready:
+                self._init_embeddings()
+                self._backend_ready = True
     
     def _init_embeddings(self) -> None:
         """Initialize embeddings using best available method."""
         backend = self.config.backend.lower()
         
-        # Try OpenAI first if explicitly requested or auto with API key
+        # Try OpenAI first if explicitly requested or auto with API key.
+        # No request is made here; the first embed call settles it.
         if (backend in {"auto", "openai"}) and _HAS_OPENAI_EMBEDDINGS:
             try:
                 api_key = self.config.openai_api_key or os.environ.get("OPENAI_API_KEY")
                 if api_key:
-                    self.openai_client = OpenAI(api_key=api_key)
-                    # Test with a quick embedding
-                    test = self.openai_client.embeddings.create(
-                        input="test",
-                        model="text-embedding-3-small"
-                    )
-                    self.backend_type = "openai"
-                    logger.info(f"Using OpenAI embeddings: text-embedding-3-small")
-                    return
+                    key = _probe_key("openai", api_key)
+                    probe = _probe_lookup(key, self.config.probe_ttl_seconds, self.config.probe_cache_path)
+                    if probe is False:
+                        logger.info("Skipping OpenAI embeddings (cached probe failure)")
+                    else:
+                        self.openai_client = OpenAI(api_key=api_key)
+                        self._openai_probe_key = key
+                        self._openai_verified = probe is True
+                        self.backend_type = "openai"
+                        logger.info(f"Using OpenAI embeddings: {OPENAI_EMBEDDING_MODEL}")
+                        return
             except Exception as e:
                 logger.warning(f"OpenAI embeddings failed: {e}")
+
+        self._init_local_embeddings()
+
+    def _init_local_embeddings(self) -> None:
+        """Select a local backend (ONNX, HuggingFace, sentence-transformers, dummy)."""
+        backend = self.config.backend.lower()
+
+        # ONNX Runtime int8 (CPU, no torch) – only when explicitly requested,
+        # since its vectors differ slightly from the torch model's.
+        if backend == "onnx" and _HAS_ONNX_EMBEDDINGS:
+            model_dir = self.config.onnx_model_dir or os.environ.get("AI_IDE_ONNX_MODEL_DIR")
+            try:
+                if not model_dir:
+                    raise FileNotFoundError("no onnx_model_dir / AI_IDE_ONNX_MODEL_DIR configured")
+                self.model = onnx_embed.OnnxEmbeddings(
+                    model_dir,
+                    quantized=self.config.onnx_quantized,
+                    batch_size=self.config.batch_size,
+                )
+                self.backend_type = "onnx-int8" if self.config.onnx_quantized else "onnx"
+                logger.info(f"Using ONNX embeddings: {model_dir}")
+                return
+            except Exception as e:
+                logger.warning(f"ONNX embeddings failed: {e}")
         
         # Try HuggingFace embeddings (most stable for local)
         if (backend in {"auto", "huggingface"}) and _HAS_HUGGINGFACE_EMBEDDINGS:
             try:
+                from langchain_huggingface import HuggingFaceEmbeddings
+
                 self.embeddings_obj = HuggingFaceEmbeddings(
                     model_name=self.config.model_name
                 )
@@ -192,6 +450,8 @@ class EmbeddingEngine:
         # Try sentence-transformers (if available)
         if (backend in {"auto", "sentence-transformers"}) and _HAS_SENTENCE_TRANSFORMERS:
             try:
+                from sentence_transformers import SentenceTransformer
+
                 self.model = SentenceTransformer(
                     self.config.model_name,
                     device=self.config.device
@@ -208,31 +468,144 @@ class EmbeddingEngine:
         self.embeddings_obj = None
         self.backend_type = "dummy"
     
+    def _openai_result(self, error: Exception | None = None) -> None:
+        """Record the outcome of a real OpenAI call (the lazy probe).
+
+        A failure before the backend was ever verified disables OpenAI for
+        this engine and for later engines (within the TTL).
+        """
+        if error is None:
+            if not self._openai_verified and self._openai_probe_key:
+                _probe_record(self._openai_probe_key, True, self.config.probe_cache_path)
+            self._openai_verified = True
+            return
+        if self._openai_verified:
+            return
+        with self._backend_lock:
+            if self.openai_client is None:
+                return
+            if self._openai_probe_key:
+                _probe_record(self._openai_probe_key, False, self.config.probe_cache_path, str(error))
+            self.openai_client = None
+            self._init_local_embeddings()
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the vector space (backend + model) in the embedding cache."""
+        if self.backend_type == "openai":
+            return f"openai:{OPENAI_EMBEDDING_MODEL}"
+        return f"{self.backend_type}:{self.config.model_name}:norm={int(self.config.normalize_embeddings)}"
+
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts."""
+        """Generate embeddings for multiple texts.
+
+        Identical texts are embedded once, cached vectors are reused, and the
+        rest is sent in length-sorted, token-budgeted batches (concurrently
+        for remote backends).
+        """
         if not texts:
             return []
-        
+        hashes, vectors = self._embed_unique(texts, as_array=False)
+        rows = {h: (v.tolist() if hasattr(v, "tolist") else list(v)) for h, v in vectors.items()}
+        return [rows[h] for h in hashes]
+
+    def embed_texts_array(self, texts: List[str], normalize: bool = False):
+        """Like `embed_texts`, but as one contiguous ``(n, dim)`` float32 array.
+
+        Local backends hand their numpy output through and cached vectors are
+        read straight from their blobs, so no per-float Python objects are
+        created. *normalize* L2-normalises the rows in place.
+        """
+        if np is None:
+            raise ImportError("embed_texts_array requires numpy")
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        hashes, vectors = self._embed_unique(texts, as_array=True)
+        dim = len(vectors[hashes[0]])
+        out = np.empty((len(hashes), dim), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            out[i] = vectors[h]
+        if normalize:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+    def _embed_unique(self, texts: List[str], as_array: bool) -> Tuple[List[str], dict[str, Any]]:
+        """Hashes of *texts* and one vector (list or array row) per unique hash."""
+        self._ensure_backend()
+
+        hashes = [_text_hash(t) for t in texts]
+        unique: dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            unique.setdefault(h, t)
+
+        vectors: dict[str, Any] = {}
+        if self.cache is not None:
+            vectors.update(self.cache.get_many(self.cache_key, list(unique), as_array=as_array))
+        missing = [h for h in unique if h not in vectors]
+
+        if missing:
+            missing_texts = [unique[h] for h in missing]
+            batches = _token_batches(
+                missing_texts,
+                max(1, self.config.max_batch_tokens),
+                max(1, self.config.max_batch_items),
+            )
+            jobs = [[missing_texts[i] for i in batch] for batch in batches]
+            results = []
+            if self.openai_client is not None and not self._openai_verified:
+                # Settle the backend with one batch before fanning out.
+                results.append(self._embed_batch(jobs[0]))
+            rest = jobs[len(results):]
+            if self.openai_client is not None and len(rest) > 1 and self.config.max_concurrency > 1:
+                with ThreadPoolExecutor(max_workers=min(self.config.max_concurrency, len(rest))) as pool:
+                    results.extend(pool.map(self._embed_batch, rest))
+            else:
+                results.extend(self._embed_batch(job) for job in rest)
+
+            fresh: dict[str, Any] = {}
+            for batch, (batch_vectors, cacheable) in zip(batches, results):
+                for i, vec in zip(batch, batch_vectors):
+                    vectors[missing[i]] = vec
+                    if cacheable:
+                        fresh[missing[i]] = vec
+            if self.cache is not None:
+                self.cache.put_many(self.cache_key, fresh)
+            logger.debug(
+                f"Embedded {len(missing)} texts in {len(batches)} batches "
+                f"({len(unique) - len(missing)} cached, {len(texts) - len(unique)} duplicates)"
+            )
+
+        return hashes, vectors
+
+    def _embed_batch(self, texts: List[str]) -> Tuple[Any, bool]:
+        """Embed one batch with backend fallback; returns (vectors, cacheable).
+
+        *vectors* is a sequence of rows: lists for remote backends, a float32
+        array for sentence-transformers and the dummy fallback.
+        """
         if self.openai_client is not None:
             # OpenAI embeddings (preferred for production)
             try:
                 response = self.openai_client.embeddings.create(
                     input=texts,
-                    model="text-embedding-3-small"  # Fast and cost-effective
+                    model=OPENAI_EMBEDDING_MODEL  # Fast and cost-effective
                 )
-                return [item.embedding for item in response.data]
+                self._openai_result()
+                return [item.embedding for item in response.data], True
             except Exception as e:
                 logger.error(f"OpenAI embeddings failed: {e}")
+                self._openai_result(e)
         
         if self.embeddings_obj is not None:
             # HuggingFace embeddings (local)
             try:
-                return self.embeddings_obj.embed_documents(texts)
+                return self.embeddings_obj.embed_documents(texts), self.openai_client is None
             except Exception as e:
                 logger.error(f"HuggingFaceEmbeddings failed: {e}")
         
         if self.model is not None:
-            # sentence-transformers (local)
+            # sentence-transformers (local); the batch is already length-sorted
             try:
                 embeddings = self.model.encode(
                     texts,
@@ -240,26 +613,30 @@ class EmbeddingEngine:
                     show_progress_bar=self.config.show_progress_bar,
                     normalize_embeddings=self.config.normalize_embeddings
                 )
-                return embeddings.tolist()
+                return embeddings, self.openai_client is None
             except Exception as e:
                 logger.error(f"sentence-transformers encoding failed: {e}")
         
-        # Dummy fallback (all zeros)
+        # Dummy fallback (all zeros) – never cached
         logger.warning(f"Using dummy embeddings for {len(texts)} texts")
-        embedding_dim = 384  # Default for paraphrase-MiniLM
-        return [[0.0] * embedding_dim for _ in texts]
+        if np is not None:
+            return np.zeros((len(texts), DUMMY_EMBEDDING_DIM), dtype=np.float32), False
+        return [[0.0] * DUMMY_EMBEDDING_DIM for _ in texts], False
     
     def embed_query(self, query: str) -> List[float]:
         """Generate embedding for a single query."""
+        self._ensure_backend()
         if self.openai_client is not None:
             try:
                 response = self.openai_client.embeddings.create(
                     input=query,
-                    model="text-embedding-3-small"
+                    model=OPENAI_EMBEDDING_MODEL
                 )
+                self._openai_result()
                 return response.data[0].embedding
             except Exception as e:
                 logger.error(f"OpenAI query embedding failed: {e}")
+                self._openai_result(e)
         
         if self.embeddings_obj is not None:
             try:
@@ -275,7 +652,7 @@ class EmbeddingEngine:
                 logger.error(f"Query encoding failed: {e}")
         
         # Dummy fallback
-        return [0.0] * 384
+        return [0.0] * DUMMY_EMBEDDING_DIM
     
     # FAISS compatibility methods
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
@@ -290,66 +667,112 @@ class EmbeddingEngine:
 # ────────────────────── Document Chunker ──────────────────────
 
 class DocumentChunker:
-    """Splits documents into overlapping chunks."""
+    """Splits documents into overlapping chunks.
+
+    Works on offsets into the original string. Each window ends at the
+    last separator (then line break, sentence end, space) inside the size
+    budget, and the next window starts `chunk_overlap` characters earlier.
+    Every character is scanned a bounded number of times, so long documents
+    chunk in linear time. The budget is `chunk_size` characters and,
+    optionally, `max_tokens` tokens (counted with `tokenizer`, or estimated).
+    """
+
+    _FALLBACK_BREAKS = ("\n", ". ", " ")
     
     def __init__(self, config: ChunkingConfig | None = None):
         self.config = config or ChunkingConfig()
-    
-    def chunk(self, text: str, source: str = "", title: str = "") -> List[dict]:
-        """Split text into chunks with metadata."""
+        self._tokenizer: Any = None
+        self._tokenizer_failed = False
+
+    def _token_starts(self, text: str) -> List[int] | None:
+        """Start offsets of all tokens (one tokenizer pass), or None."""
+        name = self.config.tokenizer
+        if not (self.config.max_tokens and name) or self._tokenizer_failed:
+            return None
+        if self._tokenizer is None:
+            try:
+                from tokenizers import Tokenizer
+
+                self._tokenizer = Tokenizer.from_pretrained(name)
+                self._tokenizer.no_truncation()
+            except Exception as e:
+                logger.warning(f"Tokenizer '{name}' unavailable, estimating tokens: {e}")
+                self._tokenizer_failed = True
+                return None
+        return [start for start, _ in self._tokenizer.encode(text, add_special_tokens=False).offsets]
+
+    def _break_at(self, text: str, start: int, hard_end: int) -> int:
+        """Best split position in the second half of text[start:hard_end]."""
+        floor = start + (hard_end - start) // 2
+        for mark in (self.config.separator, *self._FALLBACK_BREAKS):
+            if mark:
+                i = text.rfind(mark, floor, hard_end)
+                if i != -1:
+                    return i + len(mark)
+        return hard_end
+
+    def iter_chunks(self, text: str, source: str = "", title: str = "") -> Iterator[dict]:
+        """Yield chunks of *text* with metadata (``start``/``end`` are offsets)."""
         if not text:
-            return []
+            return
         
         # Validate config
         chunk_size = max(MIN_CHUNK_SIZE, min(self.config.chunk_size, MAX_CHUNK_SIZE))
+        max_tokens = self.config.max_tokens
+        token_starts = self._token_starts(text) if max_tokens else None
+        if max_tokens and token_starts is None:
+            chunk_size = max(1, min(chunk_size, max_tokens * CHARS_PER_TOKEN))
         overlap = min(self.config.chunk_overlap, chunk_size // 2)
-        
-        chunks = []
-        sep = self.config.separator
-        
-        # Split by separator first
-        paragraphs = text.split(sep)
-        
-        current_chunk = ""
+        timestamp = datetime.now().isoformat()
+        n = len(text)
         chunk_index = 0
+        pos = 0
+
+        while pos < n:
+            hard_end = min(n, pos + chunk_size)
+            if token_starts is not None:
+                t = bisect_left(token_starts, pos) + max_tokens
+                if t < len(token_starts):
+                    hard_end = min(hard_end, token_starts[t])
+            hard_end = max(hard_end, pos + 1)
+            end = n if hard_end >= n else self._break_at(text, pos, hard_end)
+
+            # Trim whitespace via offsets, then slice once
+            start, stop = pos, end
+            while start < stop and text[start].isspace():
+                start += 1
+            while stop > start and text[stop - 1].isspace():
+                stop -= 1
+            if stop > start:
+                yield {
+                    "content": text[start:stop],
+                    "source": source,
+                    "title": title,
+                    "chunk_index": chunk_index,
+                    "size": stop - start,
+                    "start": start,
+                    "end": stop,
+                    "timestamp": timestamp,
+                }
+                chunk_index += 1
+            if end >= n:
+                break
+
+            # Next window starts `overlap` chars back, on a word boundary
+            nxt = end
+            window_overlap = min(overlap, (end - pos) // 2)
+            if window_overlap > 0:
+                nxt = end - window_overlap
+                space = text.find(" ", nxt, end)
+                if space != -1:
+                    nxt = space + 1
+            pos = nxt if nxt > pos else end
         
-        for para in paragraphs:
-            if len(current_chunk) + len(para) + len(sep) <= chunk_size:
-                current_chunk += para + sep
-            else:
-                # Save current chunk if not empty
-                if current_chunk.strip():
-                    chunks.append({
-                        "content": current_chunk.strip(),
-                        "source": source,
-                        "title": title,
-                        "chunk_index": chunk_index,
-                        "size": len(current_chunk),
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-                    chunk_index += 1
-                
-                # Start new chunk with overlap
-                if overlap > 0:
-                    # Try to maintain overlap from previous chunk
-                    split_point = max(0, len(current_chunk) - overlap)
-                    current_chunk = current_chunk[split_point:] + para + sep
-                else:
-                    current_chunk = para + sep
-        
-        # Add last chunk
-        if current_chunk.strip():
-            chunks.append({
-                "content": current_chunk.strip(),
-                "source": source,
-                "title": title,
-                "chunk_index": chunk_index,
-                "size": len(current_chunk),
-                "timestamp": datetime.now().isoformat()
-            })
-        
-        logger.debug(f"Chunked '{source}': {len(chunks)} chunks")
-        return chunks
+        logger.debug(f"Chunked '{source}': {chunk_index} chunks")
+
+    def chunk(self, text: str, source: str = "", title: str = "") -> List[dict]:
+        """Split text into chunks with metadata."""
+        return list(self.iter_chunks(text, source, title))
 
 
 # ────────────────────── Vector Store Manager ──────────────────────
@@ -361,19 +784,30 @@ class VectorStoreManager:
         self,
         store_path: str,
         embedding_engine: EmbeddingEngine | None = None,
-        chunking_config: ChunkingConfig | None = None
+        chunking_config: ChunkingConfig | None = None,
+        persistence_config: PersistenceConfig | None = None
     ):
         self.store_path = Path(store_path).expanduser().resolve()
         self.store_path.mkdir(parents=True, exist_ok=True)
         
         self.embedding_engine = embedding_engine or EmbeddingEngine()
         self.chunking_config = chunking_config or ChunkingConfig()
+        self.persistence_config = persistence_config or PersistenceConfig()
         
         self.chunker = DocumentChunker(self.chunking_config)
         self.faiss_store = None
         self.manifest = self._load_manifest()
         
+        # Write-behind bookkeeping
+        self._pending_documents = 0
+        self._last_flush = time.monotonic()
+        self._deferred_depth = 0
+        self._flush_timer: threading.Timer | None = None
+        # Serialises store/manifest updates with the autoflush timer thread
+        self._write_lock = threading.RLock()
+        
         self._load_store()
+        _WRITE_BEHIND_MANAGERS.add(self)
     
     def _manifest_path(self) -> Path:
         return self.store_path / "manifest.json"
@@ -397,11 +831,13 @@ class VectorStoreManager:
         }
     
     def _save_manifest(self) -> None:
-        """Persist manifest to disk."""
+        """Persist manifest to disk (atomic rename)."""
         try:
             manifest_file = self._manifest_path()
-            with open(manifest_file, "w", encoding="utf-8") as f:
+            tmp = manifest_file.with_name(manifest_file.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
                 json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, manifest_file)
         except Exception as e:
             logger.error(f"Could not save manifest: {e}")
     
@@ -417,12 +853,11 @@ class VectorStoreManager:
             return
         
         try:
-            # Load with LangChain's FAISS wrapper
+            # index.faiss + docstore.sqlite (legacy index.pkl is migrated once)
             dummy_embeddings = self.embedding_engine
-            self.faiss_store = FAISS.load_local(
-                str(self.store_path),
-                embeddings=dummy_embeddings.embeddings_obj or dummy_embeddings,
-                allow_dangerous_deserialization=True
+            self.faiss_store = load_faiss_store(
+                self.store_path,
+                dummy_embeddings,
             )
             logger.info(f"Loaded FAISS store from {self.store_path}")
         except Exception as e:
@@ -438,84 +873,188 @@ class VectorStoreManager:
         """Add document to index."""
         if not content:
             return 0
-        
-        # Create chunks
-        chunks = self.chunker.chunk(content, source, title)
-        if not chunks:
-            return 0
-        
-        # Generate embeddings
-        chunk_texts = [chunk["content"] for chunk in chunks]
-        try:
-            embeddings_list = self.embedding_engine.embed_texts(chunk_texts)
-        except Exception as e:
-            logger.error(f"Embedding failed for {source}: {e}")
+        return self.add_documents([(content, source, title)])
+
+    def add_documents(self, documents: Iterable[tuple[str, str, str] | dict]) -> int:
+        """Add several documents with one embedding pass and one index write.
+
+        Items are ``(content, source, title)`` tuples or dicts with the same
+        keys. The chunk vectors are computed once and handed to FAISS
+        directly, so nothing is embedded twice.
+        """
+        chunk_texts: List[str] = []
+        metadatas: List[dict] = []
+        added_sources: List[Tuple[str, str, int]] = []
+
+        for item in documents:
+            if isinstance(item, dict):
+                content = item.get("content", "")
+                source = item.get("source", "")
+                title = item.get("title", "")
+            else:
+                content, source, *rest = item
+                title = rest[0] if rest else ""
+            if not content:
+                continue
+
+            # Create chunks (streamed, no intermediate list per document)
+            chunk_count = 0
+            for chunk in self.chunker.iter_chunks(content, source, title):
+                chunk_texts.append(chunk["content"])
+                metadatas.append({
+                    "source": source,
+                    "title": title,
+                    "chunk_index": chunk["chunk_index"],
+                    "size": chunk["size"]
+                })
+                chunk_count += 1
+            if chunk_count:
+                added_sources.append((source, title, chunk_count))
+
+        if not chunk_texts:
             return 0
-        
-        # Create documents
+
+        # Generate embeddings (single pass for the whole batch); FAISS takes
+        # the float32 rows as-is, so no nested lists are built in between.
         try:
-            if Document:
-                documents = [
-                    Document(
-                        page_content=chunk["content"],
-                        metadata={
-                            "source": source,
-                            "title": title,
-                            "chunk_index": chunk["chunk_index"],
-                            "size": chunk["size"]
-                        }
-                    )
-                    for chunk in chunks
-                ]
+            if np is not None:
+                vectors = self.embedding_engine.embed_texts_array(chunk_texts)
+            else:
+                vectors = self.embedding_engine.embed_texts(chunk_texts)
         except Exception as e:
-            logger.error(f"Could not create documents: {e}")
+            logger.error(f"Embedding failed for {len(added_sources)} documents: {e}")
             return 0
-        
-        # Add to FAISS
-        if FAISS and self.faiss_store is None:
+
+        with self._write_lock:
+            if not self._add_embeddings(chunk_texts, vectors, metadatas):
+                return 0
+
+            # Update manifest
+            for source, title, chunk_count in added_sources:
+                source_hash = hashlib.sha256(source.encode()).hexdigest()[:16]
+                self.manifest["documents"][source_hash] = {
+                    "source": source,
+                    "title": title,
+                    "chunk_count": chunk_count,
+                    "added": datetime.now().isoformat()
+                }
+                if source not in self.manifest["indexed_sources"]:
+                    self.manifest["indexed_sources"].append(source)
+            self.manifest["chunk_count"] = self.manifest.get("chunk_count", 0) + len(chunk_texts)
+
+            self._mark_dirty(len(added_sources))
+
+        logger.info(f"Added {len(chunk_texts)} chunks from {len(added_sources)} documents")
+        return len(chunk_texts)
+
+    def _add_embeddings(
+        self,
+        texts: List[str],
+        vectors: Any,
+        metadatas: List[dict]
+    ) -> bool:
+        """Insert precomputed vectors into the FAISS store (creates it if needed)."""
+        if FAISS is None:
+            return True
+
+        text_embeddings = list(zip(texts, vectors))
+        if self.faiss_store is None:
             try:
-                self.faiss_store = FAISS.from_documents(
-                    documents,
-                    self.embedding_engine.embeddings_obj or self.embedding_engine
+                self.faiss_store = FAISS.from_embeddings(
+                    text_embeddings,
+                    self.embedding_engine,
+                    metadatas=metadatas
                 )
+                attach_docstore(self.faiss_store, self.store_path)
             except Exception as e:
                 logger.error(f"Could not create FAISS store: {e}")
-                return 0
-        elif FAISS and self.faiss_store:
+                return False
+        else:
             try:
-                self.faiss_store.add_documents(documents)
+                self.faiss_store.add_embeddings(text_embeddings, metadatas=metadatas)
             except Exception as e:
-                logger.error(f"Could not add documents to FAISS: {e}")
-                return 0
-        
-        # Update manifest
-        source_hash = hashlib.sha256(source.encode()).hexdigest()[:16]
-        self.manifest["documents"][source_hash] = {
-            "source": source,
-            "title": title,
-            "chunk_count": len(chunks),
-            "added": datetime.now().isoformat()
-        }
-        self.manifest["chunk_count"] = self.manifest.get("chunk_count", 0) + len(chunks)
-        if source not in self.manifest["indexed_sources"]:
-            self.manifest["indexed_sources"].append(source)
-        
-        self._save_manifest()
-        self._save_store()
-        
-        logger.info(f"Added {len(chunks)} chunks from {source}")
-        return len(chunks)
+                logger.error(f"Could not add embeddings to FAISS: {e}")
+                return False
+        return True
     
     def _save_store(self) -> None:
-        """Persist FAISS index to disk."""
+        """Persist FAISS index to disk.
+
+        Documents live in docstore.sqlite and were inserted as they were
+        added; saving only aligns positions and atomically replaces
+        index.faiss, so readers never see a half-written index.
+        """
         if self.faiss_store is None or FAISS is None:
             return
         
         try:
-            self.faiss_store.save_local(str(self.store_path))
+            save_faiss_store(self.faiss_store, self.store_path)
             logger.debug(f"Saved FAISS store to {self.store_path}")
         except Exception as e:
             logger.error(f"Could not save FAISS store: {e}")
+
+    # ────────────── Write-behind persistence ──────────────
+
+    @property
+    def dirty(self) -> bool:
+        """True if there are ingested documents not yet written to disk."""
+        return self._pending_documents > 0
+
+    def _mark_dirty(self, documents: int) -> None:
+        """Record pending changes and flush when a threshold is crossed."""
+        self._pending_documents += documents
+        cfg = self.persistence_config
+        if not cfg.write_behind and self._deferred_depth == 0:
+            self.flush()
+            return
+        if cfg.autoflush_documents > 0 and self._pending_documents >= cfg.autoflush_documents:
+            self.flush()
+        elif cfg.autoflush_seconds > 0 and time.monotonic() - self._last_flush >= cfg.autoflush_seconds:
+            self.flush()
+        elif cfg.autoflush_seconds > 0 and self._flush_timer is None:
+            # Deadline also without another add_documents() call
+            delay = max(0.0, cfg.autoflush_seconds - (time.monotonic() - self._last_flush))
+            self._flush_timer = threading.Timer(delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Write manifest and index to disk if there are pending changes."""
+        with self._write_lock:
+            timer, self._flush_timer = self._flush_timer, None
+            if timer is not None and timer is not threading.current_thread():
+                timer.cancel()
+            if not self.dirty:
+                return
+            self._save_store()
+            self._save_manifest()
+            logger.debug(f"Flushed {self._pending_documents} documents to {self.store_path}")
+            self._pending_documents = 0
+            self._last_flush = time.monotonic()
+
+    @contextmanager
+    def deferred(self):
+        """Batch all writes inside the block into (at most) one flush at the end.
+
+        Autoflush thresholds still apply, so very large ingests are persisted
+        in steps rather than only at the very end.
+        """
+        self._deferred_depth += 1
+        try:
+            yield self
+        finally:
+            self._deferred_depth -= 1
+            if self._deferred_depth == 0:
+                self.flush()
+
+    def __enter__(self) -> "VectorStoreManager":
+        self._deferred_depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._deferred_depth -= 1
+        if self._deferred_depth == 0:
+            self.flush()
     
     def query(self, query_text: str, k: int = DEFAULT_TOP_K) -> List[RetrievalResult]:
         """Search vector store for relevant documents."""
@@ -545,6 +1084,19 @@ class VectorStoreManager:
             return []
 
 
+# Managers with possibly pending write-behind data, flushed at exit.
+_WRITE_BEHIND_MANAGERS: "weakref.WeakSet[VectorStoreManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_write_behind() -> None:
+    for manager in list(_WRITE_BEHIND_MANAGERS):
+        try:
+            manager.flush()
+        except Exception as e:
+            logger.error(f"Flush at exit failed for {manager.store_path}: {e}")
+
+
 # ────────────────────── RAG System (Main API) ──────────────────────
 
 class RAGSystem:
@@ -554,22 +1106,38 @@ class RAGSystem:
         self,
         store_path: str = "AppData/VSM_1_Data",
         embedding_config: EmbeddingConfig | None = None,
-        chunking_config: ChunkingConfig | None = None
+        chunking_config: ChunkingConfig | None = None,
+        persistence_config: PersistenceConfig | None = None
     ):
         self.store_path = store_path
-        self.embedding_config = embedding_config or EmbeddingConfig()
+        self.embedding_config = embedding_config or EmbeddingConfig(
+            cache_path=str(Path(store_path) / EMBEDDING_CACHE_FILE)
+        )
         self.chunking_config = chunking_config or ChunkingConfig()
         
         self.embedding_engine = EmbeddingEngine(self.embedding_config)
         self.vector_store = VectorStoreManager(
             store_path,
             self.embedding_engine,
-            self.chunking_config
+            self.chunking_config,
+            persistence_config
         )
     
     def add_document(self, content: str, source: str, title: str = "") -> int:
         """Add document to RAG index."""
         return self.vector_store.add_document(content, source, title)
+
+    def add_documents(self, documents: Iterable[tuple[str, str, str] | dict]) -> int:
+        """Add several documents to the RAG index in one batch."""
+        return self.vector_store.add_documents(documents)
+
+    def flush(self) -> None:
+        """Persist pending index/manifest changes (write-behind mode)."""
+        self.vector_store.flush()
+
+    def deferred(self):
+        """Context manager: batch index writes until the block exits."""
+        return self.vector_store.deferred()
     
     def retrieve(self, query: str, k: int = DEFAULT_TOP_K) -> List[RetrievalResult]:
         """Retrieve relevant documents for a query."""
@@ -603,6 +1171,7 @@ class RAGSystem:
                 "openai": _HAS_OPENAI_EMBEDDINGS,
                 "sentence_transformers": _HAS_SENTENCE_TRANSFORMERS,
                 "huggingface_embeddings": _HAS_HUGGINGFACE_EMBEDDINGS,
+                "onnx": _HAS_ONNX_EMBEDDINGS,
                 "faiss": FAISS is not None
             },
             "active_backend": self.embedding_engine.backend_type
@@ -617,7 +1186,10 @@ def create_rag_system(
     chunk_size: int = DEFAULT_CHUNK_SIZE
 ) -> RAGSystem:
     """Convenience function to create RAG system with defaults."""
-    embedding_config = EmbeddingConfig(model_name=model_name)
+    embedding_config = EmbeddingConfig(
+        model_name=model_name,
+        cache_path=str(Path(store_path) / EMBEDDING_CACHE_FILE),
+    )
     chunking_config = ChunkingConfig(chunk_size=chunk_size)
     return RAGSystem(store_path, embedding_config, chunking_config)
 
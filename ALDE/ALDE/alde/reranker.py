@@ -0,0 +1,161 @@
+"""Cross-encoder reranking for `VectorStore.query`.
+
+Scoring (query, chunk) pairs with a cross-encoder is by far the most
+expensive step of a query. `CrossEncoderReranker` bounds that cost:
+
+* only the best `max_candidates` hits (by FAISS distance) are scored; the
+  rest keep their distance order behind them;
+* pairs go through the model in batches of `batch_size`, and the tokenizer
+  truncates each pair to `max_length` tokens;
+* scores are cached per (query, chunk id). A repeated or overlapping query
+  only scores chunks it has not seen;
+* the model is loaded once per process and per model name (`get_reranker`),
+  so it stays warm in the pooled vectordb workers (see vdb_pool.py);
+* when scoring takes longer than `budget_ms`, the remaining batches are
+  skipped and the hits come back in plain distance order. Scores computed
+  so far stay in the cache.
+
+Controls (read by `vstores.py`):
+    AI_IDE_VSTORE_RERANK_BATCH       pairs per forward pass (default: 32)
+    AI_IDE_VSTORE_RERANK_TOP_N       max. scored candidates (default: 20)
+    AI_IDE_VSTORE_RERANK_MAX_TOKENS  tokens per (query, chunk) pair (default: 512)
+    AI_IDE_VSTORE_RERANK_BUDGET_MS   scoring budget per query, 0 => none (default: 2000)
+    AI_IDE_VSTORE_RERANK_CACHE       cached pair scores (default: 4096)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Sequence
+
+try:
+    from .query_cache import LRUCache  # type: ignore
+except ImportError:
+    from query_cache import LRUCache  # type: ignore
+
+__all__ = ["CrossEncoderReranker", "get_reranker"]
+
+# Grobe Vorkürzung vor dem Tokenizer: mehr Zeichen als ~8 pro Token
+# werden ohnehin abgeschnitten, müssen aber nicht erst tokenisiert werden.
+_CHARS_PER_TOKEN = 8
+
+
+def _chunk_key(doc: Any) -> str:
+    """Stable id of a chunk: docstore id if present, else a content hash."""
+    doc_id = getattr(doc, "id", None)
+    if doc_id:
+        return str(doc_id)
+    content = getattr(doc, "page_content", "") or ""
+    return hashlib.sha1(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """Batched, cached, budgeted cross-encoder reranking."""
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 32,
+        max_candidates: int = 20,
+        max_length: int = 512,
+        budget_ms: float = 2000.0,
+        cache_size: int = 4096,
+        device: str | None = None,
+        loader: Callable[[], Any] | None = None,
+    ) -> None:
+        self.model_name = model_name
+        self.batch_size = max(1, int(batch_size))
+        self.max_candidates = max(1, int(max_candidates))
+        self.max_length = max(8, int(max_length))
+        self.budget_ms = float(budget_ms)
+        self.device = device
+        self.scores = LRUCache(cache_size)
+        self._loader = loader
+        self._model: Any = None
+        self._load_failed = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        if self._loader is not None:
+            return self._loader()
+        from sentence_transformers import CrossEncoder
+
+        return CrossEncoder(self.model_name, device=self.device, max_length=self.max_length)
+
+    def model(self) -> Any:
+        """The cross-encoder (loaded on first use); None if it cannot load."""
+        if self._model is None and not self._load_failed:
+            with self._lock:
+                if self._model is None and not self._load_failed:
+                    try:
+                        self._model = self._load()
+                    except Exception:
+                        self._load_failed = True
+        return self._model
+
+    def warmup(self) -> bool:
+        return self.model() is not None
+
+    def rerank(
+        self, query: str, pairs: Sequence[tuple[Any, float]]
+    ) -> tuple[list[tuple[Any, float]], dict[str, Any]]:
+        """*pairs* (doc, distance) reordered by cross-encoder score, plus stats.
+
+        Hits beyond `max_candidates` follow in distance order. Without a
+        model, on errors or over budget, plain distance order is returned
+        and stats["degraded"] is set. The stats belong to this call only:
+        the reranker is shared by concurrent queries.
+        """
+        by_distance = sorted(pairs, key=lambda p: p[1])
+        head = by_distance[: self.max_candidates]
+        tail = by_distance[self.max_candidates:]
+        stats = {"candidates": len(head), "cached": 0, "scored": 0, "degraded": False}
+        model = self.model()
+        if model is None or not head:
+            stats["degraded"] = model is None
+            return by_distance, stats
+
+        keys = [(query, _chunk_key(doc)) for doc, _ in head]
+        scores: list[float | None] = [self.scores.get(key) for key in keys]
+        stats["cached"] = sum(s is not None for s in scores)
+        todo = [i for i, s in enumerate(scores) if s is None]
+        max_chars = self.max_length * _CHARS_PER_TOKEN
+
+        started = time.perf_counter()
+        for start in range(0, len(todo), self.batch_size):
+            if self.budget_ms > 0 and (time.perf_counter() - started) * 1000.0 > self.budget_ms:
+                stats["degraded"] = True
+                break
+            batch = todo[start:start + self.batch_size]
+            inputs = [(query, (head[i][0].page_content or "")[:max_chars]) for i in batch]
+            try:
+                batch_scores = model.predict(inputs, batch_size=self.batch_size, show_progress_bar=False)
+            except Exception:
+                stats["degraded"] = True
+                break
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self.scores.put(keys[i], scores[i])
+            stats["scored"] += len(batch)
+        stats["ms"] = (time.perf_counter() - started) * 1000.0
+
+        if stats["degraded"]:
+            return by_distance, stats
+        order = sorted(range(len(head)), key=lambda i: scores[i], reverse=True)
+        return [head[i] for i in order] + tail, stats
+
+
+_RERANKERS: dict[str, CrossEncoderReranker] = {}
+_RERANKERS_LOCK = threading.Lock()
+
+
+def get_reranker(model_name: str, **options: Any) -> CrossEncoderReranker:
+    """Process-wide reranker per model name (keeps the model warm)."""
+    with _RERANKERS_LOCK:
+        reranker = _RERANKERS.get(model_name)
+        if reranker is None:
+            reranker = CrossEncoderReranker(model_name, **options)
+            _RERANKERS[model_name] = reranker
+        return reranker
@@ -0,0 +1,249 @@
+"""Background tasks for the IDE (model calls, tool rounds, image jobs).
+
+Model calls used to run inside Qt slots, so the whole editor froze until
+a reply (including nested tool rounds and routing) was complete.
+`TaskScheduler` runs such work on `QThreadPool`s and reports back through
+signals, which Qt delivers in the GUI thread:
+
+* `submit(label, fn, lane=..., on_done=..., on_progress=..., on_error=...)`
+  queues `fn(task)` and returns the task id. `fn` may call
+  `task.progress(text)` (e.g. streamed tokens) and should check
+  `task.is_cancelled()` where it can.
+* lanes are separate pools with their own thread limit. The "chat" lane
+  runs one task at a time, because all prompts share one ChatHistory and
+  tool messages must stay paired with their assistant message. Further
+  prompts wait there, visible in `tasks()`. Image jobs use their own lane
+  and run next to chat tasks.
+* `cancel(task_id)` removes a queued task from its pool. For a running
+  task it sets the cancel flag: streamed output stops at the next token
+  (see chat_stream.StreamCancelled), and a late result is dropped.
+* `queueChanged` fires whenever a task is queued, starts or ends, so the
+  GUI can show the in-flight list.
+
+Controls:
+    AI_IDE_TASK_IMAGE_THREADS   parallel image jobs (default: 2)
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+try:
+    from .chat_stream import StreamCancelled  # type: ignore
+except ImportError as e:
+    msg = str(e)
+    if "no known parent package" in msg or "attempted relative import" in msg:
+        from chat_stream import StreamCancelled  # type: ignore
+    else:
+        raise
+
+__all__ = ["Task", "TaskScheduler", "TaskCancelled"]
+
+try:
+    _IMAGE_THREADS = max(1, int(os.getenv("AI_IDE_TASK_IMAGE_THREADS", "2").strip() or 2))
+except ValueError:
+    _IMAGE_THREADS = 2
+
+_LANE_THREADS = {
+    "chat": 1,
+    "image": _IMAGE_THREADS,
+}
+
+
+class TaskCancelled(StreamCancelled):
+    """Raised inside a task to stop it after `cancel()`.
+
+    Subclasses StreamCancelled so a cancelled `task.progress` used as
+    `on_delta` also ends the model stream.
+    """
+
+
+class Task:
+    """State of one submitted task (read from the GUI thread)."""
+
+    def __init__(self, task_id: int, label: str, lane: str, scheduler: "TaskScheduler") -> None:
+        self.id = task_id
+        self.label = label
+        self.lane = lane
+        self.state = "queued"  # queued | running | done | failed | cancelled
+        self.submitted_at = time.time()
+        self._cancel = threading.Event()
+        self._scheduler = scheduler
+
+    def is_cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise TaskCancelled(self.label)
+
+    def progress(self, text: str) -> None:
+        """Forward *text* to `on_progress` (GUI thread); stops a cancelled task."""
+        self.check_cancelled()
+        self._scheduler.progress.emit(self.id, text)
+
+
+class _Runnable(QRunnable):
+    def __init__(self, scheduler: "TaskScheduler", task: Task, fn: Callable[[Task], Any]) -> None:
+        super().__init__()
+        self.setAutoDelete(False)  # bleibt für tryTake() gültig
+        self._scheduler = scheduler
+        self._task = task
+        self._fn = fn
+
+    def run(self) -> None:
+        scheduler, task = self._scheduler, self._task
+        if task.is_cancelled():
+            scheduler._cancelled.emit(task.id)
+            return
+        scheduler._started.emit(task.id)
+        try:
+            result = self._fn(task)
+        except StreamCancelled:
+            scheduler._cancelled.emit(task.id)
+            return
+        except BaseException as exc:
+            if task.is_cancelled():
+                scheduler._cancelled.emit(task.id)
+            else:
+                scheduler._failed.emit(task.id, f"{type(exc).__name__}: {exc}")
+            return
+        if task.is_cancelled():
+            scheduler._cancelled.emit(task.id)
+        else:
+            scheduler._finished.emit(task.id, result)
+
+
+class TaskScheduler(QObject):
+    """Lane-based background scheduler with signal delivery (see module doc)."""
+
+    progress = Signal(int, str)
+    queueChanged = Signal()
+    taskFinished = Signal(int, str)  # (task id, final state)
+
+    # intern: aus Pool-Threads emittiert, im GUI-Thread verarbeitet
+    _started = Signal(int)
+    _finished = Signal(int, object)
+    _failed = Signal(int, str)
+    _cancelled = Signal(int)
+
+    def __init__(self, parent: QObject | None = None, lanes: dict[str, int] | None = None) -> None:
+        super().__init__(parent)
+        self._lane_threads = dict(_LANE_THREADS)
+        self._lane_threads.update(lanes or {})
+        self._pools: dict[str, QThreadPool] = {}
+        self._tasks: dict[int, Task] = {}
+        self._runnables: dict[int, _Runnable] = {}
+        self._callbacks: dict[int, tuple] = {}
+        self._ids = itertools.count(1)
+        self.progress.connect(self._on_progress)
+        self._started.connect(self._on_started)
+        self._finished.connect(self._on_finished)
+        self._failed.connect(self._on_failed)
+        self._cancelled.connect(self._on_cancelled)
+
+    # ------------------------------------------------------------------
+    def _pool(self, lane: str) -> QThreadPool:
+        pool = self._pools.get(lane)
+        if pool is None:
+            pool = QThreadPool(self)
+            pool.setMaxThreadCount(self._lane_threads.get(lane, 1))
+            self._pools[lane] = pool
+        return pool
+
+    def submit(
+        self,
+        label: str,
+        fn: Callable[[Task], Any],
+        *,
+        lane: str = "chat",
+        on_done: Callable[[Any], None] | None = None,
+        on_progress: Callable[[str], None] | None = None,
+        on_error: Callable[[str], None] | None = None,
+        on_cancel: Callable[[], None] | None = None,
+    ) -> int:
+        """Queue `fn(task)` on *lane*; callbacks run in the GUI thread."""
+        task = Task(next(self._ids), label, lane, self)
+        runnable = _Runnable(self, task, fn)
+        self._tasks[task.id] = task
+        self._runnables[task.id] = runnable
+        self._callbacks[task.id] = (on_done, on_progress, on_error, on_cancel)
+        self._pool(lane).start(runnable)
+        self.queueChanged.emit()
+        return task.id
+
+    def cancel(self, task_id: int) -> bool:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return False
+        task._cancel.set()
+        if task.state == "queued" and self._pool(task.lane).tryTake(self._runnables[task_id]):
+            self._on_cancelled(task_id)
+        return True
+
+    def cancel_all(self) -> None:
+        for task_id in list(self._tasks):
+            self.cancel(task_id)
+
+    def tasks(self) -> list[Task]:
+        """Queued and running tasks in submission order."""
+        return sorted(self._tasks.values(), key=lambda t: t.id)
+
+    def shutdown(self, wait_ms: int = 2000) -> None:
+        self.cancel_all()
+        for pool in self._pools.values():
+            pool.waitForDone(wait_ms)
+
+    # ------------------------------------------------------------------
+    def _end(self, task_id: int, state: str) -> tuple:
+        task = self._tasks.pop(task_id, None)
+        self._runnables.pop(task_id, None)
+        callbacks = self._callbacks.pop(task_id, (None, None, None, None))
+        if task is not None:
+            task.state = state
+            self.taskFinished.emit(task_id, state)
+        self.queueChanged.emit()
+        return callbacks
+
+    @staticmethod
+    def _call(callback: Callable | None, *args: Any) -> None:
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as exc:
+            print(f"[TaskScheduler] callback error: {exc}")
+
+    @Slot(int, str)
+    def _on_progress(self, task_id: int, text: str) -> None:
+        task = self._tasks.get(task_id)
+        if task is not None and not task.is_cancelled():
+            self._call(self._callbacks[task_id][1], text)
+
+    @Slot(int)
+    def _on_started(self, task_id: int) -> None:
+        task = self._tasks.get(task_id)
+        if task is not None:
+            task.state = "running"
+            self.queueChanged.emit()
+
+    @Slot(int, object)
+    def _on_finished(self, task_id: int, result: object) -> None:
+        if task_id in self._tasks:
+            self._call(self._end(task_id, "done")[0], result)
+
+    @Slot(int, str)
+    def _on_failed(self, task_id: int, error: str) -> None:
+        if task_id in self._tasks:
+            self._call(self._end(task_id, "failed")[2], error)
+
+    @Slot(int)
+    def _on_cancelled(self, task_id: int) -> None:
+        if task_id in self._tasks:
+            self._call(self._end(task_id, "cancelled")[3])
@@ -15,6 +15,7 @@ from typing import Callable, Any
 from dataclasses import dataclass, field
 import multiprocessing
 import queue as queue_mod
+import threading
 
 try:
     from .iter_documents import iter_documents
@@ -26,6 +27,22 @@ except ImportError as e:  # allow running directly from the repository root
         from iter_documents import iter_documents
     else:
         raise
+try:
+    from .vdb_pool import WorkerPool
+except ImportError as e:
+    msg = str(e)
+    if "attempted relative import" in msg or "no known parent package" in msg:
+        from vdb_pool import WorkerPool
+    else:
+        raise
+try:
+    from .federated import federated_query
+except ImportError as e:
+    msg = str(e)
+    if "attempted relative import" in msg or "no known parent package" in msg:
+        from federated import federated_query
+    else:
+        raise
 # Extractor import (local module)
 _DEFAULT_SAVE_DIR = os.path.join(os.path.expanduser("~"), "Cover_letters")
 
@@ -530,6 +547,10 @@ def fetch_url(url: str) -> str:
 _VSTORE_AUTOBUILD = os.getenv("AI_IDE_VSTORE_AUTOBUILD", "0").strip() in {"1", "true", "True"}
 _VSTORE_TOOL_TIMEOUT_S = float(os.getenv("AI_IDE_VSTORE_TOOL_TIMEOUT_S", "45"))
 _VSTORE_MP_START = os.getenv("AI_IDE_VSTORE_MP_START", "auto").strip().lower()  # auto|spawn|fork|forkserver
+# Keep query workers warm (model + index resident) instead of one process per call.
+_VSTORE_POOL = os.getenv("AI_IDE_VSTORE_POOL", "1").strip() in {"1", "true", "True"}
+# Query workers open stores read-only (mmap index + lazy SQLite docstore).
+_VSTORE_MMAP = os.getenv("AI_IDE_VSTORE_MMAP", "1").strip() in {"1", "true", "True"}
 
 # Administrative vector-store operations can take longer (build/index).
 _VDB_WORKER_TIMEOUT_S = float(os.getenv("AI_IDE_VDB_WORKER_TIMEOUT_S", "300"))
@@ -540,6 +561,15 @@ _TOOL_MAX_TOTAL_CHARS = int(os.getenv("AI_IDE_VSTORE_TOOL_MAX_TOTAL_CHARS", "120
 _TOOL_MAX_CONTENT_CHARS = int(os.getenv("AI_IDE_VSTORE_TOOL_MAX_CONTENT_CHARS", "1500") or 1500)
 _TOOL_INCLUDE_METADATA = os.getenv("AI_IDE_VSTORE_TOOL_INCLUDE_METADATA", "0").strip() in {"1", "true", "True"}
 
+# Federated queries (vectordb_multi): score normalisation minmax|rrf and
+# store aliases besides VSM_<n>_Data names.
+_VSTORE_FEDERATED_METHOD = os.getenv("AI_IDE_VSTORE_FEDERATED_METHOD", "minmax").strip().lower() or "minmax"
+_VSTORE_ALIASES = {
+    "project": "vectordb",
+    "memory": "memorydb",
+    "history": "VSM_3_Data",
+}
+
 
 def _shrink_vectordb_result(result: object, k: int) -> object:
     """Shrink tool results so they are safe to send back into the LLM context."""
@@ -560,6 +590,9 @@ def _shrink_vectordb_result(result: object, k: int) -> object:
                         "page": it.get("page"),
                         "content": content,
                     }
+                    if "store" in it:
+                        out["store"] = it.get("store")
+                        out["relevance"] = it.get("relevance")
                     if _TOOL_INCLUDE_METADATA and isinstance(it.get("metadata"), dict):
                         out["metadata"] = it.get("metadata")
                     shrunk.append(out)
@@ -591,11 +624,136 @@ def _shrink_vectordb_result(result: object, k: int) -> object:
         return "[tool result could not be shrunk]"
 
 
+def _vectordb_store_paths(kind: str) -> tuple[str, str]:
+    """Map a query kind (vectordb/memorydb) to (store_path, manifest_file)."""
+    base = GetPath()._parent(parg=f"{__file__}")
+    if kind == "memorydb":
+        return base + "AppData/VSM_4_Data", base + "AppData/VSM_4_Data/manifest.json"
+    return base + "AppData/VSM_1_Data", base + "AppData/VSM_1_Data/manifest.json"
+
+
+def _vectordb_serve(request: dict, state: dict) -> object:
+    """Answer one vectordb/memorydb request inside a worker process.
+
+    *state* is private to the worker and lives as long as the process does;
+    loaded `VectorStore` objects (embedding model + FAISS index) are cached
+    there so repeat queries skip the cold start.
+    """
+    try:
+        from .vstores import VectorStore  # type: ignore
+    except Exception:
+        from vstores import VectorStore  # type: ignore
+
+    if request.get("op") == "federated":
+        return _vectordb_serve_federated(request, state)
+
+    kind = str(request.get("kind") or "vectordb")
+    k = int(request.get("k") or 5)
+    if request.get("store_path"):
+        # Teil einer föderierten Anfrage (siehe _PooledStore)
+        store_path, manifest_file = str(request["store_path"]), str(request.get("manifest_file") or "")
+        autobuild = bool(request.get("autobuild"))
+    else:
+        store_path, manifest_file = _vectordb_store_paths(kind)
+        autobuild = _VSTORE_AUTOBUILD
+    db = _vectordb_open(VectorStore, store_path, manifest_file, state, autobuild=autobuild)
+    result = db.query(request.get("query"), k=k, filter_dict=request.get("filter_dict") or None)
+    if request.get("raw"):
+        # Merge and shrink happen in the caller.
+        return result
+    return _shrink_vectordb_result(result, k)
+
+
+def _vectordb_open(store_cls, store_path: str, manifest_file: str, state: dict, autobuild: bool = False):
+    """Return the worker-resident store for *store_path* (opened on first use)."""
+    stores: dict = state.setdefault("stores", {})
+    db = stores.get(store_path)
+    if db is None:
+        if autobuild:
+            # Default build root is the project root. Build with a writable
+            # store, then drop it so only the read-only view stays resident.
+            writer = store_cls(store_path=store_path, manifest_file=manifest_file)
+            writer.build(GetPath().get_path(parg=f"{__file__}", opt="p"))
+            del writer
+        db = store_cls(store_path=store_path, manifest_file=manifest_file, read_only=_VSTORE_MMAP)
+        stores[store_path] = db
+    return db
+
+
+def _federated_store_paths(name: str) -> tuple[str, str] | None:
+    """Map a store name for vectordb_multi to (store_path, manifest_file).
+
+    Accepts vectordb/memorydb, the aliases in _VSTORE_ALIASES and VSM store
+    ids ('3', 'VSM_3', 'VSM_3_Data'). Returns None for unknown stores.
+    """
+    name = _VSTORE_ALIASES.get(str(name).strip(), str(name).strip())
+    if not name:
+        return None
+    if name in {"vectordb", "memorydb"}:
+        return _vectordb_store_paths(name)
+    store_dir, _store_name, manifest_file = _resolve_vsm_store_dir(name)
+    if not os.path.isdir(store_dir):
+        return None
+    return store_dir, manifest_file
+
+
+def _vectordb_serve_federated(request: dict, state: dict) -> dict:
+    """Query several stores concurrently and merge them into one ranking.
+
+    Used by the one-shot subprocess (AI_IDE_VSTORE_POOL=0). With the pool,
+    `_run_vectordb_pooled` fans out to the per-store workers instead.
+    """
+    try:
+        from .vstores import VectorStore  # type: ignore
+    except Exception:
+        from vstores import VectorStore  # type: ignore
+
+    return _federated_answer(
+        request,
+        lambda store_path, manifest_file, autobuild: _vectordb_open(
+            VectorStore, store_path, manifest_file, state, autobuild=autobuild
+        ),
+    )
+
+
+def _federated_answer(request: dict, open_store: Callable[[str, str, bool], Any]) -> dict:
+    """Resolve the requested stores via *open_store* and run `federated_query`."""
+    k = int(request.get("k") or 5)
+    stores: dict = {}
+    errors: dict[str, str] = {}
+    for name in request.get("stores") or []:
+        name = str(name)
+        paths = _federated_store_paths(name)
+        if paths is None:
+            errors[name] = "unknown store"
+            continue
+        autobuild = _VSTORE_AUTOBUILD and _VSTORE_ALIASES.get(name, name) in {"vectordb", "memorydb"}
+        try:
+            stores[name] = open_store(paths[0], paths[1], autobuild)
+        except Exception as e:
+            errors[name] = f"{type(e).__name__}: {e}"
+    merged = federated_query(
+        stores,
+        request.get("query"),
+        k=k,
+        filter_dict=request.get("filter_dict") or None,
+        quotas=request.get("quotas") or None,
+        method=_VSTORE_FEDERATED_METHOD,
+    )
+    errors.update(merged["errors"])
+    out: dict = {"results": _shrink_vectordb_result(merged["results"], k)}
+    if errors:
+        out["errors"] = errors
+    return out
+
+
 def _vectordb_worker(
     kind: str,
     query: str,
     k: int,
     result_q,
+    filter_dict: dict | None = None,
+    request: dict | None = None,
 ) -> None:
     """Run VectorStore build/query in a child process.
 
@@ -609,35 +767,8 @@ def _vectordb_worker(
         pass
 
     try:
-        # Local imports inside the child keep the main GUI process safer.
-        try:
-            from .get_path import GetPath  # type: ignore
-        except ImportError as e:
-            msg = str(e)
-            if "no known parent package" in msg or "attempted relative import" in msg:
-                from get_path import GetPath  # type: ignore
-            else:
-                raise
-
-        try:
-            from .vstores import VectorStore  # type: ignore
-        except Exception:
-            from vstores import VectorStore  # type: ignore
-
-        base = GetPath()._parent(parg=f"{__file__}")
-        if kind == "memorydb":
-            store_path = base + "AppData/VSM_4_Data"
-            manifest_file = base + "AppData/VSM_4_Data/manifest.json"
-        else:
-            store_path = base + "AppData/VSM_1_Data"
-            manifest_file = base + "AppData/VSM_1_Data/manifest.json"
-
-        db = VectorStore(store_path=store_path, manifest_file=manifest_file)
-        if _VSTORE_AUTOBUILD:
-            # Default build root is the project root.
-            db.build(GetPath().get_path(parg=f"{__file__}", opt="p"))
-        result = db.query(query, k=int(k))
-        result = _shrink_vectordb_result(result, int(k))
+        request = request or {"kind": kind, "query": query, "k": int(k), "filter_dict": filter_dict}
+        result = _vectordb_serve(request, {})
         result_q.put({"ok": True, "result": result})
     except BaseException as e:
         # Must catch BaseException so we also report SystemExit in case
@@ -877,6 +1008,100 @@ def _vdb_admin_worker(
         result_q.put({"ok": False, "error": f"{type(e).__name__}: {e}"})
 
 
+def _mp_context():
+    """Pick the multiprocessing start method for vector-store children."""
+    # CUDA + fork can be problematic if the *parent* already initialized CUDA.
+    # For normal GUI runs (started from a file), prefer spawn.
+    # For interactive runs (stdin/REPL), spawn can fail because __main__.__file__ is missing.
+    import __main__
+
+    if _VSTORE_MP_START in {"spawn", "fork", "forkserver"}:
+        return multiprocessing.get_context(_VSTORE_MP_START)
+    main_file = getattr(__main__, "__file__", None)
+    is_real_file = bool(main_file) and isinstance(main_file, str) and not main_file.startswith("<")
+    if os.name == "posix" and not is_real_file:
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+_VECTORDB_POOL: WorkerPool | None = None
+# Pure tools (vectordb, memorydb, vectordb_multi) run from concurrent tool
+# threads; only one of them may create the pool.
+_VECTORDB_POOL_LOCK = threading.Lock()
+
+
+def _get_vectordb_pool() -> WorkerPool:
+    global _VECTORDB_POOL
+    if _VECTORDB_POOL is None:
+        with _VECTORDB_POOL_LOCK:
+            if _VECTORDB_POOL is None:
+                _VECTORDB_POOL = WorkerPool(_mp_context, _vectordb_serve)
+    return _VECTORDB_POOL
+
+
+class _PooledStore:
+    """Stand-in for a VectorStore in `federated_query`: queries the store's
+    own warm worker (the one keyed by its path that also serves
+    vectordb/memorydb), so no worker holds a second copy of a store."""
+
+    def __init__(self, store_path: str, manifest_file: str, autobuild: bool) -> None:
+        self.store_path = store_path
+        self.manifest_file = manifest_file
+        self.autobuild = autobuild
+
+    def query(self, query: str, k: int = 5, filter_dict: dict | None = None) -> list:
+        request = {
+            "store_path": self.store_path,
+            "manifest_file": self.manifest_file,
+            "autobuild": self.autobuild,
+            "query": query,
+            "k": int(k),
+            "filter_dict": filter_dict or None,
+            "raw": True,
+        }
+        payload = _get_vectordb_pool().call(self.store_path, request, _VSTORE_TOOL_TIMEOUT_S)
+        if payload.get("ok") is True:
+            return payload.get("result")
+        raise RuntimeError(_pool_error_text(os.path.basename(self.store_path), payload))
+
+
+def _pool_error_text(kind: str, payload: dict) -> str:
+    reason = payload.get("reason")
+    if reason == "timeout":
+        return (
+            f"{kind} timed out after {_VSTORE_TOOL_TIMEOUT_S:.0f}s. "
+            "Set AI_IDE_VSTORE_TOOL_TIMEOUT_S or disable heavy queries."
+        )
+    if reason == "crashed":
+        return f"{kind} crashed in subprocess (exitcode={payload.get('exitcode')})."
+    return f"{kind} error: {payload.get('error', 'unknown')}"
+
+
+def _run_vectordb_pooled(
+    kind: str,
+    query: str,
+    k: int,
+    filter_dict: dict | None = None,
+    request: dict | None = None,
+) -> list | dict | str:
+    """Execute vector DB work in a warm, per-store worker process.
+
+    Federated requests fan out to the per-store workers (`_PooledStore`)
+    and are merged here.
+    """
+    if request is not None and request.get("op") == "federated":
+        return _federated_answer(request, _PooledStore)
+    key, _manifest = _vectordb_store_paths(kind)
+    payload = _get_vectordb_pool().call(
+        key,
+        request or {"kind": kind, "query": query, "k": int(k), "filter_dict": filter_dict},
+        _VSTORE_TOOL_TIMEOUT_S,
+    )
+    if payload.get("ok") is True:
+        return payload.get("result")
+    return _pool_error_text(kind, payload)
+
+
 def _run_vdb_admin_subprocess(
     operation: str,
     store: str | None = None,
@@ -885,17 +1110,7 @@ def _run_vdb_admin_subprocess(
     remove_store_dir: bool = False,
 ) -> dict | str:
     """Execute vdb admin work in a spawned subprocess with timeout."""
-    import __main__
-
-    if _VSTORE_MP_START in {"spawn", "fork", "forkserver"}:
-        ctx = multiprocessing.get_context(_VSTORE_MP_START)
-    else:
-        main_file = getattr(__main__, "__file__", None)
-        is_real_file = bool(main_file) and isinstance(main_file, str) and not main_file.startswith("<")
-        if os.name == "posix" and not is_real_file:
-            ctx = multiprocessing.get_context("fork")
-        else:
-            ctx = multiprocessing.get_context("spawn")
+    ctx = _mp_context()
 
     result_q = ctx.Queue(maxsize=1)
     proc = ctx.Process(
@@ -936,25 +1151,23 @@ def _run_vdb_admin_subprocess(
     return "vdb_worker error: invalid result payload"
 
 
-def _run_vectordb_subprocess(kind: str, query: str, k: int) -> list | str:
+def _run_vectordb_subprocess(
+    kind: str,
+    query: str,
+    k: int,
+    filter_dict: dict | None = None,
+    request: dict | None = None,
+) -> list | dict | str:
     """Execute vector DB work in a spawned subprocess with timeout."""
-    # CUDA + fork can be problematic if the *parent* already initialized CUDA.
-    # For normal GUI runs (started from a file), prefer spawn.
-    # For interactive runs (stdin/REPL), spawn can fail because __main__.__file__ is missing.
-    import __main__
+    if _VSTORE_POOL:
+        return _run_vectordb_pooled(kind, query, k, filter_dict, request)
 
-    if _VSTORE_MP_START in {"spawn", "fork", "forkserver"}:
-        ctx = multiprocessing.get_context(_VSTORE_MP_START)
-    else:
-        main_file = getattr(__main__, "__file__", None)
-        is_real_file = bool(main_file) and isinstance(main_file, str) and not main_file.startswith("<")
-        if os.name == "posix" and not is_real_file:
-            ctx = multiprocessing.get_context("fork")
-        else:
-            ctx = multiprocessing.get_context("spawn")
+    ctx = _mp_context()
 
     result_q = ctx.Queue(maxsize=1)
-    proc = ctx.Process(target=_vectordb_worker, args=(kind, query, int(k), result_q), daemon=True)
+    proc = ctx.Process(
+        target=_vectordb_worker, args=(kind, query, int(k), result_q, filter_dict, request), daemon=True
+    )
     proc.start()
     proc.join(_VSTORE_TOOL_TIMEOUT_S)
 
@@ -981,13 +1194,35 @@ def _run_vectordb_subprocess(kind: str, query: str, k: int) -> list | str:
         return f"{kind} error: {payload.get('error', 'unknown')}"
     return f"{kind} error: invalid result payload"
 
-def memorydb(query: str, k: int = 5) -> list | str:
-    # Run in subprocess to protect the GUI process from native crashes.
-    return _run_vectordb_subprocess("memorydb", query, k)
+def memorydb(query: str, k: int = 5, filter_dict: dict | None = None) -> list | str:
+    # Run in a (warm) subprocess to protect the GUI process from native crashes.
+    return _run_vectordb_subprocess("memorydb", query, k, filter_dict)
 
-def vectordb(query: str, k: int = 5) -> list | str:
-    # Run in subprocess to protect the GUI process from native crashes.
-    return _run_vectordb_subprocess("vectordb", query, k)
+def vectordb(query: str, k: int = 5, filter_dict: dict | None = None) -> list | str:
+    # Run in a (warm) subprocess to protect the GUI process from native crashes.
+    return _run_vectordb_subprocess("vectordb", query, k, filter_dict)
+
+def vectordb_multi(
+    query: str,
+    stores: list[str] | None = None,
+    k: int = 5,
+    filter_dict: dict | None = None,
+    quotas: dict | None = None,
+) -> dict | str:
+    """Query several vector stores in one round trip (see federated.py).
+
+    *stores* defaults to project + memory. Results carry `store` and a
+    cross-store `relevance`; unknown or failing stores are listed in `errors`.
+    """
+    request = {
+        "op": "federated",
+        "stores": list(stores or ["vectordb", "memorydb"]),
+        "query": query,
+        "k": int(k),
+        "filter_dict": filter_dict,
+        "quotas": quotas,
+    }
+    return _run_vectordb_subprocess("vectordb_multi", query, k, filter_dict, request)
 
 
 def vdb_worker(
@@ -1104,6 +1339,16 @@ def call_api(endpoint: str, method: str = "GET", payload: str | None = None) ->
     
 
 
+# How a tool may be scheduled when the model requests several calls at once
+# (see agents_factory.execute_tool_calls):
+#   pure      no side effects; runs concurrently with other non-serial calls
+#   parallel  has side effects, but is safe to run next to other calls
+#   serial    runs alone: earlier calls finish first, later calls wait for it
+TOOL_PURE = "pure"
+TOOL_PARALLEL = "parallel"
+TOOL_SERIAL = "serial"
+
+
 @dataclass  
 class ToolSpec:
     """Complete tool specification - single source of truth."""
@@ -1111,6 +1356,7 @@ class ToolSpec:
     description: str
     parameters: list[ParamSpec] = field(default_factory=list)
     implementation: Callable | None = None  # Optional: actual function reference
+    concurrency: str = TOOL_SERIAL  # pure | parallel | serial
     
     # Callbacks bound to this tool 
     on_call: Callable[[str, dict], None] | None = None  # Called before execution
@@ -1251,10 +1497,11 @@ def param(name: str, type: str = "string", desc: str = "",
                      required=required, enum=enum, default=default)
 
 def tool(name: str, desc: str, params: list[ParamSpec] = None, 
-         impl: Callable = None) -> ToolSpec:
+         impl: Callable = None, concurrency: str = TOOL_SERIAL) -> ToolSpec:
     """Shorthand for creating ToolSpec."""
     return ToolSpec(name=name, description=desc, 
-                    parameters=params or [], implementation=impl)
+                    parameters=params or [], implementation=impl,
+                    concurrency=concurrency)
 
 # NOTE: Keep this module import-safe.
 # Do not import `agents_registry` here; it can have import-time side effects and
@@ -1264,14 +1511,31 @@ UNIFIED_TOOLS: list[ToolSpec] = [
     tool("memorydb",
         "Query the memory vector database (code snippets / notes).",
         [param("query", "string", "Free-text query or identifier.", True),
-         param("k", "integer", "Number of results.", default=3),],
-        impl=memorydb ),
+         param("k", "integer", "Number of results.", default=3),
+         ParamSpec(name="filter_dict", type="object", required=False,
+                   description="Optional metadata pre-filter, e.g. {'role': 'user', 'thread-id': '...'}."),],
+        impl=memorydb, concurrency=TOOL_PURE ),
 
     tool("vectordb",
         "Query the job-offer vector database.",
         [param("query", "string", "Free-text query or filename.", True),
-         param("k", "integer", "Number of results.", default=3),],
-        impl=vectordb ),  
+         param("k", "integer", "Number of results.", default=3),
+         ParamSpec(name="filter_dict", type="object", required=False,
+                   description="Optional metadata pre-filter, e.g. {'applied': 'no'} or {'source': '/abs/file.pdf'}."),],
+        impl=vectordb, concurrency=TOOL_PURE ),  
+
+    tool("vectordb_multi",
+        "Query several vector stores at once (e.g. project code + chat history) and get one merged ranking.",
+        [param("query", "string", "Free-text query or identifier.", True),
+         ParamSpec(name="stores", type="array", required=False, items={"type": "string"},
+                   description="Store names: vectordb|project, memorydb|memory, history, or VSM ids like '3'. "
+                               "Default: ['vectordb', 'memorydb']."),
+         param("k", "integer", "Number of merged results.", default=5),
+         ParamSpec(name="filter_dict", type="object", required=False,
+                   description="Optional metadata pre-filter applied to every store."),
+         ParamSpec(name="quotas", type="object", required=False,
+                   description="Optional max results per store, e.g. {'history': 2}."),],
+        impl=vectordb_multi, concurrency=TOOL_PURE ),
 
     tool(
         "vdb_worker",
@@ -1320,7 +1584,7 @@ UNIFIED_TOOLS: list[ToolSpec] = [
     tool("read_document",
          "Read the content of a document from disk.",
          [param("file_path", "string", "The absolute path to the file to read.", True)],
-         impl=read_document),
+         impl=read_document, concurrency=TOOL_PURE),
     
     tool("update_document",
          "Update a document's metadata.",
@@ -1343,7 +1607,7 @@ UNIFIED_TOOLS: list[ToolSpec] = [
     tool("list_documents",
          "List all documents in a directory.",
          [param("directory", "string", "Directory path to list.", default=_DEFAULT_SAVE_DIR)],
-         impl=list_documents),
+         impl=list_documents, concurrency=TOOL_PURE),
     
     tool("calendar",
          "Schedule an event in the calendar.", 
@@ -1380,7 +1644,7 @@ UNIFIED_TOOLS: list[ToolSpec] = [
     tool("iter_documents",
          "Recursively load supported documents from a root directory and returns a list of documents.",
          [param("root", "string", "Root directory to scan.", True)],
-         impl=iter_documents),
+         impl=iter_documents, concurrency=TOOL_PURE),
 
     tool(
         "dispatch_job_posting_pdfs",
@@ -1430,13 +1694,13 @@ UNIFIED_TOOLS: list[ToolSpec] = [
     tool("fetch_url",
          "Fetch content from a URL.",
          [param("url", "string", "The URL to fetch content from.", True)],
-         impl=fetch_url),
+         impl=fetch_url, concurrency=TOOL_PURE),
     
     tool("fetch_data",
          "Fetch data from a specified source.",
          [param("source", "string", "The data source to fetch from.", True),
           param("query", "string", "The query to execute on the source.", True)],
-         impl=fetch_data),
+         impl=fetch_data, concurrency=TOOL_PURE),
     
     tool("call_api",
          "Call an external API endpoint.",
@@ -1477,7 +1741,7 @@ UNIFIED_TOOLS: list[ToolSpec] = [
 
 TOOL_GROUPS: dict[str, list[str]] = {
     # Retrieval / context
-    "rag": ["memorydb", "vectordb"],
+    "rag": ["memorydb", "vectordb", "vectordb_multi"],
     # Document CRUD
     "docs_rw": [
         "read_document",
@@ -0,0 +1,191 @@
+"""Warm, crash-isolated worker processes for vector-store queries.
+
+`tools.vectordb()` / `tools.memorydb()` used to spawn a fresh process per
+call. That process had to re-import torch/langchain, load the embedding
+model and run `FAISS.load_local` before it could answer a single query.
+
+This module keeps one long-lived worker process per key (usually one per
+store). Each worker owns a private `state` dict in which the handler keeps
+heavy resources (embedding model, loaded `VectorStore`) resident between
+requests. Requests travel over a `multiprocessing.Pipe`. Federated
+queries (`tools.vectordb_multi`, see federated.py) are sent to the
+workers of the individual stores and merged by the caller. No extra
+worker loads a second copy of a store or of the embedding model.
+
+Crash isolation is preserved: a segfault in native code (torch/faiss) only
+kills the worker; the next request transparently starts a new one.
+
+Controls (read by `tools.py`):
+    AI_IDE_VSTORE_POOL=0/1            (default: 1)
+    AI_IDE_VSTORE_TOOL_TIMEOUT_S      (per-request timeout, default: 45)
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+from typing import Any, Callable
+
+__all__ = ["WarmWorker", "WorkerPool"]
+
+# handler(request, state) -> result. Must be a module-level function so it can
+# be pickled by reference when the worker is started with `spawn`.
+Handler = Callable[[dict, dict], Any]
+
+
+def _pool_worker_main(conn, handler: Handler) -> None:
+    """Request loop executed inside the worker process."""
+    try:
+        import faulthandler
+
+        faulthandler.enable(all_threads=True)
+    except Exception:
+        pass
+
+    state: dict[str, Any] = {}
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            break
+        if not isinstance(request, dict) or request.get("op") == "stop":
+            break
+        try:
+            payload = {"ok": True, "result": handler(request, state)}
+        except BaseException as e:
+            # Must catch BaseException so we also report SystemExit in case
+            # underlying code tries to sys.exit().
+            payload = {"ok": False, "reason": "error", "error": f"{type(e).__name__}: {e}"}
+        try:
+            conn.send(payload)
+        except Exception:
+            break
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class WarmWorker:
+    """One long-lived worker process with a request/response pipe.
+
+    Calls are serialised with a lock, so a worker may be shared between
+    threads. A worker that timed out or died is terminated and respawned
+    lazily on the next call.
+    """
+
+    def __init__(self, ctx, handler: Handler, name: str = "vdb-worker") -> None:
+        self._ctx = ctx
+        self._handler = handler
+        self._name = name
+        self._lock = threading.Lock()
+        self._proc = None
+        self._conn = None
+        self._started = False
+        self.restarts = 0
+
+    # ------------------------------------------------------------------
+    def _start(self) -> None:
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        proc = self._ctx.Process(
+            target=_pool_worker_main,
+            args=(child_conn, self._handler),
+            name=self._name,
+            daemon=True,
+        )
+        proc.start()
+        # The child owns its end; closing ours lets recv() see EOF on crash.
+        child_conn.close()
+        self._proc = proc
+        self._conn = parent_conn
+
+    def _kill(self) -> None:
+        proc, conn = self._proc, self._conn
+        self._proc = None
+        self._conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if proc is not None:
+            try:
+                if proc.is_alive():
+                    proc.terminate()
+                proc.join(5)
+                if proc.is_alive():
+                    proc.kill()
+                    proc.join(1)
+            except Exception:
+                pass
+
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    # ------------------------------------------------------------------
+    def call(self, request: dict, timeout: float) -> dict:
+        """Send *request* and wait up to *timeout* seconds for the reply.
+
+        Returns the worker payload (`{"ok": True, "result": ...}`) or an error
+        payload with `reason` in {"error", "timeout", "crashed"}.
+        """
+        with self._lock:
+            if not self.is_alive():
+                if self._started:
+                    self.restarts += 1
+                self._kill()
+                self._start()
+                self._started = True
+
+            try:
+                self._conn.send(request)
+                if not self._conn.poll(timeout):
+                    self._kill()
+                    return {"ok": False, "reason": "timeout", "error": f"timed out after {timeout:.0f}s"}
+                return self._conn.recv()
+            except (EOFError, OSError, BrokenPipeError):
+                exitcode = None
+                if self._proc is not None:
+                    self._proc.join(1)
+                    exitcode = self._proc.exitcode
+                self._kill()
+                return {"ok": False, "reason": "crashed", "exitcode": exitcode, "error": f"worker crashed (exitcode={exitcode})"}
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._conn is not None and self.is_alive():
+                try:
+                    self._conn.send({"op": "stop"})
+                    self._proc.join(2)
+                except Exception:
+                    pass
+            self._kill()
+
+
+class WorkerPool:
+    """Keyed collection of `WarmWorker`s (one per store/key)."""
+
+    def __init__(self, ctx_factory: Callable[[], Any], handler: Handler) -> None:
+        self._ctx_factory = ctx_factory
+        self._handler = handler
+        self._workers: dict[str, WarmWorker] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def worker(self, key: str) -> WarmWorker:
+        with self._lock:
+            w = self._workers.get(key)
+            if w is None:
+                w = WarmWorker(self._ctx_factory(), self._handler, name=f"vdb-worker-{key}")
+                self._workers[key] = w
+            return w
+
+    def call(self, key: str, request: dict, timeout: float) -> dict:
+        return self.worker(key).call(request, timeout)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+        for w in workers:
+            w.stop()
@@ -10,35 +10,61 @@ from sqlalchemy import literal
 
 import json
 import sys
+import hashlib
+import uuid
 from pathlib import Path
-from typing import Iterable, List, Set, Dict, Any
+from typing import Callable, Iterable, Iterator, List, Set, Dict, Any
 import os
 import time
 import logging
+import threading
 from datetime import datetime
 from dataclasses import dataclass, field
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from contextlib import suppress
+from fnmatch import fnmatch
 from langchain_core.documents import Document
 from langchain_community.document_loaders import (  # add PyPDFLoader + custom loader
     PyPDFLoader,
     TextLoader,
     PythonLoader,
-    DirectoryLoader
 )
-try:
-    from .embed_tool import build  # type: ignore
-except Exception:
-    from embed_tool import build  # type: ignore
-
 try:
     from . import torch_init  # type: ignore
 except Exception:
     import torch_init  # type: ignore
 
+try:
+    from .query_cache import LRUCache, QueryCache  # type: ignore
+except ImportError:
+    from query_cache import LRUCache, QueryCache  # type: ignore
+
+try:
+    from . import faiss_index  # type: ignore
+except ImportError:
+    import faiss_index  # type: ignore
+
+try:
+    from . import onnx_embed  # type: ignore
+except ImportError:
+    import onnx_embed  # type: ignore
+
+try:
+    from .reranker import get_reranker  # type: ignore
+except ImportError:
+    from reranker import get_reranker  # type: ignore
+
+try:
+    from .chunking import METADATA_MODES, StructuredSplitter, embedding_text  # type: ignore
+except ImportError:
+    from chunking import METADATA_MODES, StructuredSplitter, embedding_text  # type: ignore
+
+try:
+    from .docstore_db import attach_docstore, load_faiss_store, metadata_matches, save_faiss_store  # type: ignore
+except ImportError:
+    from docstore_db import attach_docstore, load_faiss_store, metadata_matches, save_faiss_store  # type: ignore
+
 try:
     from .get_path import GetPath  # type: ignore
 except ImportError as e:
@@ -63,10 +89,14 @@ MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 # Text-Chunk Parameter
 CHUNK_SIZE = 1_000
 CHUNK_OVERLAP = 150
+# Python-Quellen werden an def/class-Grenzen geschnitten (siehe chunking.py);
+# ganze Funktionen brauchen ein größeres Budget als Fließtext.
+CODE_CHUNK_SIZE = int(os.getenv("AI_IDE_VSTORE_CODE_CHUNK_SIZE", "2000") or 2000)
 # Trefferzahl für query()
 DEFAULT_TOP_K = 50
 # Datei, in der bereits indizierte Quell­pfade gespeichert werden
 MANIFEST_FILE:GetPath = GetPath()._parent(parg = f"{__file__}") + f"AppData/VSM_0_Data/manifest.json"
+MANIFEST_SCHEMA = "vstore_manifest_v2"
 
 # Embeddings device selection.
 # - Set `AI_IDE_EMBEDDINGS_DEVICE=cuda` (or `cuda:0`) to force GPU.
@@ -74,6 +104,19 @@ MANIFEST_FILE:GetPath = GetPath()._parent(parg = f"{__file__}") + f"AppData/VSM_
 # - Default: `auto` (use GPU if available, else CPU).
 EMBEDDINGS_DEVICE = os.getenv("AI_IDE_EMBEDDINGS_DEVICE", "auto")
 
+# Embeddings backend.
+# - `AI_IDE_EMBED_BACKEND=hf` (default): HuggingFace/sentence-transformers (torch, fp32).
+# - `AI_IDE_EMBED_BACKEND=onnx`: ONNX Runtime int8 auf der CPU, ohne torch-Import
+#   (Modell vorher mit `python -m alde.onnx_embed export` erzeugen).
+# - `AI_IDE_ONNX_MODEL_DIR`: Verzeichnis des exportierten Modells.
+EMBED_BACKEND = os.getenv("AI_IDE_EMBED_BACKEND", "hf").strip().lower() or "hf"
+ONNX_MODEL_DIR = os.getenv("AI_IDE_ONNX_MODEL_DIR") or (
+    GetPath()._parent(parg = f"{__file__}") + f"AppData/onnx/{MODEL_NAME.rsplit('/', 1)[-1]}"
+)
+# Schlüssel des Embedding-Raums (Query-Cache); ONNX-int8-Vektoren weichen
+# leicht von den torch-Vektoren ab und dürfen sich nicht vermischen.
+EMBED_MODEL_KEY = MODEL_NAME if EMBED_BACKEND != "onnx" else f"{MODEL_NAME}@onnx-int8"
+
 
 def _select_embeddings_device() -> str:
     desired = (EMBEDDINGS_DEVICE or "auto").strip()
@@ -94,35 +137,94 @@ def _select_embeddings_device() -> str:
 # can crash when combined with aggressive multithreading.
 USE_MULTITHREADING = os.getenv("AI_IDE_VSTORE_MULTITHREAD", "0").strip() in {"1", "true", "True"}
 
+# Document loading pipeline (pure-Python loaders, no torch/faiss involved).
+#   AI_IDE_VSTORE_LOADER_WORKERS      threads for text/py/pdf loaders (1 => serial)
+#   AI_IDE_VSTORE_LOADER_MAX_PENDING  max files in flight (0 => 4 x workers)
+#   AI_IDE_VSTORE_PDF_PROCESSES       >0 => parse PDFs in a process pool (all cores)
+#   AI_IDE_VSTORE_PDF_OCR             OCR fallback for PDFs without text layer
+#   AI_IDE_VSTORE_BUILD_BATCH         documents per chunk/embed batch in build()
+VSTORE_LOADER_WORKERS = int(os.getenv("AI_IDE_VSTORE_LOADER_WORKERS", "0") or 0) or min(8, os.cpu_count() or 1)
+VSTORE_LOADER_MAX_PENDING = int(os.getenv("AI_IDE_VSTORE_LOADER_MAX_PENDING", "0") or 0)
+VSTORE_PDF_PROCESSES = int(os.getenv("AI_IDE_VSTORE_PDF_PROCESSES", "0") or 0)
+VSTORE_PDF_OCR = os.getenv("AI_IDE_VSTORE_PDF_OCR", "1").strip() in {"1", "true", "True"}
+VSTORE_BUILD_BATCH = max(1, int(os.getenv("AI_IDE_VSTORE_BUILD_BATCH", "64") or 64))
+# Chat-Verläufe (Liste von Nachrichten) werden pro Nachricht indiziert;
+# nur JSON-Dateien, deren Name auf eines dieser Muster passt.
+VSTORE_JSON_GLOBS = tuple(
+    g.strip() for g in os.getenv("AI_IDE_VSTORE_JSON_GLOBS", "history*.json,memory*.json").split(",") if g.strip()
+)
+# Wie Metadaten in das Embedding eingehen (siehe chunking.embedding_text):
+#   header  kurze Kopfzeile (Titel | Abschnitt/Symbol | Seite) vor jedem Chunk
+#   full    alter "Metadata: k: v | ..."-Anhang
+#   none    nur Rohtext; Metadaten bleiben Filter-/Payload-Felder
+# Gespeichert wird in jedem Modus nur der Rohtext des Chunks.
+VSTORE_METADATA_MODE = os.getenv("AI_IDE_VSTORE_METADATA_MODE", "header").strip().lower()
+if VSTORE_METADATA_MODE not in METADATA_MODES:
+    VSTORE_METADATA_MODE = "header"
+# Alte Indizes enthalten den Anhang noch im gespeicherten Text.
+_LEGACY_METADATA_MARKER = "\n\nMetadata: "
+
 # Retrieval tuning
 VSTORE_DEDUP = os.getenv("AI_IDE_VSTORE_DEDUP", "1").strip() in {"1", "true", "True"}
 VSTORE_RERANK = os.getenv("AI_IDE_VSTORE_RERANK", "1").strip() in {"1", "true", "True"}
 VSTORE_RERANK_METHOD = os.getenv("AI_IDE_VSTORE_RERANK_METHOD", "mmr").strip().lower()
+VSTORE_MMR_LAMBDA = float(os.getenv("AI_IDE_VSTORE_MMR_LAMBDA", "0.5") or 0.5)  # 1 => reine Relevanz
 VSTORE_RERANK_MODEL = os.getenv(
     "AI_IDE_VSTORE_RERANK_MODEL",
     # multilingual + reasonably small
     "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1",
 )
+# Cross-Encoder-Reranking (siehe reranker.py)
+VSTORE_RERANK_BATCH = int(os.getenv("AI_IDE_VSTORE_RERANK_BATCH", "32") or 32)
+VSTORE_RERANK_TOP_N = int(os.getenv("AI_IDE_VSTORE_RERANK_TOP_N", "20") or 20)
+VSTORE_RERANK_MAX_TOKENS = int(os.getenv("AI_IDE_VSTORE_RERANK_MAX_TOKENS", "512") or 512)
+VSTORE_RERANK_BUDGET_MS = float(os.getenv("AI_IDE_VSTORE_RERANK_BUDGET_MS", "2000") or 0)
+VSTORE_RERANK_CACHE = int(os.getenv("AI_IDE_VSTORE_RERANK_CACHE", "4096") or 0)
 VSTORE_FETCH_K = int(os.getenv("AI_IDE_VSTORE_FETCH_K", "0") or 0)  # 0 => auto
 VSTORE_MAX_CONTENT_CHARS = int(os.getenv("AI_IDE_VSTORE_MAX_CONTENT_CHARS", "2000") or 2000)
 VSTORE_INCLUDE_METADATA = os.getenv("AI_IDE_VSTORE_INCLUDE_METADATA", "1").strip() in {"1", "true", "True"}
 
-_CROSS_ENCODER = None
-
-
-def _get_cross_encoder():
-    global _CROSS_ENCODER
+# Query-Cache (siehe query_cache.py)
+VSTORE_QUERY_CACHE = int(os.getenv("AI_IDE_VSTORE_QUERY_CACHE", "256") or 0)
+VSTORE_EMBED_CACHE = int(os.getenv("AI_IDE_VSTORE_EMBED_CACHE", "1024") or 0)
+VSTORE_QUERY_CACHE_PERSIST = os.getenv("AI_IDE_VSTORE_QUERY_CACHE_PERSIST", "0").strip() in {"1", "true", "True"}
+VSTORE_QUERY_CACHE_SAVE_S = float(os.getenv("AI_IDE_VSTORE_QUERY_CACHE_SAVE_S", "30") or 0)
+# Ein Embedding-Modell und ein Query-Embedding-Cache pro Prozess, auch wenn
+# mehrere Stores offen sind (ChatHistory, föderierte Queries in tools.py).
+_QUERY_EMBEDDINGS = LRUCache(VSTORE_EMBED_CACHE)
+_SHARED_EMBEDDINGS: dict[tuple, Any] = {}
+_SHARED_EMBEDDINGS_LOCK = threading.Lock()
+
+# Index-Typ (siehe faiss_index.py)
+#   AI_IDE_VSTORE_INDEX             flat | ivf | ivfpq | hnsw | <faiss factory string>
+#   AI_IDE_VSTORE_INDEX_UPGRADE_AT  Flat wird ab so vielen Vektoren umgebaut
+#   AI_IDE_VSTORE_TRAIN_SAMPLE      max. Trainingsvektoren für IVF/PQ
+#   AI_IDE_VSTORE_RETRAIN_FACTOR    neu trainieren, wenn ntotal > factor * trained_on
+#   AI_IDE_VSTORE_NPROBE            IVF: durchsuchte Listen pro Query
+#   AI_IDE_VSTORE_EF_SEARCH         HNSW: Kandidatenliste pro Query
+VSTORE_INDEX = os.getenv("AI_IDE_VSTORE_INDEX", "flat").strip() or "flat"
+VSTORE_INDEX_UPGRADE_AT = int(os.getenv("AI_IDE_VSTORE_INDEX_UPGRADE_AT", "50000") or 50000)
+VSTORE_TRAIN_SAMPLE = int(os.getenv("AI_IDE_VSTORE_TRAIN_SAMPLE", "50000") or 50000)
+VSTORE_RETRAIN_FACTOR = float(os.getenv("AI_IDE_VSTORE_RETRAIN_FACTOR", "4") or 4)
+VSTORE_NPROBE = int(os.getenv("AI_IDE_VSTORE_NPROBE", "16") or 16)
+VSTORE_EF_SEARCH = int(os.getenv("AI_IDE_VSTORE_EF_SEARCH", "64") or 64)
+# Gefilterte Suche: bis zu so vielen Kandidaten wird exakt auf den
+# rekonstruierten Vektoren gerechnet, darüber per FAISS IDSelector.
+VSTORE_FILTER_EXACT_MAX = int(os.getenv("AI_IDE_VSTORE_FILTER_EXACT_MAX", "4096") or 4096)
+
+def _get_reranker():
+    """Prozessweiter Cross-Encoder-Reranker (Modell bleibt zwischen Queries warm)."""
     if VSTORE_RERANK_METHOD != "crossencoder":
         return None
-    if _CROSS_ENCODER is not None:
-        return _CROSS_ENCODER
-    try:
-        from sentence_transformers import CrossEncoder
-
-        _CROSS_ENCODER = CrossEncoder(VSTORE_RERANK_MODEL, device=_select_embeddings_device())
-    except Exception:
-        _CROSS_ENCODER = None
-    return _CROSS_ENCODER
+    return get_reranker(
+        VSTORE_RERANK_MODEL,
+        batch_size=VSTORE_RERANK_BATCH,
+        max_candidates=VSTORE_RERANK_TOP_N,
+        max_length=VSTORE_RERANK_MAX_TOKENS,
+        budget_ms=VSTORE_RERANK_BUDGET_MS,
+        cache_size=VSTORE_RERANK_CACHE,
+        device=_select_embeddings_device(),
+    )
 # ─────────────────────── Performance Monitoring ───────────────────────
 
 
@@ -145,6 +247,13 @@ def _norm_source(value: object) -> str:
     return str(value)
 
 
+def _dedup_key(metadata: dict) -> str:
+    """Gruppe für die Deduplizierung: die Datei, bei Chat-Verläufen die Nachricht."""
+    source = _norm_source(metadata.get("source", ""))
+    message_id = metadata.get("message-id")
+    return source if message_id is None else f"{source}#{message_id}"
+
+
 def _safe_title_from_source(source: str) -> str:
     with suppress(Exception):
         return Path(source).name
@@ -170,40 +279,49 @@ class SafeTextLoader(TextLoader):
             _log(err, f"Überspringe Datei (Encoding-Fehler): {self.file_path}")
             return []
 
-def _load_json(path) -> List[Document]:
-        """Return the list of text snippets contained in *path*."""
-        is_json = Path(f"{path} **/*.json")
-        if not is_json.is_file():
-                _log("", f"File is not a JSON: {path}")
-                return []
-        else:
-            with open(is_json ,"r", encoding="utf-8") as fh:
-                data = json.load(fh)
-        
-        documents = []
-        for idx, item in enumerate(data):
-            # Erstelle eindeutigen Source-Key mit Index und Content-Hash
-            content_str = str(item["content"])
-            source_key = hex(hash(f"{item['role']}{item['thread-id']}{item['time']}{item['date']}{idx}{content_str}"))
-            
-            doc = Document(
-                page_content=content_str,
-                metadata={
-                    "source-key": str(source_key),
-                    "role": item["role"],
-                    "message-id": item["message-id"],
-                    "thread-id": item["thread-id"], 
-                    "time": item["time"],
-                    "date": item["date"],
-                    "index": idx,
-                    "vector": item.get("vec", None),
-                    "id": item.get("id", None)
-                }
-            )
-            documents.append(doc)
-            # print(f"JSON Doc {idx}: source={source_key}")
-        
-        return documents
+def _load_json(path: str | Path) -> List[Document]:
+    """Ein Document pro Nachricht eines JSON-Chat-Verlaufs (*path*).
+
+    Andere JSON-Strukturen (Manifest, Konfiguration, ...) liefern [].
+    """
+    path = Path(path)
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError) as err:
+        _log(err, f"JSON übersprungen: {path}")
+        return []
+    if not isinstance(data, list):
+        return []
+
+    documents = []
+    for idx, item in enumerate(data):
+        if not isinstance(item, dict) or "content" not in item or "role" not in item:
+            continue
+        # Erstelle eindeutigen Source-Key mit Index und Content-Hash
+        content_str = str(item["content"])
+        if not content_str.strip():
+            continue
+        source_key = hex(hash(f"{item['role']}{item.get('thread-id')}{item.get('time')}{item.get('date')}{idx}{content_str}"))
+
+        doc = Document(
+            page_content=content_str,
+            metadata={
+                "source": str(path),
+                "titel": path.name,
+                "source-key": str(source_key),
+                "role": item["role"],
+                "message-id": item.get("message-id", idx),
+                "thread-id": item.get("thread-id"),
+                "time": item.get("time"),
+                "date": item.get("date"),
+                "index": idx,
+                "id": item.get("id", None)
+            }
+        )
+        documents.append(doc)
+
+    return documents
 # ──────────────────────────────────────────────────────────────────────────    
     # 2) HELPER: robuster PDF-Loader  ──────────────────────────────────────────
 def _load_pdf(path: str | Path) -> list[Document]:
@@ -219,146 +337,233 @@ def _load_pdf(path: str | Path) -> list[Document]:
         sudo apt install tesseract-ocr tesseract-ocr-deu
     """
     _log("", f"Versuche PDF zu laden: {path}")
-    docs = None  # Ensure docs is always defined
+    docs: list[Document] = []
     # --- 1) PyPDFLoader ---------------------------------------------------
     try:
         docs = PyPDFLoader(str(path)).load()
         docs = [d for d in docs if d.page_content.strip()]
-        for d in docs:
-            d.metadata["source"] = str(path)
-            d.metadata["titel"] = Path(path).name
-            d.metadata['applied']  = 'no'
-            d.metadata['id']       = hex(hash(f"{d.metadata['source']}{d.page_content[:100]}"))
-            #print(f'PDF Doc: source= {d.metadata["source"]} titel= {d.metadata["titel"]} id= {d.metadata["id"]} applied= {d.metadata["applied"]}')
+        if docs:
+            _log("", f"✓ PDF erfolgreich mit PyPDFLoader geladen: {path} ({len(docs)} Seiten)")
+        else:
+            _log("", f"⚠ PyPDFLoader fand keine Textinhalte in: {path}")
+    except Exception as e:
+        _log(e, f"PyPDFLoader fehlgeschlagen: {path}")
+        docs = []
 
+    # --- 2) Fallback: OCR -------------------------------------------------
+    if not docs and VSTORE_PDF_OCR:
+        try:
+            from langchain_community.document_loaders import UnstructuredPDFLoader
 
+            docs = UnstructuredPDFLoader(
+                str(path), mode="single", strategy="ocr_only", languages=["deu"],
+            ).load()
+            docs = [d for d in docs if d.page_content.strip()]
+            if docs:
+                _log("", f"✓ OCR-Fallback erfolgreich für PDF: {path} ({len(docs)} Elemente)")
+        except Exception as e:
+            _log(e, f"✗ PDF übersprungen (kein Text extrahierbar): {path}")
+            docs = []
 
-           
-        if docs:                       # Erfolg → sofort zurück
-                _log("", f"✓ PDF erfolgreich mit PyPDFLoader geladen: {path} ({len(docs)} Seiten)")
-                # Zeige ersten Text-Ausschnitt für Debugging
-                _log("", f"  Preview: {preview}...")
+    for d in docs:
+        d.metadata["source"] = str(path)
+        d.metadata["titel"] = Path(path).name
+        d.metadata['applied']  = 'no'
+        d.metadata['id']       = hex(hash(f"{d.metadata['source']}{d.page_content[:100]}"))
+    return docs
+# ──────────────────────────────────────────────────────────────────────────
+# 3)  _iter_documents  (komplett ersetzen)  
+# Verzeichnisse die übersprungen werden sollen (normalerweise keine relevanten Dokumente)
+SKIP_DIRS = {
+    'venv', '.venv', '__pycache__', '.git', 'node_modules', 'venv/lib/python3.13/site-packages',
+    'site-packages', '.pytest_cache', '.mypy_cache',
+    'matplotlib/mpl-data/images',
+    } # matplotlib icons - meist nur Grafiken ohne Text
+
+# Reine Textformate (SafeTextLoader)
+TEXT_SUFFIXES = (
+    ".txt", ".md", ".rst",
+    ".yaml", ".yml",
+    ".sqlite", ".sqlite3", ".toml",
+)
 
-                return docs
-        #else:
-         #   _log("", f"⚠ PyPDFLoader fand keine Textinhalte in: {path}")
-    except Exception as e:
 
-    # --- 2) Fallback: OCR -------------------------------------------------
-            if docs:                       # Erfolg → sofort zurück
-              _log("", f"✓ PDF erfolgreich mit PyPDFLoader geladen: {path} ({len(docs)} Seiten)")
-            # Zeige ersten Text-Ausschnitt für Debugging
-            preview = docs[0].page_content[:200].replace('\n', ' ')
-        
+def _should_skip_path(path: Path) -> bool:
+    """Prüft ob ein Pfad übersprungen werden soll"""
+    path_str = str(path)
+    return any(skip_dir in path_str for skip_dir in SKIP_DIRS)
+
+
+def _iter_source_files(root: str | Path) -> Iterator[Path]:
+    """Ein einziger Verzeichnis-Durchlauf über *root*.
+
+    Liefert alle indizierbaren Dateien (Text, PDF, Python).  Python-Quellen
+    werden wie bisher nur auf oberster Ebene von *root* berücksichtigt.
+    """
+    root = Path(root).expanduser().resolve()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        here = Path(dirpath)
+        for name in sorted(filenames):
+            path = here / name
+            suffix = path.suffix.lower()
+            if suffix == ".py":
+                if here == root:
+                    yield path
+                continue
+            if suffix in TEXT_SUFFIXES or suffix == ".pdf" or (
+                suffix == ".json" and any(fnmatch(name, g) for g in VSTORE_JSON_GLOBS)
+            ):
+                if not _should_skip_path(path):
+                    yield path
+
+
+def _load_path(path: Path) -> list[Document]:
+    """Lädt eine einzelne Datei mit dem passenden Loader."""
+    suffix = path.suffix.lower()
+    docs: list[Document] = []
+    try:
+        if suffix == ".pdf":
+            docs = _load_pdf(path) or []
             if docs:
-        
-              _log("", f"✓ OCR-Fallback erfolgreich für PDF: {path} ({len(docs)} Elemente)")
-           # Zeige ersten Text-Ausschnitt für Debugging
-           # preview = docs[0].page_content[:200].replace('\n', ' ')
-           #_log("", f"  Preview: {preview}...")
-        
+                _log("", f"✓ PDF indexiert: {path} ({len(docs)} Dokumente)")
             return docs
-# ──────────────────────────────────────────────────────────────────────────
-# 3)  _iter_documents  (komplett ersetzen)  
-def _iter_documents(root: str | Path) -> list[Document]:
+        if suffix == ".json":
+            return _load_json(path)
+        if suffix == ".py":
+            docs = PythonLoader(str(path)).load()
+        else:
+            # Encoding-Fehler werden im SafeTextLoader abgefangen
+            docs = SafeTextLoader(str(path), autodetect_encoding=True).load()
+    except Exception as err:
+        _log(err, f"Überspringe Datei: {path}")
+        return []
+    for d in docs:
+        d.metadata["source"] = str(path)
+        d.metadata["titel"] = path.name
+        d.metadata['id'] = hex(hash(f"{d.metadata['source']}{d.page_content[:100]}"))
+    return docs
+
+
+def _stream_documents(
+    root: str | Path,
+    skip: Callable[[Path], bool] | None = None,
+    workers: int | None = None,
+    max_pending: int | None = None,
+) -> Iterator[Document]:
+    """Lädt die Dateien unter *root* parallel und liefert Documents als Generator.
+
+    Der Verzeichnis-Scan läuft im aufrufenden Thread; pro Datei wird ein
+    Loader-Task an einen Thread-Pool gegeben (PDFs optional an einen
+    Prozess-Pool, siehe AI_IDE_VSTORE_PDF_PROCESSES).  Es sind höchstens
+    *max_pending* Dateien gleichzeitig in Arbeit – liest der Konsument
+    (Chunker/Embedder) nicht weiter, wird auch nicht weiter geladen
+    (Back-Pressure, flacher Speicherbedarf).  Die Reihenfolge entspricht der
+    des Scans.
+
+    *skip(path)* wird vor dem Laden jeder Datei im aufrufenden Thread gefragt.
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    root = Path(root).expanduser().resolve()
+    workers = max(1, int(workers or VSTORE_LOADER_WORKERS))
+    max_pending = max(1, int(max_pending or VSTORE_LOADER_MAX_PENDING or workers * 4))
+
+    threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vstore-loader")
+    pdf_procs = ProcessPoolExecutor(max_workers=VSTORE_PDF_PROCESSES) if VSTORE_PDF_PROCESSES > 0 else None
+    inflight: deque = deque()
+    seen: set[tuple[str, Any]] = set()
+
+    def _drain(limit: int) -> Iterator[Document]:
+        while len(inflight) > limit:
+            future = inflight.popleft()
+            try:
+                loaded = future.result()
+            except Exception as err:
+                _log(err, "Loader-Task fehlgeschlagen")
+                continue
+            for d in loaded:
+                d.metadata["source"] = _norm_source(d.metadata.get("source"))
+                # Ein Scan-Durchlauf → jede Datei genau einmal; nur doppelte
+                # Seiten/Nachrichten desselben Loaders werden noch entfernt.
+                key = (d.metadata["source"], d.metadata.get("page"), d.metadata.get("message-id"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield d
+
+    try:
+        for path in _iter_source_files(root):
+            if skip is not None and skip(path):
+                continue
+            if pdf_procs is not None and path.suffix.lower() == ".pdf":
+                inflight.append(pdf_procs.submit(_load_path, path))
+            else:
+                inflight.append(threads.submit(_load_path, path))
+            yield from _drain(max_pending - 1)
+        yield from _drain(0)
+    finally:
+        for future in inflight:
+            future.cancel()
+        threads.shutdown(wait=True, cancel_futures=True)
+        if pdf_procs is not None:
+            pdf_procs.shutdown(wait=True, cancel_futures=True)
+
+
+def _iter_documents(root: str | Path, skip: Callable[[Path], bool] | None = None) -> list[Document]:
     """
     Traversiert *root* rekursiv und erzeugt LangChain-Document-Objekte für
 
         • *.py                 → PythonLoader
-    _log("", f"✗ PDF übersprungen (kein Text extrahierbar): {path}")
+        • Textformate          → SafeTextLoader
         • *.pdf                → PyPDFLoader;  Fallback: OCR
+        • Chat-Verläufe *.json → _load_json (VSTORE_JSON_GLOBS)
+
+    *skip(path)* wird vor dem Laden jeder Datei gefragt; liefert es True,
+    wird die Datei gar nicht erst gelesen (inkrementeller Build).
 
     Binäre / kaputte Dateien werden stumm übersprungen, damit der
-    Vector-Store-Build niemals abbricht.
+    Vector-Store-Build niemals abbricht.  Für große Korpora besser
+    `_stream_documents()` direkt konsumieren.
     """
-    root = Path(root).expanduser().resolve()
-    docs: list[Document] = []
-
-    # Verzeichnisse die übersprungen werden sollen (normalerweise keine relevanten Dokumente)
-    SKIP_DIRS ={
-        'venv', '.venv', '__pycache__', '.git', 'node_modules','venv/lib/python3.13/site-packages'
-        'site-packages', '.pytest_cache', '.mypy_cache',
-        'matplotlib/mpl-data/images', 
-        } # matplotlib icons - meist nur Grafiken ohne Text
-    
+    docs = list(_stream_documents(root, skip=skip))
+    _log(msg=f"Dokumente geladen: {len(docs)}")
+    return docs
 
-    def should_skip_path(path: Path) -> bool:
-        """Prüft ob ein Pfad übersprungen werden soll"""
-        path_str = str(path)  
-        return any( skip_dir  in path_str for skip_dir in SKIP_DIRS)
-        
-
-
-    # 1) ------------ Python-Quelltexte -----------------------------------
-    py_loader = DirectoryLoader(
-        str(root),
-        glob="*.py",
-        loader_cls=PythonLoader,
-        use_multithreading=USE_MULTITHREADING,
-        show_progress=False,
-    )
-    py_docs = py_loader.load()
-    for d in py_docs:
-        d
-        d.metadata["source"] = _norm_source(d.metadata.get("source"))
-        d.metadata["titel"] = _safe_title_from_source(d.metadata["source"])
-        d.metadata['id'] = hex(hash(f"{d.metadata['source']}{d.page_content[:100]}"))
-    docs.extend(py_docs)
-    
 
-    # 2) ------------ Reine Textformate -----------------------------------
-    text_patterns = (
-        "**/*.txt", "**/*.md", "**/*.rst",
-        "**/*.yaml", "**/*.yml",
-        "**/*.sqlite", "**/*.sqlite3", "**/*.toml",                                 
-    )
-    for pattern in text_patterns:
-        for path in root.rglob(pattern):
-            if should_skip_path(path):
-                continue
-            with suppress(Exception):                      # Encoding-Fehler ignorieren
-                t_loader = SafeTextLoader(str(path), autodetect_encoding=True)
-                dokument = t_loader.load()
-                for d in dokument:
-                    d.metadata["source"] = str(path)
-                    d.metadata["titel"] = path.name
-                    d.metadata['id'] = hex(hash(f"{d.metadata['source']}{d.page_content[:100]}"))
-                docs.extend(dokument)
-    # 2) ------------ Reine Textformate -----------------------------------
-   
-    
+def _sha256_file(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
 
-    # 2.1) ------------ JSON-Dateien ---------------------------------------`
-    docs.extend(_load_json(root))
-    # 3) ------------ PDF-Dateien  (mit robustem Loader) ------------------
-    pdf_count = 0
-    pdf_success_count = 0
-    for pdf_path in root.rglob("*.pdf"):
-        if should_skip_path(pdf_path):
-            # _log("", f"Überspringe PDF (ausgeschlossenes Verzeichnis): {pdf_path}")
-            continue
-            
-        pdf_count += 1
-        pdf_docs = _load_pdf(pdf_path)
-        if pdf_docs:
-            docs.extend(pdf_docs)
-            pdf_success_count += 1
-            _log("", f"✓ PDF indexiert: {pdf_path} ({len(pdf_docs)} Dokumente)")
-    
-    _log("", f"PDF-Verarbeitung: {pdf_success_count}/{pdf_count} erfolgreich")
 
-    # 4) ------------ Duplikate entfernen ---------------------------------
-    unique: dict[str, Document] = {}
-    for d in docs:
-        d.metadata["source"] = _norm_source(d.metadata.get("source"))
-        unique.setdefault(str(d.metadata["source"]), d)
-        #print(d.metadata["source"])     # Quelle als Key
-    
-    print("", f"Dokumente vor Duplikat-Entfernung: {len(docs)}")
-    print("", f"Dokumente nach Duplikat-Entfernung: {len(unique)}")
+def _file_fingerprint(path: Path, previous: dict | None) -> dict | None:
+    """(mtime, size, sha256) einer Datei – ohne Hashing, wenn stat() unverändert ist.
 
-    
-    return list(unique.values())
+    Liefert *previous* selbst zurück, wenn mtime und Größe gleich sind; None,
+    wenn die Datei nicht lesbar ist.
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    if previous and previous.get("mtime_ns") == st.st_mtime_ns and previous.get("size") == st.st_size:
+        return previous
+    try:
+        digest = _sha256_file(path)
+    except OSError:
+        return None
+    entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest, "ids": []}
+    if previous and previous.get("sha256") == digest:
+        # Nur "touch" – Inhalt gleich, Vektoren behalten.
+        entry["ids"] = list(previous.get("ids") or [])
+    return entry
 
 # ───────────────────────── VectorStoreManager ──────────────────────────
 class VectorStore():
@@ -382,12 +587,20 @@ class VectorStore():
     _initialized: bool = False
 
 
-    def __init__(self, store_path: str = None, manifest_file: str = None, enable_monitoring: bool = True) -> None:
+    def __init__(self, store_path: str = None, manifest_file: str = None, enable_monitoring: bool = True,
+                 index_kind: str | None = None, read_only: bool = False) -> None:
         # Lazy initialization - don't load embeddings until needed
         self.embeddings = None
         self.store = None
+        # read_only: index.faiss wird per mmap geöffnet, Dokumente kommen
+        # lazy aus docstore.sqlite (für Query-Worker, siehe tools.py)
+        self.read_only = read_only
+        # Ziel-Indextyp pro Store (flat/ivf/ivfpq/hnsw), default aus AI_IDE_VSTORE_INDEX
+        self.index_kind = (index_kind or VSTORE_INDEX).strip()
         self.FAISS_INDEX_PATH = store_path if store_path else FAISS_INDEX_PATH
         self.MANIFEST_FILE = manifest_file if manifest_file else MANIFEST_FILE
+        # manifest: indizierte Quellen; files: source -> {mtime_ns, size, sha256, ids}
+        self.files: dict[str, dict] = {}
         self.manifest: Set[str] = self._load_manifest()
         # Performance Monitor
         self._initialized = False   
@@ -396,6 +609,13 @@ class VectorStore():
             print(f'APP DIR: {self.FAISS_INDEX_PATH} OK')
         else:
             os.mkdir(self.FAISS_INDEX_PATH)
+        self._query_cache = QueryCache(
+            max_payloads=VSTORE_QUERY_CACHE,
+            max_embeddings=VSTORE_EMBED_CACHE,
+            embedding_cache=_QUERY_EMBEDDINGS,
+            persist_path=(Path(self.FAISS_INDEX_PATH) / "query_cache.json") if VSTORE_QUERY_CACHE_PERSIST else None,
+            save_delay=VSTORE_QUERY_CACHE_SAVE_S,
+        )
         # VectorStoreManager.doc_mem = self.load_directorys()
         print(f'ALL DOCS LENGTH: {len(self.manifest)}')
     # extract root paths from manifest and avoid duplicates
@@ -418,30 +638,234 @@ class VectorStore():
         """
         Liest bereits indizierte File-Pfade aus manifest.json und gibt sie
         als Set[str] zurück. Uses instance-level MANIFEST_FILE.
+
+        Format v2 (dict) enthält zusätzlich pro Datei Fingerprint und
+        Docstore-IDs (→ self.files); das alte Listen-Format wird weiter gelesen.
         """
         if not Path(self.MANIFEST_FILE).exists():
             return set()
         try:
             with open(self.MANIFEST_FILE, encoding="utf-8") as fh:
-                raw_items = json.load(fh)
-                # Manifest may contain mixed numeric/string entries from older runs; normalize to str.
-                return {str(item) for item in raw_items}
+                raw = json.load(fh)
         except Exception as err:
             _log(err, "Warnung: manifest.json defekt – wird neu aufgebaut.")
             return set()
+        if isinstance(raw, dict):
+            files = raw.get("files") or {}
+            self.files = {str(k): dict(v) for k, v in files.items() if isinstance(v, dict)}
+            return {str(item) for item in (raw.get("sources") or [])} | set(self.files)
+        # Manifest may contain mixed numeric/string entries from older runs; normalize to str.
+        return {str(item) for item in raw}
 
     def _save_manifest(self, paths: Iterable[str]) -> None:
-        """Saves manifest using instance-level MANIFEST_FILE."""
-        normalized = [str(p) for p in paths]
-        data = json.dumps(sorted(normalized, key=str), indent=2, ensure_ascii=False)
-        with open(self.MANIFEST_FILE, "w", encoding="utf-8") as f:
+        """Saves manifest using instance-level MANIFEST_FILE (atomic rename)."""
+        normalized = sorted({str(p) for p in paths}, key=str)
+        data = json.dumps(
+            {"schema": MANIFEST_SCHEMA, "sources": normalized, "files": self.files},
+            ensure_ascii=False,
+        )
+        tmp = f"{self.MANIFEST_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
             f.write(data)
+        os.replace(tmp, self.MANIFEST_FILE)
+
+    def _adopt_legacy_sources(self) -> None:
+        """Übernimmt Quellen aus einem alten (Listen-)Manifest in self.files.
+
+        Die zugehörigen Docstore-IDs werden einmalig aus dem geladenen Index
+        ermittelt; der aktuelle Datei-Fingerprint gilt als Ausgangsstand.
+        """
+        legacy = [src for src in self.manifest if src not in self.files]
+        if not legacy:
+            return
+        ids_by_source: dict[str, list[str]] = {}
+        if self.store is not None:
+            for doc_id, metadata in self.store.docstore.metadata_items():
+                src = _norm_source(metadata.get("source"))
+                ids_by_source.setdefault(src, []).append(doc_id)
+        for src in legacy:
+            path = Path(src)
+            entry = _file_fingerprint(path, None) if path.is_file() else None
+            entry = entry or {"mtime_ns": None, "size": None, "sha256": None, "ids": []}
+            entry["ids"] = ids_by_source.get(src, [])
+            self.files[src] = entry
+
+    def _delete_ids(self, ids: Iterable[str]) -> int:
+        """Entfernt Vektoren per Docstore-ID; unbekannte IDs werden ignoriert."""
+        if self.store is None:
+            return 0
+        known = set(self.store.index_to_docstore_id.values())
+        doomed = [i for i in ids if i in known]
+        if not doomed:
+            return 0
+        kind = faiss_index.index_kind(self.store.index)
+        if kind == "flat":
+            self.store.delete(doomed)
+            return len(doomed)
+        # IVF/IVF-PQ: remove_ids verdichtet die FAISS-IDs nicht, LangChain
+        # nummeriert index_to_docstore_id aber neu → Zuordnung kaputt.
+        # HNSW kennt gar kein remove_ids. Also ohne diese IDs neu aufbauen.
+        if not self.rebuild_index(self._index_meta().get("kind") or kind, exclude_ids=doomed):
+            raise RuntimeError(f"Löschen aus {kind}-Index fehlgeschlagen: Umbau ohne {len(doomed)} IDs abgelehnt.")
+        return len(doomed)
+
+    # ------------------------------------------------------------ Index-Typ
+    def _index_meta_path(self) -> Path:
+        return Path(self.FAISS_INDEX_PATH) / "index_meta.json"
+
+    def _index_meta(self) -> dict:
+        """Sidecar zu index.faiss: Typ, Factory-String, Trainingsgröße, Benchmark."""
+        try:
+            with open(self._index_meta_path(), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            return meta if isinstance(meta, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_index_meta(self, meta: dict) -> None:
+        path = self._index_meta_path()
+        tmp = path.with_name(f"{path.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def _apply_index_params(self) -> None:
+        if self.store is not None:
+            faiss_index.apply_search_params(self.store.index, VSTORE_NPROBE, VSTORE_EF_SEARCH)
+
+    def rebuild_index(self, kind: str | None = None, exclude_ids: Iterable[str] = ()) -> bool:
+        """Baut den FAISS-Index als *kind* neu auf (trainiert auf einer Stichprobe).
+
+        Die Vektoren werden aus dem bestehenden Index rekonstruiert, die
+        Reihenfolge (und damit index_to_docstore_id) bleibt erhalten.
+        Verlustbehaftete Indizes (IVF-PQ, ...) liefern nur Näherungen; dann
+        werden die Chunks aus dem Docstore neu eingebettet. Geht das nicht,
+        wird der Umbau abgelehnt statt auf Rekonstruktionen zu trainieren.
+        Gespeichert wird erst durch build() bzw. save_index().
+        """
+        if self.store is None:
+            return False
+        kind = (kind or self.index_kind).strip()
+        exclude = set(exclude_ids)
+        mapping = self.store.index_to_docstore_id
+        t0 = time.perf_counter()
+        ordered = [mapping[i] for i in range(len(mapping))]
+        keep = [pos for pos, doc_id in enumerate(ordered) if doc_id not in exclude]
+        if faiss_index.is_lossy(self.store.index):
+            vectors = self._reembed([ordered[pos] for pos in keep])
+            if vectors is None:
+                _log(f"Index-Umbau nach '{kind}' abgelehnt: {type(self.store.index).__name__} "
+                     "rekonstruiert nur Näherungen und die Chunks ließen sich nicht neu einbetten.")
+                return False
+        else:
+            vectors = faiss_index.reconstruct_vectors(self.store.index)
+            if exclude:
+                vectors = vectors[keep]
+        if exclude:
+            ordered = [ordered[pos] for pos in keep]
+        try:
+            index = faiss_index.build_index(kind, vectors, train_sample=VSTORE_TRAIN_SAMPLE)
+        except Exception as e:
+            _log(f"Index-Umbau nach '{kind}' fehlgeschlagen: {e}")
+            return False
+        if exclude:
+            self.store.docstore.delete(list(exclude))
+        self.store.index = index
+        self.store.index_to_docstore_id = dict(enumerate(ordered))
+        self._apply_index_params()
+        dim = int(vectors.shape[1]) if vectors.ndim == 2 else int(index.d)
+        meta = self._index_meta()
+        meta.update(
+            kind=kind,
+            factory=faiss_index.factory_string(kind, dim, len(ordered)),
+            trained_on=len(ordered),
+            dim=dim,
+            built_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        meta.pop("benchmark", None)
+        self._save_index_meta(meta)
+        _log(f"Index als {meta['factory']} neu aufgebaut ({len(ordered)} Vektoren, {time.perf_counter() - t0:.1f}s).")
+        return True
+
+    def _reembed(self, doc_ids: list[str]):
+        """Original-Embeddings der Chunks *doc_ids* (in dieser Reihenfolge) oder None."""
+        texts: list[str] = []
+        for doc_id in doc_ids:
+            doc = self.store.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                return None
+            texts.append(embedding_text(doc.page_content, doc.metadata, VSTORE_METADATA_MODE))
+        try:
+            return self.embed_texts_array(texts, normalize=bool(getattr(self.store, "_normalize_L2", False)))
+        except Exception as e:
+            _log(f"Neu-Einbetten fehlgeschlagen: {e}")
+            return None
+
+    def _maybe_upgrade_index(self) -> bool:
+        """Flat → Ziel-Typ ab AI_IDE_VSTORE_INDEX_UPGRADE_AT Vektoren; bei starkem
+        Wachstum (AI_IDE_VSTORE_RETRAIN_FACTOR) wird der Quantisierer neu trainiert."""
+        if self.store is None or self.index_kind.lower() == "flat":
+            return False
+        ntotal = int(self.store.index.ntotal)
+        current = faiss_index.index_kind(self.store.index)
+        meta = self._index_meta()
+        if current == "flat":
+            if ntotal < VSTORE_INDEX_UPGRADE_AT:
+                return False
+        elif meta.get("kind") == self.index_kind:
+            trained_on = int(meta.get("trained_on") or ntotal)
+            if current == "hnsw" or ntotal <= VSTORE_RETRAIN_FACTOR * trained_on:
+                return False
+        return self.rebuild_index(self.index_kind)
+
+    def save_index(self) -> None:
+        """Persistiert den Index und invalidiert den Query-Cache."""
+        if self.read_only:
+            raise PermissionError(f"VectorStore {self.FAISS_INDEX_PATH} ist read-only")
+        # Erst die Dokumente (docstore.sqlite), dann index.faiss: Reader laden
+        # neu, sobald sich index.faiss ändert, und finden alle Zeilen vor.
+        save_faiss_store(self.store, self.FAISS_INDEX_PATH)
+        self._index_stamp = self._current_index_stamp()
+        self._query_cache.invalidate(self._index_stamp)
+        _log(f"Index gespeichert → {self.FAISS_INDEX_PATH}")
+
+    def benchmark_index(self, k: int = 10, n_queries: int = 100) -> dict:
+        """Recall@k und Latenz des aktuellen Index gegenüber exakter Suche.
+
+        Der Report landet auch in index_meta.json, damit pro Store eine
+        Einstellung (Typ, nprobe, efSearch) gewählt werden kann.
+        """
+        self._initialize()
+        self._ensure_store_loaded()
+        if self.store is None:
+            return {}
+        report = faiss_index.benchmark(self.store.index, k=k, n_queries=n_queries)
+        meta = self._index_meta()
+        meta["benchmark"] = report
+        self._save_index_meta(meta)
+        _log(f"Index-Benchmark: {report}")
+        return report
 
     def _initialize(self) -> None:
         """Lazy initialization of embeddings and store."""
         if self._initialized:
             return
         self._initialized = True
+        key = (EMBED_BACKEND, EMBED_MODEL_KEY, EMBEDDINGS_DEVICE)
+        with _SHARED_EMBEDDINGS_LOCK:
+            if key not in _SHARED_EMBEDDINGS:
+                self._load_embeddings()
+                _SHARED_EMBEDDINGS[key] = self.embeddings
+            self.embeddings = _SHARED_EMBEDDINGS[key]
+
+    def _load_embeddings(self) -> None:
+        if EMBED_BACKEND == "onnx":
+            # ONNX Runtime int8 – kein torch im Prozess
+            self.embeddings = onnx_embed.OnnxEmbeddings(ONNX_MODEL_DIR)
+            print(f"ONNX-Embeddings (int8, CPU) fuer VectorStore geladen: {ONNX_MODEL_DIR}")
+            return
+        from langchain_huggingface import HuggingFaceEmbeddings
+
         # Embeddings (CPU/GPU automatisch via HF-Transformers)
         device = _select_embeddings_device()
         try:
@@ -458,37 +882,58 @@ class VectorStore():
 
     def _load_faiss_store(self) -> None:
         # Persistierten Index laden – falls vorhanden
-        # FAISS save_local/load_local expect a DIRECTORY containing index.faiss and index.pkl 
-        #if self.store is not None:
-        #    return
+        # Verzeichnis mit index.faiss + docstore.sqlite (alte index.pkl werden
+        # beim ersten schreibenden Laden migriert, siehe docstore_db.py).
+        # read_only: index.faiss per mmap, Dokumente lazy pro Treffer.
         store_dir = Path(self.FAISS_INDEX_PATH)
         index_faiss_file = store_dir / "index.faiss"
         if store_dir.exists() and index_faiss_file.exists():
             try:
-                self.store: FAISS = FAISS.load_local(
-                    str(store_dir), 
-                    self.embeddings, 
-                    allow_dangerous_deserialization=True
-                )
-                print(f"Persistierter Index geladen – Vektoren: {self.store.index.ntotal}")
+                self.store: FAISS = load_faiss_store(store_dir, self.embeddings, read_only=self.read_only)
+                self._apply_index_params()
+                mode = "read-only (mmap)" if self.read_only else "geladen"
+                print(f"Persistierter Index {mode} – Vektoren: {self.store.index.ntotal}")
             except Exception as e:
                 _log(f"Fehler beim Laden des Index: {e}")
                 self.store = None
         else:
             self.store = None
             _log("Kein existierender Index gefunden – wird beim ausfuehren von build() erstellt.")
+        self._index_stamp = self._current_index_stamp()
+        return self.store
+
+    def _current_index_stamp(self) -> tuple | None:
+        """(mtime_ns, size) von index.faiss – None wenn kein Index existiert."""
+        try:
+            st = (Path(self.FAISS_INDEX_PATH) / "index.faiss").stat()
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _ensure_store_loaded(self):
+        """Lädt den Index nur, wenn er fehlt oder sich auf der Platte geändert hat.
+
+        Warme Query-Worker (siehe vdb_pool.py) halten den Store so resident,
+        sehen aber trotzdem Builds aus anderen Prozessen.
+        """
+        stamp = self._current_index_stamp()
+        if self.store is None or stamp != getattr(self, "_index_stamp", None):
+            self._load_faiss_store()
         return self.store
 
             
     def metadata_injection(self, all_docs: list[Document]) -> list[Document]:
-        """Injiziert Metadata in page_content für bessere Suche."""
+        """Normalisiert die Quelle und liefert nur noch nicht indizierte Dokumente.
+
+        page_content bleibt der Rohtext; wie Metadaten in das Embedding
+        eingehen, entscheidet `embedding_text` (VSTORE_METADATA_MODE) erst
+        beim Einbetten in `_index_batch`.
+        """
         new_docs: list[Document] = []
         for d in all_docs:
             d.metadata["source"] = _norm_source(d.metadata.get("source"))
             if d.metadata["source"] not in self.manifest:
-                metadata_str = " | ".join([f"{k}: {v}" for k, v in d.metadata.items()])
-                enriched_content = f"{d.page_content}\n\nMetadata: {metadata_str}"
-                new_docs.append(Document(page_content=enriched_content, metadata=d.metadata))
+                new_docs.append(d)
         print(f'New doc added with metadata injection for {len(new_docs)} documents.')
         if not new_docs:
             _log("Keine neuen Dateien – Index ist aktuell.")
@@ -498,50 +943,222 @@ class VectorStore():
         # FAISS save_local/load_local expect a DIRECTORY containing index.faiss and index.pkl
     # ------------------------------------------------------------
     def build(self, path: Path | str = DEFAULT_PROJECT_ROOT) -> None:
-        '''Erstellt oder erweitert den Vector-Store um neue Dateien.'''
+        '''Erstellt oder aktualisiert den Vector-Store inkrementell.
+
+        Pro Datei liegen (mtime, size, sha256) und die Docstore-IDs ihrer
+        Chunks im Manifest.  Unveränderte Dateien werden vor dem Laden
+        übersprungen; geänderte und gelöschte Dateien verlieren ihre alten
+        Vektoren, nur das Delta wird neu eingebettet.
+        '''
+        if self.read_only:
+            raise PermissionError(f"VectorStore {self.FAISS_INDEX_PATH} ist read-only")
         # Initialize embeddings if not already done
         self._initialize()
+        self._ensure_store_loaded()
+        self._adopt_legacy_sources()
         project_root = Path(path).expanduser().resolve()
+
+        seen: set[str] = set()
+        pending: dict[str, dict] = {}   # geänderte/neue Quellen -> neuer Fingerprint
+        manifest_dirty = False
+
+        def _skip(file_path: Path) -> bool:
+            nonlocal manifest_dirty
+            src = str(file_path)
+            seen.add(src)
+            previous = self.files.get(src)
+            fp = _file_fingerprint(file_path, previous)
+            if fp is None:
+                return True
+            if previous is not None and fp.get("sha256") == previous.get("sha256"):
+                if fp is not previous:
+                    self.files[src] = fp          # nur mtime aktualisiert
+                    manifest_dirty = True
+                return True
+            pending[src] = fp
+            return False
+
+        # Chunking nach Dokumenttyp: Python per AST, PDF nach Überschriften,
+        # Chat-Verläufe pro Nachricht, sonst rekursiv nach Zeichen.
+        splitter = StructuredSplitter(CHUNK_SIZE, CHUNK_OVERLAP, code_chunk_size=CODE_CHUNK_SIZE)
+        ids_by_source: dict[str, list[str]] = {}
+        new_sources: set[str] = set()
+        added = 0
+
+        # Dokumente werden gestreamt und in Batches gechunkt/eingebettet,
+        # während die Loader-Threads bereits die nächsten Dateien lesen.
         #_log(f"Suche nach neuen Dateien in: {project_root}")
-        self.all_docs = _iter_documents(project_root)
-        for d in self.all_docs:
-            d.metadata["source"] = _norm_source(d.metadata.get("source"))
-        new_docs = [d for d in self.all_docs if d.metadata["source"] not in self.manifest]
-        # Korrekte Implementierung für Metadata-Injektion in page_content
-        injected_docs: list[Document] = self.metadata_injection(new_docs)
-        # ------------------------------------------------------------
-        _log(f"{len(injected_docs)} neue Dateien – erstelle Text-Chunks …")
-
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-        )
-        # -------------------------------------------------------------
-        chunks = splitter.split_documents(injected_docs)
-        _log(f"Insgesamt {len(chunks)} Chunks generiert.")
-        
-        # Check if chunks is empty before creating index
-        if not chunks:
+        batch: list[Document] = []
+        for doc in _stream_documents(project_root, skip=_skip):
+            src = _norm_source(doc.metadata.get("source"))
+            doc.metadata["source"] = src
+            # Geänderte Dateien sind "neu" für metadata_injection().
+            if src in pending:
+                self.manifest.discard(src)
+            batch.append(doc)
+            if len(batch) >= VSTORE_BUILD_BATCH:
+                added += self._index_batch(batch, splitter, ids_by_source, new_sources)
+                batch = []
+        if batch:
+            added += self._index_batch(batch, splitter, ids_by_source, new_sources)
+        _log(f"Insgesamt {added} Chunks generiert.")
+
+        # Entfernte Dateien (unterhalb von project_root) + geänderte Dateien:
+        # alte Vektoren löschen (neue Chunks haben frische IDs).
+        removed = [
+            src for src in self.files
+            if src not in seen and Path(src).is_relative_to(project_root)
+        ]
+        stale_ids: list[str] = []
+        for src in removed:
+            stale_ids.extend(self.files.pop(src).get("ids") or [])
+            self.manifest.discard(src)
+        for src in pending:
+            if src in self.files:
+                stale_ids.extend(self.files[src].get("ids") or [])
+        deleted = self._delete_ids(stale_ids)
+        _log(f"{len(pending)} geänderte/neue, {len(removed)} entfernte Dateien, {deleted} Vektoren gelöscht.")
+
+        upgraded = self._maybe_upgrade_index()
+        if added or deleted or upgraded:
+            self.save_index()
+        else:
             _log("Keine Chunks zum Indizieren vorhanden. Überspringe Index-Erstellung.")
-            return
-        
+
+        # Manifest aktualisieren
+        for src, fp in pending.items():
+            fp["ids"] = ids_by_source.get(src, [])
+            self.files[src] = fp
+        self.manifest.update(new_sources)
+        self.manifest.update(pending)
+        if pending or removed or manifest_dirty:
+            self._save_manifest(self.manifest)
+            _log("Manifest aktualisiert.")
+            # ------------------------------------------------------------ 
+
+    def _index_batch(
+        self,
+        docs: list[Document],
+        splitter: StructuredSplitter,
+        ids_by_source: dict[str, list[str]],
+        new_sources: set[str],
+    ) -> int:
+        """Chunkt + embeddet einen Dokument-Batch und fügt ihn dem Index hinzu."""
+        new_docs = [d for d in docs if d.metadata["source"] not in self.manifest]
+        new_sources.update(d.metadata["source"] for d in new_docs)
+        # Erst strukturiert schneiden (AST/Überschriften brauchen den Rohtext),
+        # dann neue Quellen pro Chunk auswählen.
+        chunks: list[Document] = self.metadata_injection(splitter.split_documents(new_docs))
+        if not chunks:
+            return 0
+
+        ids = [uuid.uuid4().hex for _ in chunks]
+        for chunk, chunk_id in zip(chunks, ids):
+            ids_by_source.setdefault(_norm_source(chunk.metadata.get("source")), []).append(chunk_id)
+
+        # Embeddings als float32-Array berechnen und direkt an FAISS geben.
+        # Eingebettet wird Kopfzeile + Text, gespeichert nur der Rohtext.
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        embed_inputs = [embedding_text(t, m, VSTORE_METADATA_MODE) for t, m in zip(texts, metadatas)]
+        text_embeddings = zip(texts, self.embed_texts_array(embed_inputs))
+
         # Index initial erstellen oder erweitern
         if self.store is None:
-            # Embeddings (CPU/GPU automatisch via HF-Transformers)
-            self.store = FAISS.from_documents(chunks, self.embeddings)
+            self.store = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+            attach_docstore(self.store, self.FAISS_INDEX_PATH)
             _log("Neuer FAISS-Index erstellt.")
-        elif chunks:
-            self.store.add_documents(chunks)
-
+        else:
+            self.store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
             _log("Bestehender Index erweitert.")
-        self.store.save_local(self.FAISS_INDEX_PATH)
-        _log(f"Index gespeichert → {self.FAISS_INDEX_PATH}")
-        # Manifest aktualisieren
-        self.manifest.update(_norm_source(d.metadata.get("source")) for d in new_docs)
-        self._save_manifest(self.manifest)
-        _log("Manifest aktualisiert.")
-            # ------------------------------------------------------------ 
+        return len(chunks)
+
+    def embed_texts_array(self, texts: list[str], normalize: bool = False):
+        """Embeddings für *texts* als zusammenhängendes float32-Array (n x dim).
+
+        HuggingFaceEmbeddings.embed_documents() liefert `.tolist()`, also
+        Millionen Python-floats, die FAISS sofort wieder nach float32
+        konvertiert. Hier wird das numpy-Ergebnis von sentence-transformers
+        direkt durchgereicht; *normalize* normiert die Zeilen (L2) in place.
+        """
+        import numpy as np
+
+        self._initialize()
+        if hasattr(self.embeddings, "embed_array"):
+            # ONNX-Backend liefert direkt float32
+            return self.embeddings.embed_array(texts, normalize=normalize)
+        client = getattr(self.embeddings, "_client", None)
+        if client is None or getattr(self.embeddings, "multi_process", False):
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype="float32")
+        else:
+            # Gleiche Vorverarbeitung wie HuggingFaceEmbeddings.embed_documents()
+            encode_kwargs = dict(getattr(self.embeddings, "encode_kwargs", None) or {})
+            encode_kwargs.update(convert_to_numpy=True, convert_to_tensor=False)
+            vectors = client.encode(
+                [t.replace("\n", " ") for t in texts],
+                show_progress_bar=bool(getattr(self.embeddings, "show_progress", False)),
+                **encode_kwargs,
+            )
+            vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if normalize and len(vectors):
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def _filter_positions(self, filter_dict: dict) -> list[int]:
+        """FAISS-Positionen, deren Metadaten zu *filter_dict* passen.
+
+        docstore.sqlite beantwortet das über Expression-Indizes
+        (source, titel, role, thread-id, applied); ältere In-Memory-Docstores
+        (read-only Fallback auf index.pkl) werden in Python gefiltert.
+        """
+        docstore = self.store.docstore
+        if hasattr(docstore, "filter_positions"):
+            return docstore.filter_positions(filter_dict)
+        positions: list[int] = []
+        for pos, doc_id in self.store.index_to_docstore_id.items():
+            doc = docstore.search(doc_id)
+            if metadata_matches(getattr(doc, "metadata", None) or {}, filter_dict):
+                positions.append(pos)
+        return positions
+
+    def _candidates(self, query_vector: list[float], positions: list[int] | None, fetch_k: int):
+        """Ein Suchlauf: Distanzen, FAISS-Positionen und Documents der Kandidaten.
+
+        Mit *positions* (Metadaten-Vorfilter) nur über diese Teilmenge.
+        Kandidaten ohne Document im Docstore fallen heraus.
+        """
+        import numpy as np
+
+        if getattr(self.store, "_normalize_L2", False):
+            query_vector = np.asarray(query_vector, dtype="float32")
+            query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+        if positions is None:
+            distances, hits = faiss_index.search(self.store.index, query_vector, fetch_k)
+        else:
+            distances, hits = faiss_index.search_subset(
+                self.store.index, query_vector, positions, fetch_k,
+                exact_max=VSTORE_FILTER_EXACT_MAX, nprobe=VSTORE_NPROBE,
+            )
+        docs: list[Document] = []
+        keep: list[int] = []
+        for i, pos in enumerate(hits.tolist()):
+            doc_id = self.store.index_to_docstore_id.get(pos)
+            if doc_id is None:
+                continue
+            doc = self.store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                docs.append(doc)
+                keep.append(i)
+        return distances[keep].astype("float32"), hits[keep], docs
+
+    def _embed_query(self, query: str) -> list[float]:
+        """Query-Embedding aus dem Cache oder frisch berechnet."""
+        vector = self._query_cache.get_embedding(EMBED_MODEL_KEY, query)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self._query_cache.put_embedding(EMBED_MODEL_KEY, query, vector)
+        return vector
 
     def query(self,query: str|None = None, k: int = DEFAULT_TOP_K,
             filter_dict:dict|None = None) -> list:
@@ -553,11 +1170,10 @@ class VectorStore():
         for key in filter_dict:
             print(f'Filter Key im Query: {key} ')
         results=''
-        full_content: list=[]
 
 
         self._initialize()
-        self._load_faiss_store()
+        self._ensure_store_loaded()
         if self.store is None:
             _log("Kein Index vorhanden – bitte zuerst build() ausführen.")
             return []
@@ -568,62 +1184,85 @@ class VectorStore():
                 fetch_k = max(int(k) * 4, 10)
                 fetch_k = min(fetch_k, 50)
 
-            results = self.store.similarity_search_with_score(query=query, k=fetch_k)
-                                                              
-                            
-            if not results:
+            # Ergebnis-Cache: Schlüssel enthält die Index-Version, ein build()
+            # (auch aus einem anderen Prozess) macht alte Einträge ungültig.
+            self._query_cache.ensure_version(self._index_stamp)
+            cache_key = self._query_cache.payload_key(
+                self._index_stamp, query, k,
+                store=str(self.FAISS_INDEX_PATH),
+                filter=filter_dict,
+                embed=EMBED_MODEL_KEY,
+                fetch_k=fetch_k,
+                rerank=VSTORE_RERANK,
+                method=VSTORE_RERANK_METHOD,
+                mmr_lambda=VSTORE_MMR_LAMBDA if VSTORE_RERANK_METHOD == "mmr" else None,
+                rerank_model=VSTORE_RERANK_MODEL if VSTORE_RERANK_METHOD == "crossencoder" else None,
+                rerank_top_n=VSTORE_RERANK_TOP_N if VSTORE_RERANK_METHOD == "crossencoder" else None,
+                rerank_max_tokens=VSTORE_RERANK_MAX_TOKENS if VSTORE_RERANK_METHOD == "crossencoder" else None,
+                dedup=VSTORE_DEDUP,
+                max_chars=VSTORE_MAX_CONTENT_CHARS,
+                metadata=VSTORE_INCLUDE_METADATA,
+            )
+            cached = self._query_cache.get_payload(cache_key)
+            if cached is not None:
+                _log(f"Query-Cache Treffer ({len(cached)} Ergebnisse).")
+                return cached
+
+            # Metadaten-Filter als Vorfilter: Kosten ~ Größe der Kandidatenmenge.
+            positions: list[int] | None = None
+            if filter_dict:
+                positions = self._filter_positions(filter_dict)
+                _log(f"Filter {filter_dict}: {len(positions)} Kandidaten.")
+                if not positions:
+                    print("   ↳ Keine Treffer (Filter).")
+                    self._query_cache.put_payload(cache_key, [])
+                    return []
+
+            query_vector = self._embed_query(query)
+            distances, hits, docs = self._candidates(query_vector, positions, fetch_k)
+            if not docs:
                 print("   ↳ Keine Treffer.")
-            pairs: list[tuple[Document, float]] = [(d, float(s)) for (d, s) in results]
-
-            # Rerank/diversify
-            if VSTORE_RERANK and pairs and VSTORE_RERANK_METHOD == "mmr":
-                try:
-                    # LangChain FAISS MMR (diversity-aware selection)
-                    mmr_docs = self.store.max_marginal_relevance_search(
-                        query,
-                        k=min(int(k), len(pairs)),
-                        fetch_k=fetch_k,
-                    )
-                    # Attach approximate distance score by source (best match wins)
-                    best_score_by_source: dict[str, float] = {}
-                    for d, s in pairs:
-                        src = _norm_source(d.metadata.get("source", ""))
-                        prev = best_score_by_source.get(src)
-                        if prev is None or float(s) < prev:
-                            best_score_by_source[src] = float(s)
-                    pairs = [(d, best_score_by_source.get(_norm_source(d.metadata.get("source", "")), float("inf"))) for d in mmr_docs]
-                except Exception:
-                    # Fallback: plain distance ordering
-                    pairs.sort(key=lambda x: x[1])
-
-            if VSTORE_DEDUP and pairs:
-                best_by_source: dict[str, tuple[Document, float]] = {}
-                for doc, score in pairs:
-                    source = _norm_source(doc.metadata.get("source", ""))
-                    prev = best_by_source.get(source)
-                    # FAISS distance: smaller is better
-                    if prev is None or score < prev[1]:
-                        best_by_source[source] = (doc, score)
-                pairs = list(best_by_source.values())
 
-            if VSTORE_RERANK and pairs and VSTORE_RERANK_METHOD == "crossencoder":
-                ce = _get_cross_encoder()
-                if ce is not None:
+            # MMR + Dedup in einem vektorisierten Schritt über den Kandidaten
+            # (keine zweite FAISS-Suche, keine Dict-Schleifen pro Treffer).
+            selected = list(range(len(docs)))
+            if docs:
+                import numpy as np
+
+                codes: dict[str, int] = {}
+                groups = np.fromiter(
+                    (codes.setdefault(_dedup_key(d.metadata), len(codes)) for d in docs),
+                    dtype="int64", count=len(docs),
+                )
+                mmr_done = False
+                if VSTORE_RERANK and VSTORE_RERANK_METHOD == "mmr":
                     try:
-                        rerank_inputs = [(query, (doc.page_content or "")[:4000]) for doc, _ in pairs]
-                        rerank_scores = ce.predict(rerank_inputs)
-                        pairs = [p for _, p in sorted(
-                            zip(rerank_scores, pairs),
-                            key=lambda x: float(x[0]),
-                            reverse=True,
-                        )]
-                    except Exception:
-                        pairs.sort(key=lambda x: x[1])
-                else:
-                    pairs.sort(key=lambda x: x[1])
-
-            if not (VSTORE_RERANK and VSTORE_RERANK_METHOD in {"mmr", "crossencoder"}):
-                pairs.sort(key=lambda x: x[1])
+                        selected = faiss_index.mmr_select(
+                            query_vector,
+                            faiss_index.vectors_at(self.store.index, hits),
+                            k=int(k),
+                            lambda_mult=VSTORE_MMR_LAMBDA,
+                            groups=groups if VSTORE_DEDUP else None,
+                        )
+                        mmr_done = True
+                        # Score je Quelle: beste Distanz eines ihrer Chunks
+                        best = np.full(len(codes), np.inf, dtype="float32")
+                        np.minimum.at(best, groups, distances)
+                        distances = best[groups]
+                    except Exception as e:
+                        # Fallback: Distanz-Reihenfolge
+                        _log(f"MMR fehlgeschlagen: {e}")
+                if not mmr_done and VSTORE_DEDUP:
+                    selected = faiss_index.best_per_group(distances, groups).tolist()
+            pairs: list[tuple[Document, float]] = [(docs[i], float(distances[i])) for i in selected]
+
+            # Degradierte Rankings (Budget überschritten, Modell fehlt) nicht cachen.
+            cacheable = True
+            if VSTORE_RERANK and pairs and VSTORE_RERANK_METHOD == "crossencoder":
+                pairs, rerank_stats = _get_reranker().rerank(query, pairs)
+                if rerank_stats.get("degraded"):
+                    cacheable = False
+                    _log(f"Cross-Encoder degradiert auf Distanz-Ranking: {rerank_stats}")
 
             pairs = pairs[: int(k)]
 
@@ -631,7 +1270,7 @@ class VectorStore():
             for rank, (doc, score) in enumerate(pairs, 1):
                 source = _norm_source(doc.metadata.get("source", ""))
                 title = doc.metadata.get("titel") or _safe_title_from_source(source)
-                content = (doc.page_content or "").strip()
+                content = (doc.page_content or "").split(_LEGACY_METADATA_MARKER, 1)[0].strip()
                 if VSTORE_MAX_CONTENT_CHARS > 0 and len(content) > VSTORE_MAX_CONTENT_CHARS:
                     content = content[:VSTORE_MAX_CONTENT_CHARS] + "\n…[truncated]"
                 item: dict[str, Any] = {
@@ -641,28 +1280,13 @@ class VectorStore():
                     "title": title,
                     "page": doc.metadata.get("page"),
                     "content": content,
-                    "metadata": doc.metadata
                 }
                 if VSTORE_INCLUDE_METADATA:
                     item["metadata"] = dict(doc.metadata)
                 payload.append(item)
+            if cacheable:
+                self._query_cache.put_payload(cache_key, payload)
             return payload
-            # Fllbk: exact filename match in docstore (useful when the query is a filename)
-        """
-            for itms in payload:
-                match = True
-                for ky in filter_dict:
-                    if ky in itms.metadata:
-                        if str(itms.metadata[ky]) != str(filter_dict[ky]):
-                            match = False
-                            break
-                    else:
-                        match = False
-                        break
-                if match:
-                    full_content.append(itms)
-            print(full_content)
-            return payload, full_content"""
                
 
 